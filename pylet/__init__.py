@@ -3,13 +3,20 @@
     This Python package is intended for use across multiple projects.
     
     Third-party software dependencies are compartmentalized.  For example, all functions and classes dependent on 
-    the `arcpy`_ Python package, associated with ArcGIS, are included in the arcpyutil sub-package.
+    the `arcpy`_ Python package, associated with ArcGIS, are included in the arcpyutil sub-package, and those dependent
+    on `NumPy`_ alone are included in the numpyutil sub-package.
 
     .. _arcpy: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/What_is_ArcPy/000v000000v7000000/
+    .. _NumPy: http://docs.scipy.org/doc/numpy/reference/
     
 """
 
-import arcpyutil
+try:
+    import arcpyutil
+except ImportError:
+    # ArcGIS is not installed, only the sub-packages without an arcpy dependency are available
+    pass
 import conversion
 import datetimeutil
 import lcc
+import numpyutil
@@ -1,9 +1,44 @@
 """ This module contains utilities for raster datasets or objects accessed using `arcpy`_, a Python package associated with ArcGIS. 
 
     .. _arcpy: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/What_is_ArcPy/000v000000v7000000/
+    .. _Raster: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/Raster/000v000000wt000000/
+    .. _RasterToNumPyArray: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#//000v0000012z000000
+    .. _generator: http://docs.python.org/tutorial/classes.html#generators
+    .. _frozenset: http://docs.python.org/library/stdtypes.html#frozenset
 """
 
 import arcpy as _arcpy
+from pylet.numpyutil.geotransform import GeoTransform as _GeoTransform
+from pylet.numpyutil import raster as _numpyraster
+from pylet.numpyutil import histogram as _histogram
+
+
+def getGeoTransform(raster):
+    """ Get a :py:class:`pylet.numpyutil.geotransform.GeoTransform` object from an arcpy `Raster`_ object.
+
+        **Description:**
+        
+        The GeoTransform converts NumPy arrays of zero based rows and columns to map coordinates and back in a single
+        vectorized call, using either cell centers or upper left corners.  Use it in place of 
+        :py:func:`getRasterPointFromRowColumn` when converting many cells.
+        
+        
+        **Arguments:**
+        
+        * *raster* - arcpy `Raster`_ object
+        
+        
+        **Returns:** 
+        
+        * :py:class:`pylet.numpyutil.geotransform.GeoTransform` object
+        
+        .. _Raster: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/Raster/000v000000wt000000/
+
+        
+    """
+
+    return _GeoTransform.fromRaster(raster)
+
 
 def getRasterPointFromRowColumn(raster, row, column):
     """ Get an arcpy `Point`_ object from an arcpy `Raster`_ object and zero based row and column indexes.
@@ -11,7 +46,8 @@ def getRasterPointFromRowColumn(raster, row, column):
         **Description:**
         
         The row and column are zero-based and start in the upper left corner.  The arcpy `Point`_ object returned has
-        X and Y coordinates representing the cell identified by the specified row and column.
+        X and Y coordinates representing the upper left corner of the cell identified by the specified row and column.
+        To convert many cells at once, or to get cell centers, use :py:func:`getGeoTransform`.
         
         
         **Arguments:**
@@ -32,17 +68,10 @@ def getRasterPointFromRowColumn(raster, row, column):
     """    
 
     
-    extent = raster.extent    
-    upperLeftX = extent.XMin
-    upperLeftY = extent.YMax
+    # The upper left corner of the cell, as this function has always returned
+    x, y = getGeoTransform(raster).toMap(row, column, cellCenter=False)
 
-    xDistanceFromUpperLeft = column * raster.meanCellWidth
-    yDistanceFromUpperLeft = row * raster.meanCellHeight
-    
-    x = upperLeftX + xDistanceFromUpperLeft
-    y = upperLeftY - yDistanceFromUpperLeft
-
-    point = _arcpy.Point(x,y)
+    point = _arcpy.Point(float(x), float(y))
     
     return point
 
@@ -54,7 +83,7 @@ def getRasterValues(inRaster):
         
         This function will open a search cursor on the raster and iterate through all the rows
         and collect all values in a python list object. By design, values in the raster's VALUE
-        field are unique.
+        field are unique.  For rasters without an attribute table, use :py:func:`getRasterValueHistogram`.
     
     **Arguments:**
     
@@ -77,4 +106,75 @@ def getRasterValues(inRaster):
     del rows
         
     return valuesList
+
+
+def iterateRasterBlocks(inRaster, blockRows=_numpyraster.DEFAULT_BLOCK_SIZE, blockColumns=_numpyraster.DEFAULT_BLOCK_SIZE,
+                        halo=0):
+    """ A `generator`_ for :py:class:`pylet.numpyutil.raster.RasterWindow` objects holding blocks of an arcpy raster.
+
+    **Description:**
+        
+        Each block is read into a NumPy array with `RasterToNumPyArray`_, so rasters larger than memory can be passed to
+        the engines in :py:mod:`pylet.numpyutil` one block at a time.  Blocks are read row by row, with an optional halo
+        of surrounding cells, as described in :py:func:`pylet.numpyutil.raster.getBlockWindows`.  NoData cells hold the
+        noDataValue of the raster.
         
+    **Arguments:**
+    
+        * *inRaster* - arcpy `Raster`_ object
+        * *blockRows*, *blockColumns* - size of the blocks in cells
+        * *halo* - number of cells to extend each block on each side
+   
+    **Returns:**
+    
+        * `generator`_ for :py:class:`pylet.numpyutil.raster.RasterWindow` objects
+        
+    """
+    
+    geoTransform = getGeoTransform(inRaster)
+    
+    for window in _numpyraster.getBlockWindows(inRaster.height, inRaster.width, blockRows, blockColumns, halo):
+        
+        window.transform = geoTransform.getWindowTransform(window.row - window.haloTop, window.column - window.haloLeft)
+        windowRows = window.haloTop + window.rowCount + window.haloBottom
+        windowColumns = window.haloLeft + window.columnCount + window.haloRight
+        
+        xMin = window.transform.xMin
+        yMax = window.transform.yMax
+        yMin = yMax - windowRows * geoTransform.cellHeight
+        window.extent = (xMin, yMin, xMin + windowColumns * geoTransform.cellWidth, yMax)
+        
+        lowerLeftCorner = _arcpy.Point(xMin, yMin)
+        if inRaster.noDataValue is None:
+            window.array = _arcpy.RasterToNumPyArray(inRaster, lowerLeftCorner, windowColumns, windowRows)
+        else:
+            window.array = _arcpy.RasterToNumPyArray(inRaster, lowerLeftCorner, windowColumns, windowRows, 
+                                                     inRaster.noDataValue)
+        
+        yield window
+
+
+def getRasterValueHistogram(inRaster, lccObj=None):
+    """ Count the cells of each value in an arcpy raster, without using its value attribute table.
+
+    **Description:**
+        
+        The raster is read block by block with :py:func:`iterateRasterBlocks` and counted with 
+        :py:func:`pylet.numpyutil.histogram.getBlockValueHistogram`, so unlike :py:func:`getRasterValues`, it works for 
+        rasters without a value attribute table.  NoData cells are not counted.  If a Land Cover Classification is
+        provided, values found in the raster which are not defined in it are reported, for warning the user.
+        
+    **Arguments:**
+    
+        * *inRaster* - arcpy `Raster`_ object
+        * *lccObj* - optional :py:class:`pylet.lcc.LandCoverClassification` object
+   
+    **Returns:**
+    
+        * NumPy array - unique values in ascending order
+        * NumPy array - int64 cell counts for each value
+        * `frozenset`_ - values not defined in lccObj, empty if lccObj is None
+        
+    """
+    
+    return _histogram.getBlockValueHistogram(iterateRasterBlocks(inRaster), inRaster.noDataValue, lccObj)
@@ -17,6 +17,7 @@ from xml.dom import minidom
 import os
 import sys
 import constants
+import memory
 import copy
 from glob import glob
 from collections import defaultdict
@@ -131,29 +132,24 @@ class LandCoverBaseClass(object):
             self.attributes = {}
     
     def getSize(self):
-#         print "init:", self.__init__.__sizeof__()
-#         print "getsize:", self.getSize.__sizeof__()
-#         print "_load:", self._loadLccClassNode.__sizeof__()
-#         print "getclassoverwrite", self.getClassLcpAttributes.__sizeof__()
-#         print "classId", self.classId.__sizeof__()
-#         print "name", self.name.__sizeof__()
-#         print "uniqueValueIds",self.uniqueValueIds, self.uniqueValueIds.__sizeof__()
-#         print "uniqueClassIds" ,self.uniqueClassIds, self.uniqueClassIds.__sizeof__()
-#         print "attributes", self.attributes, self.attributes.__sizeof__()
-#         print "parentClass", self.parentClass.__sizeof__()
-#         print "childClasses", self.childClasses, self.childClasses.__sizeof__()
-#         print "childValueIds", self.childValueIds, self.childValueIds.__sizeof__()
-#         print "classoverwriteFields", self.classoverwriteFields, self.classoverwriteFields.__sizeof__()
-#         print "_excludeEmptyClasses", self._excludeEmptyClasses, self._excludeEmptyClasses.__sizeof__()
-        objectSum = self.__init__.__sizeof__() + self.getSize.__sizeof__() + \
-            self._loadLccClassNode.__sizeof__() + self.getClassLcpAttributes.__sizeof__() + \
-            self.classId.__sizeof__() + self.name.__sizeof__() + self.uniqueValueIds.__sizeof__() + \
-            self.uniqueClassIds.__sizeof__() + self.attributes.__sizeof__() + \
-            self.parentClass.__sizeof__() + self.childClasses.__sizeof__() + \
-            self.childValueIds.__sizeof__() + self.classoverwriteFields.__sizeof__() + \
-            self._excludeEmptyClasses.__sizeof__()
-            
-        return objectSum
+        """ Get the memory footprint of this class and its descendant classes in bytes.
+        
+        **Description:**
+            
+            The deep size of the class is returned, including its attributes, value ids and all descendant classes.
+            The parent class is not included. See :py:func:`pylet.lcc.memory.getDeepSize` for details.
+            
+        **Arguments:**
+            
+            * Not applicable
+            
+        **Returns:**
+            
+            * integer
+            
+        """
+        
+        return memory.getDeepSize(self, set([id(self.parentClass)]))
     
     def _loadLccClassNode(self, xmlClassNode):
         """  This method Loads a LCC class-`Node`_ to assign all properties associated with this class.        
@@ -627,6 +623,9 @@ class LandCoverClasses(LandCoverBaseClasses, dict):
     # Private frozenset for all unique values
     _uniqueValues = None
     
+    # Private list of (classId, reused child classIds, additional valueIds) tuples in bottom-up order
+    _rollUpPlan = None
+    
     #: Boolean for exclusion of empty classes
     excludeEmptyClasses = None
     
@@ -691,13 +690,102 @@ class LandCoverClasses(LandCoverBaseClasses, dict):
             # Assemble all values found in all classes, repeats are allowed
             tempValues = []
             for landCoverClass in self.itervalues():
-                tempValues.extend(landCoverClass.uniqueValueIds)
+                tempValues.extend(landCoverClass.uniqueValueIds or ())
 
             # repeats purged on conversion to frozenset
             self._uniqueValues = frozenset(tempValues)
             
         return self._uniqueValues
     
+    def getClassCounts(self, valueCounts):
+        """  Roll up counts for each value into counts for every class.
+
+        **Description:**
+
+            The count for a class is the sum of the counts of its uniqueValueIds.  All classes are computed in a single
+            bottom-up pass over the class hierarchy, where a parent class reuses the subtotals of its child classes 
+            instead of summing the same values again.  A child subtotal is only reused when none of its values are 
+            already covered by another reused child, and the remaining values are added individually, so a value 
+            duplicated under several child classes is counted once.
+
+            The *valueCounts* can be any of the following:
+
+            * `dict`_ - valueId as the key and count as the value
+            * sequence or 1-D NumPy array - indexed by valueId
+            * 2-D NumPy array - one row per zone, columns indexed by valueId
+            
+            ValueIds missing from *valueCounts* are counted as zero.
+            
+            The roll up plan is cached, and rebuilt when classes are added to or removed from this object.  Changes
+            made to the child classes or ids of a class already added are not detected.
+
+        **Arguments:**
+
+            * *valueCounts* - counts for each valueId
+
+        **Returns:** 
+            
+            * `dict`_ - classId as the key and count as the value.  For 2-D input, the value is a 1-D NumPy array with
+              the count for each zone.
+        
+        """
+        
+        if self._rollUpPlan is None:
+            self._rollUpPlan = []
+            for topLevelClass in self.topLevelClasses or []:
+                self._buildRollUpPlan(topLevelClass)
+        
+        isBatch = getattr(valueCounts, 'ndim', 1) == 2
+        
+        classCounts = {}
+        for classId, reusedClassIds, valueIds in self._rollUpPlan:
+            
+            if isBatch:
+                valueIds = [valueId for valueId in valueIds if 0 <= valueId < valueCounts.shape[1]]
+                # Slicing an empty column range gives a zero for each zone in the input dtype
+                count = valueCounts[:, valueIds].sum(axis=1) if valueIds else valueCounts[:, :0].sum(axis=1)
+            elif isinstance(valueCounts, dict):
+                count = sum([valueCounts.get(valueId, 0) for valueId in valueIds])
+            else:
+                count = sum([valueCounts[valueId] for valueId in valueIds if 0 <= valueId < len(valueCounts)])
+            
+            for reusedClassId in reusedClassIds:
+                count = count + classCounts[reusedClassId]
+                
+            classCounts[classId] = count
+            
+        return classCounts
+    
+    def _buildRollUpPlan(self, landCoverClass):
+        """ Appends the roll up steps for landCoverClass and its descendants to the plan, children first """
+        
+        for childClass in landCoverClass.childClasses:
+            self._buildRollUpPlan(childClass)
+        
+        # Reuse the largest child subtotals first, skipping any child which overlaps values already covered
+        reusedClassIds = []
+        coveredValueIds = set()
+        childClasses = sorted(landCoverClass.childClasses, key=lambda c: len(c.uniqueValueIds or ()), reverse=True)
+        for childClass in childClasses:
+            if coveredValueIds.isdisjoint(childClass.uniqueValueIds or ()):
+                reusedClassIds.append(childClass.classId)
+                coveredValueIds.update(childClass.uniqueValueIds or ())
+        
+        valueIds = sorted(set(landCoverClass.uniqueValueIds or ()) - coveredValueIds)
+        
+        self._rollUpPlan.append((landCoverClass.classId, reusedClassIds, valueIds))
+    
+    def __setitem__(self, classId, landCoverClass):
+        # Any change to the classes invalidates the cached roll up plan and unique values
+        self._rollUpPlan = None
+        self._uniqueValues = None
+        dict.__setitem__(self, classId, landCoverClass)
+        
+    def __delitem__(self, classId):
+        self._rollUpPlan = None
+        self._uniqueValues = None
+        dict.__delitem__(self, classId)
+    
     def addTopLevelClass(self, LandCoverClass):
         print "####################################"
         print "In TopLevelClass in LandCoverClasses"
@@ -1163,6 +1251,26 @@ class LandCoverClassificationBase(object):
         for targetClass in self.classes.values():
             self.overwriteFieldDataList.extend(targetClass.getClassLcpAttributes())
 
+    def getMemoryReport(self):
+        """  Get a breakdown of the memory footprint of this classification in bytes.
+        
+        **Description:**
+            
+            The deep size of the classification is reported by section: indexes, coefficients, values, classes, 
+            metadata and total.  See :py:func:`pylet.lcc.memory.getMemoryReport` for details.
+            
+        **Arguments:**
+            
+            * Not applicable
+            
+        **Returns:**
+            
+            * `dict`_ - section name as the key and size in bytes as the value
+            
+        """
+        
+        return memory.getMemoryReport(self)
+
 class LandCoverClassification(LandCoverClassificationBase):
     """ This class holds all the details about a Land Cover Classification(LCC).
 
@@ -44,6 +44,10 @@ XmlAttributeValue = "value"
 XmlAttributeFieldName = "fieldName"
 XmlAttributeCalcMethod = "method"
 
+# Coefficient calculation methods
+CalcMethodPercentage = "P"
+CalcMethodPerUnitArea = "A"
+
 # XML Validation Attributes
 XsdFilename = 'LCCSchema_v2.xsd'
 XmlAttilaNamespace = 'lcc'
@@ -0,0 +1,158 @@
+''' Memory accounting for Land Cover Classification(LCC) objects
+
+    These functions report the real memory footprint of the objects in :py:mod:`pylet.lcc`.  Sizes are deep sizes,
+    meaning every object reachable from the measured object is included, but each object is only counted once.
+
+    .. _sys.getsizeof: http://docs.python.org/library/sys.html#sys.getsizeof
+    .. _dict: http://docs.python.org/library/stdtypes.html#dict
+
+'''
+
+import sys
+import types
+
+
+# Report sections, in the order they are measured.  An object is counted in the first section that reaches it.
+REPORT_SECTIONS = ('indexes', 'coefficients', 'values', 'classes', 'metadata')
+
+# Attributes holding lookup sets derived from the XML, rather than the XML content itself. Names beginning with two
+# underscores are matched against their mangled form, ie. _LandCoverValues__excludedValueIds
+_INDEX_ATTRIBUTES = ('uniqueValueIds', 'uniqueClassIds', '_uniqueValues', '__excludedValueIds', '__includedValueIds',
+                     '__uniqueValueIds', '__uniqueValueIdsWithExcludes')
+
+# Objects which are shared by the interpreter and never owned by an LCC object
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def getDeepSize(obj, seen=None):
+    """ Get the size in bytes of an object and everything it references.
+
+    **Description:**
+
+        The size of *obj* is determined with `sys.getsizeof`_ and the sizes of all containers items, dictionary keys and
+        values, and instance attributes are added recursively.  Each object is counted once, so shared and circular
+        references, such as the *parentClass* of a :py:class:`pylet.lcc.LandCoverClass`, do not inflate the result.
+        Classes, modules and functions are never counted.
+
+        Pass the same *seen* `set` to successive calls to keep objects from being counted more than once across calls.
+        Adding the id of an object to *seen* before the call excludes that object from the result.
+
+    **Arguments:**
+
+        * *obj* - Any Python object
+        * *seen* - Optional `set` of ids for objects already counted, updated in place
+
+    **Returns:**
+
+        * integer
+
+    """
+
+    if seen is None:
+        seen = set()
+
+    totalSize = 0
+    pending = [obj]
+
+    # Iterative walk, as deep class hierarchies could exceed the recursion limit
+    while pending:
+        currentObj = pending.pop()
+
+        if id(currentObj) in seen or isinstance(currentObj, _SKIP_TYPES):
+            continue
+        seen.add(id(currentObj))
+
+        totalSize += sys.getsizeof(currentObj)
+
+        if isinstance(currentObj, dict):
+            pending.extend(currentObj.keys())
+            pending.extend(currentObj.values())
+        elif isinstance(currentObj, (list, tuple, set, frozenset)):
+            pending.extend(currentObj)
+
+        # Instance attributes, including those of dict subclasses like LandCoverValues
+        if hasattr(currentObj, '__dict__') and not isinstance(currentObj, _SKIP_TYPES):
+            pending.append(currentObj.__dict__)
+
+        for slotName in getattr(type(currentObj), '__slots__', ()):
+            if hasattr(currentObj, slotName):
+                pending.append(getattr(currentObj, slotName))
+
+    return totalSize
+
+
+def getMemoryReport(lccObj, seen=None):
+    """ Get a breakdown of the deep size of a :py:class:`pylet.lcc.LandCoverClassification` object.
+
+    **Description:**
+
+        The footprint of the classification is split into the following sections, in bytes:
+
+        * *indexes* - the frozensets of unique class and value ids on each class and the cached id sets
+        * *coefficients* - the coefficient definitions and the coefficient values stored with each value
+        * *values* - the :py:class:`pylet.lcc.LandCoverValue` objects
+        * *classes* - the :py:class:`pylet.lcc.LandCoverClass` objects
+        * *metadata* - the :py:class:`pylet.lcc.LandCoverMetadata` object
+        * *total* - the sum of all sections
+
+        Sections are measured in the order listed and objects shared between sections are counted in the first section
+        only.  To size a collection of classifications, such as a registry, pass the same *seen* `set` for each one.
+
+    **Arguments:**
+
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *seen* - Optional `set` of ids for objects already counted, updated in place
+
+    **Returns:**
+
+        * `dict`_ - section name as the key and size in bytes as the value
+
+    """
+
+    if seen is None:
+        seen = set()
+
+    classes = lccObj.classes if lccObj.classes is not None else {}
+    values = lccObj.values if lccObj.values is not None else {}
+
+    report = {}
+
+    # Indexes first, so they are not attributed to the objects holding them
+    indexObjects = []
+    for owner in [lccObj, classes, values] + list(classes.values()):
+        indexObjects.extend(_getIndexAttributes(owner))
+    report['indexes'] = sum([getDeepSize(indexObject, seen) for indexObject in indexObjects])
+
+    # Coefficient definitions and the per-value coefficient dictionaries
+    coefficientObjects = [lccObj.coefficients]
+    for landCoverValue in values.values():
+        if '_coefficients' in vars(landCoverValue):
+            coefficientObjects.append(landCoverValue._coefficients)
+
+    # Measured one at a time, as the ids of the temporary lists must not end up in seen
+    report['coefficients'] = sum([getDeepSize(coefficientObject, seen) for coefficientObject in coefficientObjects])
+
+    # Parent classes are reachable from every class, but belong to the classes section
+    seen.add(id(lccObj))
+    report['values'] = getDeepSize(values, seen)
+    report['classes'] = getDeepSize(classes, seen)
+    report['metadata'] = getDeepSize(lccObj.metadata, seen)
+
+    report['total'] = sum([report[section] for section in REPORT_SECTIONS])
+
+    return report
+
+
+def _getIndexAttributes(obj):
+    """ Returns a list of the index attribute values held by obj """
+
+    indexValues = []
+
+    for attributeName, attributeValue in vars(obj).items():
+        for indexName in _INDEX_ATTRIBUTES:
+            if attributeName == indexName or (indexName.startswith('__') and attributeName.endswith(indexName)):
+                if attributeValue is not None:
+                    indexValues.append(attributeValue)
+                break
+
+    return indexValues
@@ -0,0 +1,34 @@
+""" This module contains utilities for use with `NumPy`_, without any dependency on ArcGIS.
+
+    Functions and classes in this sub-package read and process raster data as NumPy arrays, so they can be used on
+    machines where `arcpy`_ is not available.  Do not place functions and classes with an ArcGIS dependency in this
+    sub-package.
+
+    .. _NumPy: http://docs.scipy.org/doc/numpy/reference/
+    .. _arcpy: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/What_is_ArcPy/000v000000v7000000/
+
+"""
+
+import geotransform
+import raster
+import histogram
+import reclass
+import zonal
+import parallel
+import lcp
+import coefficients
+import coreedge
+import patches
+import focal
+import distance
+import lcosp
+import rasterize
+import riparian
+import points
+import valuecache
+import masks
+import tilecache
+import pyramid
+import resample
+import rasterwriter
+import units
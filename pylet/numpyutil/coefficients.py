@@ -0,0 +1,106 @@
+""" This module contains an engine for applying land cover coefficients to zones, such as nutrient loading.
+
+    The coefficients of a :py:class:`pylet.lcc.LandCoverClassification` are compiled into a values by coefficients
+    matrix, and every coefficient is computed for every zone with one matrix product of the tabulated cell counts.
+    Each coefficient is then normalized according to its calcMethod attribute:
+
+    * Percentage (P) - the coefficient is a percentage of the area of a cell, such as percent impervious.  The result
+      is the area weighted mean of the coefficient over the effective area of the zone.
+    * Per unit area (A) - the coefficient is an amount per unit area, such as kg of nitrogen per hectare per year.  The
+      result is the total amount for the zone, the sum of the coefficient times the area of each value.
+
+    Excluded values, such as water, contribute nothing to either method.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+from pylet.lcc import constants
+import units
+
+#: Default area unit of per unit area coefficients, in square meters (one hectare)
+COEFFICIENT_AREA_SQ_METERS = 10000.0
+
+
+def getCoefficientMatrix(valueIds, lccObj, coefIds):
+    """ Get a values by coefficients matrix of coefficient values, with 0.0 for excluded values and missing values """
+
+    excludedValueIds = lccObj.values.getExcludedValueIds()
+    matrix = numpy.zeros((len(valueIds), len(coefIds)), dtype=numpy.float64)
+
+    for valueIndex, valueId in enumerate(numpy.asarray(valueIds).tolist()):
+        landCoverValue = lccObj.values.get(valueId)
+        if landCoverValue is None or valueId in excludedValueIds:
+            continue
+        for coefIndex, coefId in enumerate(coefIds):
+            coefficientValue = landCoverValue.getCoefficientValueById(coefId)
+            if coefficientValue is not None:
+                matrix[valueIndex, coefIndex] = coefficientValue
+
+    return matrix
+
+
+def getCoefficientResults(zonalCounts, lccObj, cellArea=1.0, linearUnits=1.0, coefIds=None,
+                          coefficientAreaSqMeters=COEFFICIENT_AREA_SQ_METERS):
+    """ Compute the value of each coefficient within each zone.
+
+    **Description:**
+
+        See the module description for the calculation methods.  Per unit area results need the area of the cells in
+        the units of the coefficients.  The *cellArea* is in squared map units, and *linearUnits* converts map units to
+        meters, either as a factor or as an ArcGIS linear unit name, see
+        :py:func:`pylet.numpyutil.units.getMeterConversionFactor`.  The cell area in square meters is then
+        divided by *coefficientAreaSqMeters*, one hectare by default.
+
+        Zones without an effective area have a percentage of 0.  Coefficients are named by their fieldName attribute,
+        or by their coefId if it is not set.
+
+    **Arguments:**
+
+        * *zonalCounts* - :py:class:`pylet.numpyutil.zonal.ZonalCounts` object
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *cellArea* - area of a single cell in squared map units
+        * *linearUnits* - factor or ArcGIS linear unit name for converting map units to meters
+        * *coefIds* - `list` of coefIds to compute, by default all coefficients sorted by coefId
+        * *coefficientAreaSqMeters* - area unit of per unit area coefficients in square meters
+
+    **Returns:**
+
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, with one element per zone in the order
+          of zonalCounts.zoneIds, as the value, in the order of coefIds
+
+    """
+
+    if coefIds is None:
+        coefIds = sorted(lccObj.coefficients.keys())
+
+    # Every zone and coefficient in one product, then scaled per coefficient by its calculation method
+    counts = numpy.asarray(zonalCounts.counts, dtype=numpy.float64)
+    coefficientMatrix = getCoefficientMatrix(zonalCounts.valueIds, lccObj, coefIds)
+    weightedCounts = numpy.dot(counts, coefficientMatrix)
+
+    excludedValueIds = lccObj.values.getExcludedValueIds()
+    included = numpy.array([valueId not in excludedValueIds for valueId in numpy.asarray(zonalCounts.valueIds).tolist()],
+                           dtype=bool)
+    effectiveCounts = counts[:, included].sum(axis=1)
+    divisor = numpy.where(effectiveCounts > 0, effectiveCounts, 1.0)
+
+    cellAreaInCoefficientUnits = cellArea * units.getSquareMeterConversionFactor(linearUnits) / coefficientAreaSqMeters
+
+    columns = OrderedDict()
+    for coefIndex, coefId in enumerate(coefIds):
+        coefficient = lccObj.coefficients[coefId]
+
+        if coefficient.calcMethod == constants.CalcMethodPercentage:
+            result = weightedCounts[:, coefIndex] / divisor
+        elif coefficient.calcMethod == constants.CalcMethodPerUnitArea:
+            result = weightedCounts[:, coefIndex] * cellAreaInCoefficientUnits
+        else:
+            raise ValueError("Unknown calculation method {0!r} for coefficient {1}".format(coefficient.calcMethod,
+                                                                                           coefId))
+
+        columns[coefficient.fieldName or coefId] = result
+
+    return columns
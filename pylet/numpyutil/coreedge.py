@@ -0,0 +1,200 @@
+""" This module contains an engine for core and edge area metrics (caem) of land cover classes within zones.
+
+    A cell of a class is an edge cell if any cell within *edgeWidth* cells of it, in any of the eight directions, has a
+    value not in the class.  The remaining cells of the class are core cells.  This is the erosion of the class by a
+    square of 2 * *edgeWidth* + 1 cells.  NoData cells and cells beyond the edge of the raster do not make edges, so
+    the raster should extend past the zones by the edge width, see
+    :py:func:`pylet.arcpyutil.environment.getBufferedExtent`.
+
+    The land cover raster is read block by block with a halo of *edgeWidth* cells, so the erosion of each block is
+    exact, and the core, edge and other area of each class is tabulated for each zone in the same pass.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+from pylet.lcc import constants
+import raster
+import zonal
+import lcp
+
+#: Category of cells with an effective value not in the class
+OTHER = 0
+
+#: Category of class cells at least edgeWidth cells from any other value
+CORE = 1
+
+#: Category of class cells within edgeWidth cells of another value
+EDGE = 2
+
+#: Suffixes added to the field name of a class for the area of each category
+CATEGORY_SUFFIXES = ('_Other', '_Core', '_Edge')
+
+
+def getNeighborCounts(mask, radius):
+    """ Count the True cells within radius cells of each cell of a 2-D boolean array, including the cell itself.
+
+    **Description:**
+
+        The count is over a square window of 2 * *radius* + 1 cells, clipped at the edges of the array.  The windows
+        are summed along each axis with cumulative sums, so the time does not depend on the radius.
+
+    **Arguments:**
+
+        * *mask* - 2-D NumPy boolean array
+        * *radius* - number of cells on each side of the window
+
+    **Returns:**
+
+        * 2-D NumPy int32 array of the same shape
+
+    """
+
+    counts = mask.astype(numpy.int32)
+
+    for axis in (0, 1):
+        length = counts.shape[axis]
+        cumulative = numpy.cumsum(counts, axis=axis)
+        cumulative = numpy.concatenate([numpy.zeros_like(cumulative.take([0], axis=axis)), cumulative], axis=axis)
+
+        indexes = numpy.arange(length)
+        upper = numpy.minimum(indexes + radius + 1, length)
+        lower = numpy.maximum(indexes - radius, 0)
+        counts = cumulative.take(upper, axis=axis) - cumulative.take(lower, axis=axis)
+
+    return counts
+
+
+class CoreEdgeTabulator(object):
+    """ This class tabulates the core, edge and other cells of land cover classes within zones, block by block.
+
+    **Description:**
+
+        Pass each land cover block with a halo of *edgeWidth* cells, and the zones covering the core of the block, to
+        :py:meth:`addBlock`.  Excluded values count toward neither the class nor the other area, but do make edges.
+
+    **Arguments:**
+
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *edgeWidth* - width of the edge in cells
+        * *landCoverClasses* - `list` of :py:class:`pylet.lcc.LandCoverClass` objects
+        * *zoneNodata* - the value representing NoData in the zone raster, or None
+        * *valueNodata* - the value representing NoData in the land cover raster, or None
+
+    """
+
+    def __init__(self, lccObj, edgeWidth, landCoverClasses, zoneNodata=None, valueNodata=None):
+
+        self.edgeWidth = edgeWidth
+        self.landCoverClasses = landCoverClasses
+        self.valueNodata = valueNodata
+        self._excludedValueIds = numpy.array(sorted(lccObj.values.getExcludedValueIds()))
+        self._classValueIds = [numpy.array(sorted(landCoverClass.uniqueValueIds or ()))
+                               for landCoverClass in landCoverClasses]
+
+        # One tabulator for all classes, keyed by class index * 3 + category
+        self._tabulator = zonal.ZonalTabulator(zoneNodata, -1)
+
+    def addBlock(self, zones, window):
+        """ Tabulate the cells in the core of a :py:class:`pylet.numpyutil.raster.RasterWindow` of land cover.
+
+        **Arguments:**
+
+            * *zones* - 2-D NumPy array of zone ids, the shape of the core of the window
+            * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` with a halo of at least edgeWidth cells
+
+        **Returns:**
+
+            * None
+
+        """
+
+        block = window.array
+        valid = zonal.getValidMask(block, self.valueNodata)
+        if valid is None:
+            valid = numpy.ones(block.shape, dtype=bool)
+        effective = valid & ~numpy.in1d(block, self._excludedValueIds).reshape(block.shape)
+
+        categories = numpy.empty((len(self.landCoverClasses),) + window.core.shape, dtype=numpy.int32)
+
+        for classIndex, classValueIds in enumerate(self._classValueIds):
+            inClass = numpy.in1d(block, classValueIds).reshape(block.shape) & effective
+            edgeNear = getNeighborCounts(valid & ~inClass, self.edgeWidth) > 0
+
+            category = numpy.where(inClass, numpy.where(edgeNear, EDGE, CORE), OTHER) + classIndex * 3
+            category[~effective] = -1
+            categories[classIndex] = category[window.coreSlices]
+
+        zones = numpy.asarray(zones)
+        self._tabulator.addBlock(numpy.broadcast_to(zones, categories.shape), categories)
+
+    def getCounts(self):
+        """ Get the zone ids and a zones by (classes x 3) count matrix, with other, core and edge for each class """
+
+        zonalCounts = self._tabulator.getCounts()
+
+        return zonalCounts.zoneIds, zonalCounts.getValueIdColumns(len(self.landCoverClasses) * 3)
+
+
+def tabulateCoreEdge(zoneRaster, landCoverRaster, lccObj, edgeWidth=1, classIds=None, cellArea=1.0,
+                     blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None,
+                     valueNodata=None, fieldPrefix=''):
+    """ Compute the core, edge and other area of land cover classes within each zone, one block at a time.
+
+    **Description:**
+
+        See the module description for the definition of core and edge cells.  Both rasters must be on the same grid.
+        If the NoData values are not provided, the nodata of each :py:class:`pylet.numpyutil.raster.RasterGrid` is used.
+
+        Classes are named by their caemField attribute in the LCC file, or by *fieldPrefix* followed by the classId,
+        and each class has one field per category, named with :py:data:`CATEGORY_SUFFIXES`.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *edgeWidth* - width of the edge in cells
+        * *classIds* - `list` of classIds, by default all classes in LCC order
+        * *cellArea* - area of a single cell in the output area units
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *zoneNodata* - the value representing NoData in the zone raster
+        * *valueNodata* - the value representing NoData in the land cover raster
+        * *fieldPrefix* - prefix for class field names without a caemField attribute
+
+    **Returns:**
+
+        * NumPy array - zone ids in ascending order
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array of areas, one element per zone, as
+          the value
+
+    """
+
+    zoneArray, valueArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster)
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+
+    if classIds is None:
+        landCoverClasses = lcp.getOrderedClasses(lccObj)
+    else:
+        landCoverClasses = [lccObj.classes[classId] for classId in classIds]
+
+    tabulator = CoreEdgeTabulator(lccObj, edgeWidth, landCoverClasses, zoneNodata, valueNodata)
+
+    for window in raster.iterateBlocks(valueArray, blockRows, blockColumns, halo=edgeWidth):
+        tabulator.addBlock(window.readCore(zoneArray), window)
+
+    zoneIds, counts = tabulator.getCounts()
+
+    columns = OrderedDict()
+    for classIndex, landCoverClass in enumerate(landCoverClasses):
+        fieldName = lcp.getClassFieldName(landCoverClass, constants.XmlAttributeCaemField, fieldPrefix)
+        for category, suffix in enumerate(CATEGORY_SUFFIXES):
+            columns[fieldName + suffix] = counts[:, classIndex * 3 + category] * float(cellArea)
+
+    return zoneIds, columns
@@ -0,0 +1,208 @@
+""" This module contains an exact Euclidean distance transform for finding the distance to the nearest feature cell.
+
+    The transform is the separable algorithm of `Felzenszwalb and Huttenlocher`_.  Squared distances are found along
+    each column, then along each row as the lower envelope of parabolas rooted at each cell, which takes linear time
+    in the number of cells.  Distances are measured between cell centers in map units, so cells do not need to be
+    square.
+
+    Each step of the envelope is computed for all rows, or all columns, of an array at once, so the Python loop runs
+    once per column, or per row, rather than once per cell.
+
+    .. _Felzenszwalb and Huttenlocher: http://cs.brown.edu/~pff/papers/dt-final.pdf
+
+"""
+
+import math
+import numpy
+import raster
+import zonal
+import units
+
+
+def getLowerEnvelope(squaredDistances, spacing=1.0):
+    """ Get the one-dimensional squared distance transform of each row of a 2-D array.
+
+    **Description:**
+
+        For each cell q of a row the result is the minimum over cells p of ((q - p) * spacing) ** 2 + f(p), where f
+        is the row of *squaredDistances*.  Use numpy.inf for cells which are not features.  Rows without any finite
+        value are numpy.inf throughout.
+
+    **Arguments:**
+
+        * *squaredDistances* - 2-D NumPy float64 array
+        * *spacing* - distance between neighboring cells of a row
+
+    **Returns:**
+
+        * 2-D NumPy float64 array of the same shape
+
+    """
+
+    lineCount, length = squaredDistances.shape
+    positions = numpy.arange(length) * float(spacing)
+    rootValues = squaredDistances + positions ** 2
+
+    # The parabolas of the envelope of each row, and the boundaries between them
+    vertices = numpy.zeros((lineCount, length), dtype=numpy.intp)
+    boundaries = numpy.empty((lineCount, length + 1), dtype=numpy.float64)
+    lastIndexes = numpy.empty(lineCount, dtype=numpy.intp)
+    lastIndexes.fill(-1)
+    intersections = numpy.empty(lineCount, dtype=numpy.float64)
+
+    for q in range(length):
+        rows = numpy.flatnonzero(numpy.isfinite(squaredDistances[:, q]))
+        intersections[rows] = -numpy.inf
+
+        # Pop the parabolas hidden by the new one, until the intersection is past the last boundary
+        pending = rows[lastIndexes[rows] >= 0]
+        while pending.size:
+            lastVertices = vertices[pending, lastIndexes[pending]]
+            crossings = ((rootValues[pending, q] - rootValues[pending, lastVertices]) /
+                         (2.0 * (positions[q] - positions[lastVertices])))
+            hidden = crossings <= boundaries[pending, lastIndexes[pending]]
+            intersections[pending[~hidden]] = crossings[~hidden]
+            lastIndexes[pending[hidden]] -= 1
+            pending = pending[hidden]
+            pending = pending[lastIndexes[pending] >= 0]
+
+        lastIndexes[rows] += 1
+        vertices[rows, lastIndexes[rows]] = q
+        boundaries[rows, lastIndexes[rows]] = intersections[rows]
+        boundaries[rows, lastIndexes[rows] + 1] = numpy.inf
+
+    result = numpy.empty(squaredDistances.shape, dtype=numpy.float64)
+    result.fill(numpy.inf)
+    rows = numpy.flatnonzero(lastIndexes >= 0)
+    current = numpy.zeros(len(rows), dtype=numpy.intp)
+
+    for q in range(length):
+        while True:
+            advance = boundaries[rows, current + 1] < positions[q]
+            if not advance.any():
+                break
+            current[advance] += 1
+        nearest = vertices[rows, current]
+        result[rows, q] = (positions[q] - positions[nearest]) ** 2 + squaredDistances[rows, nearest]
+
+    return result
+
+
+def euclideanDistance(featureMask, cellWidth=1.0, cellHeight=None):
+    """ Get the exact Euclidean distance from each cell to the nearest feature cell of a 2-D boolean array.
+
+    **Description:**
+
+        Distances are between cell centers, using *cellWidth* along rows and *cellHeight* along columns.  Feature
+        cells have a distance of 0, and all cells are numpy.inf if there are no feature cells.
+
+    **Arguments:**
+
+        * *featureMask* - 2-D NumPy boolean array, True for feature cells
+        * *cellWidth* - width of a cell
+        * *cellHeight* - height of a cell, the same as cellWidth if None
+
+    **Returns:**
+
+        * 2-D NumPy float64 array of the same shape
+
+    """
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    squaredDistances = numpy.where(featureMask, 0.0, numpy.inf)
+    squaredDistances = getLowerEnvelope(squaredDistances.T, cellHeight).T
+    squaredDistances = getLowerEnvelope(squaredDistances, cellWidth)
+
+    return numpy.sqrt(squaredDistances)
+
+
+def getFeatureMask(values, featureValues=None, nodata=None):
+    """ Get a boolean array of the cells with a value in featureValues, or of all valid non-zero cells if it is None """
+
+    if featureValues is None:
+        featureMask = values != 0
+    else:
+        featureMask = numpy.in1d(values, featureValues).reshape(values.shape)
+
+    validMask = zonal.getValidMask(values, nodata)
+    if validMask is not None:
+        featureMask &= validMask
+
+    return featureMask
+
+
+def distanceToFeatures(inRaster, featureValues=None, maxDistance=None, linearUnits=None, cellWidth=None,
+                       cellHeight=None, blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE,
+                       nodata=None, output=None):
+    """ Compute the distance from each cell to the nearest feature cell of a raster, such as a road or stream.
+
+    **Description:**
+
+        Feature cells are the cells with a value in *featureValues*, or all valid non-zero cells if it is None.  NoData
+        cells are not features, but distances are still computed for them.
+
+        Distances are in map units, or in meters if *linearUnits* is provided, see
+        :py:func:`pylet.numpyutil.units.getMeterConversionFactor`.  The cell size is taken from a
+        :py:class:`pylet.numpyutil.raster.RasterGrid`, or from *cellWidth* and *cellHeight*, 1 by default.
+
+        Without *maxDistance* the whole raster is transformed at once.  With *maxDistance*, in the output units, the
+        raster is transformed one block at a time, with a halo wide enough to hold any feature within *maxDistance*,
+        so every distance up to *maxDistance* is exact.  Cells farther than *maxDistance* from every feature are
+        numpy.inf.
+
+        If *output* is not provided, an in-memory array is created.  To keep the output out of memory, use
+        *maxDistance* and provide a writable `numpy.memmap`_ array of the raster shape, or another object written by
+        slicing, such as a :py:class:`pylet.numpyutil.rasterwriter.RasterWriter`.  Without *maxDistance* the whole
+        raster is transformed in memory before it is written to *output*.
+
+        .. _numpy.memmap: http://docs.scipy.org/doc/numpy/reference/generated/numpy.memmap.html
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *featureValues* - optional sequence of feature values
+        * *maxDistance* - optional largest distance needed, in the output units
+        * *linearUnits* - optional factor or ArcGIS linear unit name for converting map units to meters
+        * *cellWidth*, *cellHeight* - optional cell size in map units
+        * *blockRows*, *blockColumns* - size of the blocks transformed at once, not including the halo
+        * *nodata* - the value representing NoData
+        * *output* - optional 2-D array to write the distances into
+
+    **Returns:**
+
+        * 2-D NumPy float64 array, or *output*
+
+    """
+
+    cellWidth = float(cellWidth or getattr(inRaster, 'cellWidth', None) or 1.0)
+    cellHeight = float(cellHeight or getattr(inRaster, 'cellHeight', None) or cellWidth)
+    if nodata is None:
+        nodata = getattr(inRaster, 'nodata', None)
+
+    unitFactor = 1.0 if linearUnits is None else units.getMeterConversionFactor(linearUnits)
+    cellWidth *= unitFactor
+    cellHeight *= unitFactor
+
+    array = raster.getRasterArray(inRaster)
+
+    if maxDistance is None:
+        # Sliced whole, as the raster may be any object sliced like an array
+        distances = euclideanDistance(getFeatureMask(array[:, :], featureValues, nodata), cellWidth, cellHeight)
+        if output is None:
+            return distances
+        raster.RasterWindow(0, 0, array.shape[0], array.shape[1]).writeCore(output, distances)
+        return output
+
+    halo = int(math.ceil(maxDistance / min(cellWidth, cellHeight)))
+    if output is None:
+        output = numpy.empty(array.shape, dtype=numpy.float64)
+
+    for window in raster.iterateBlocks(inRaster, blockRows, blockColumns, halo=halo):
+        featureMask = getFeatureMask(window.array, featureValues, nodata)
+        distances = euclideanDistance(featureMask, cellWidth, cellHeight)[window.coreSlices]
+        distances[distances > maxDistance] = numpy.inf
+        window.writeCore(output, distances)
+
+    return output
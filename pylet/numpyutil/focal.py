@@ -0,0 +1,278 @@
+""" This module contains a focal engine for moving window statistics, built on summed-area tables.
+
+    A summed-area table, or integral image, holds the sum of all cells above and to the left of each cell, so the sum
+    of any rectangular window is found from four of its entries.  The cost per cell is the same for a 3 x 3 window as
+    for a 33 x 33 window.
+
+    Rasters are read block by block with a halo of half the window size, using
+    :py:func:`pylet.numpyutil.raster.iterateBlocks`, so the windows of cells near block edges are exact.  Windows are
+    clipped at the edges of the raster, and NoData cells are left out of every window.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+import raster
+import zonal
+import reclass
+
+#: Statistics for numeric rasters, see :py:func:`focalStatistics`
+VALUE_STATISTICS = ('SUM', 'MEAN')
+
+#: Statistics for land cover classes, see :py:func:`focalClassStatistics`
+CLASS_STATISTICS = ('SUM', 'PROPORTION', 'MAJORITY')
+
+
+def getIntegralImage(layers):
+    """ Get the summed-area table of each layer of a NumPy array, over its last two axes.
+
+    **Description:**
+
+        The table has one more row and column than the layer, with zeros in the first row and column, so entry (r, c)
+        is the sum of all cells in rows before r and columns before c.  Boolean and integer layers are summed as int64
+        and floating point layers as float64.
+
+    **Arguments:**
+
+        * *layers* - NumPy array with rows and columns as the last two axes
+
+    **Returns:**
+
+        * NumPy array of the same number of dimensions
+
+    """
+
+    layers = numpy.asarray(layers)
+    dtype = numpy.float64 if layers.dtype.kind == 'f' else numpy.int64
+
+    integral = numpy.zeros(layers.shape[:-2] + (layers.shape[-2] + 1, layers.shape[-1] + 1), dtype=dtype)
+    numpy.cumsum(layers, axis=-2, dtype=dtype, out=integral[..., 1:, 1:])
+    numpy.cumsum(integral[..., 1:, 1:], axis=-1, out=integral[..., 1:, 1:])
+
+    return integral
+
+
+def getWindowSums(integral, rowRadius, columnRadius, coreSlices=None):
+    """ Get the sum of the window around each cell from a summed-area table from :py:func:`getIntegralImage`.
+
+    **Description:**
+
+        Each window extends *rowRadius* rows and *columnRadius* columns from its cell, clipped at the edges of the
+        table.  If *coreSlices* is provided, only the cells it selects are summed, for example the core of a
+        :py:class:`pylet.numpyutil.raster.RasterWindow`.
+
+    **Arguments:**
+
+        * *integral* - NumPy array of summed-area tables over the last two axes
+        * *rowRadius*, *columnRadius* - number of rows and columns on each side of the cell
+        * *coreSlices* - optional (row slice, column slice) tuple of the cells to sum
+
+    **Returns:**
+
+        * NumPy array of window sums
+
+    """
+
+    rowCount = integral.shape[-2] - 1
+    columnCount = integral.shape[-1] - 1
+    rowSlice, columnSlice = coreSlices or (slice(None), slice(None))
+
+    rows = numpy.arange(rowCount)[rowSlice]
+    columns = numpy.arange(columnCount)[columnSlice]
+    tops = numpy.maximum(rows - rowRadius, 0)[:, numpy.newaxis]
+    bottoms = numpy.minimum(rows + rowRadius + 1, rowCount)[:, numpy.newaxis]
+    lefts = numpy.maximum(columns - columnRadius, 0)[numpy.newaxis, :]
+    rights = numpy.minimum(columns + columnRadius + 1, columnCount)[numpy.newaxis, :]
+
+    return (integral[..., bottoms, rights] - integral[..., tops, rights] - integral[..., bottoms, lefts] +
+            integral[..., tops, lefts])
+
+
+def _getRadii(windowRows, windowColumns):
+    """ Returns the row and column radius for a window size, raising a ValueError for even sizes """
+
+    if windowColumns is None:
+        windowColumns = windowRows
+
+    if windowRows % 2 == 0 or windowColumns % 2 == 0:
+        raise ValueError("Window sizes must be odd, found {0} x {1}".format(windowRows, windowColumns))
+
+    return windowRows // 2, windowColumns // 2
+
+
+def focalStatistics(inRaster, statistic='MEAN', windowRows=3, windowColumns=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                    blockColumns=raster.DEFAULT_BLOCK_SIZE, nodata=None, mask=None, output=None):
+    """ Compute the sum or mean of the values in a rectangular window around each cell.
+
+    **Description:**
+
+        The *statistic* is one of :py:data:`VALUE_STATISTICS`.  Cells whose window holds no valid cell are NaN.  If
+        *nodata* is not provided, the nodata of a :py:class:`pylet.numpyutil.raster.RasterGrid` is used.  Cells set in
+        *mask* are treated as NoData.
+
+        If *output* is not provided, an in-memory array is created.  To keep the output out of memory, provide a
+        writable `numpy.memmap`_ array of the raster shape, or another object written by slicing, such as a
+        :py:class:`pylet.numpyutil.rasterwriter.RasterWriter` streaming the output to a tiled grid.
+
+        .. _numpy.memmap: http://docs.scipy.org/doc/numpy/reference/generated/numpy.memmap.html
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *statistic* - 'SUM' or 'MEAN'
+        * *windowRows*, *windowColumns* - odd size of the window in cells, square if windowColumns is None
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *nodata* - the value representing NoData
+        * *mask* - optional :py:class:`pylet.numpyutil.masks.PackedMask` of cells to leave out
+        * *output* - optional 2-D array to write the results into
+
+    **Returns:**
+
+        * 2-D NumPy float64 array, or *output*
+
+    """
+
+    if statistic not in VALUE_STATISTICS:
+        raise ValueError("Unknown statistic {0!r}, expected one of {1}".format(statistic, VALUE_STATISTICS))
+
+    rowRadius, columnRadius = _getRadii(windowRows, windowColumns)
+    if nodata is None:
+        nodata = getattr(inRaster, 'nodata', None)
+
+    if output is None:
+        output = numpy.empty(raster.getRasterArray(inRaster).shape, dtype=numpy.float64)
+
+    for window in raster.iterateBlocks(inRaster, blockRows, blockColumns, halo=max(rowRadius, columnRadius)):
+        block = window.array
+        valid = zonal.getValidMask(block, nodata)
+        if valid is None:
+            valid = numpy.ones(block.shape, dtype=bool)
+        if mask is not None:
+            valid &= ~mask.read(window)
+
+        layers = numpy.array([numpy.where(valid, block, 0).astype(numpy.float64), valid])
+        sums, counts = getWindowSums(getIntegralImage(layers), rowRadius, columnRadius, window.coreSlices)
+
+        if statistic == 'MEAN':
+            sums = sums / numpy.where(counts > 0, counts, 1)
+        sums[counts == 0] = numpy.nan
+        window.writeCore(output, sums)
+
+    return output
+
+
+def focalClassStatistics(landCoverRaster, lccObj, classIds, statistics=('PROPORTION',), windowRows=3,
+                         windowColumns=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                         blockColumns=raster.DEFAULT_BLOCK_SIZE, nodata=None, mask=None, outputs=None):
+    """ Compute moving window statistics for several land cover classes in one pass.
+
+    **Description:**
+
+        Each class is a layer of 1 for its values and 0 otherwise, and the summed-area tables of all layers are built
+        together for each block.  The *statistics* are any of :py:data:`CLASS_STATISTICS`:
+
+        * SUM - the number of cells of the class in the window, as float64, with the key classId + '_SUM'
+        * PROPORTION - the percentage of the effective cells in the window in the class, as float64, with the classId
+          as the key.  Excluded values do not count toward the effective cells, as in
+          :py:func:`pylet.numpyutil.lcp.getLandCoverProportions`.
+        * MAJORITY - the one based position in classIds of the class with the most cells in the window, with ties
+          going to the first class, or :py:data:`pylet.numpyutil.reclass.NOT_IN_CLASS` if there is none, as uint8 or
+          uint16 with the key 'MAJORITY'
+
+        Percentages are NaN for windows without effective cells.  If *nodata* is not provided, the nodata of a
+        :py:class:`pylet.numpyutil.raster.RasterGrid` is used.  If *mask* is provided, its unset cells are the
+        effective cells, instead of deriving them from the values of each block, so pass nodataMask | excludedMask from
+        :py:func:`pylet.numpyutil.masks.getLandCoverMasks`.
+
+        Outputs not in *outputs* are created in memory.  To keep them out of memory, provide a `dict` with the output
+        name as the key and a writable array of the raster shape as the value, as for the *output* of
+        :py:func:`focalStatistics`.
+
+    **Arguments:**
+
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *classIds* - `list` of classIds
+        * *statistics* - sequence of statistic names
+        * *windowRows*, *windowColumns* - odd size of the window in cells, square if windowColumns is None
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *nodata* - the value representing NoData in the land cover raster
+        * *mask* - optional :py:class:`pylet.numpyutil.masks.PackedMask` of cells which are not effective
+        * *outputs* - optional `dict` of 2-D arrays to write the results into, by output name
+
+    **Returns:**
+
+        * `OrderedDict`_ - output name as the key and a 2-D NumPy array of the raster shape as the value
+
+    """
+
+    for statistic in statistics:
+        if statistic not in CLASS_STATISTICS:
+            raise ValueError("Unknown statistic {0!r}, expected one of {1}".format(statistic, CLASS_STATISTICS))
+
+    rowRadius, columnRadius = _getRadii(windowRows, windowColumns)
+    if nodata is None:
+        nodata = getattr(landCoverRaster, 'nodata', None)
+
+    shape = raster.getRasterArray(landCoverRaster).shape
+    excludedValueIds = numpy.array(sorted(lccObj.values.getExcludedValueIds()))
+    classValueIds = [numpy.array(sorted(lccObj.classes[classId].uniqueValueIds or ())) for classId in classIds]
+
+    outputTypes = OrderedDict()
+    for classId in classIds:
+        if 'SUM' in statistics:
+            outputTypes[classId + '_SUM'] = numpy.float64
+        if 'PROPORTION' in statistics:
+            outputTypes[classId] = numpy.float64
+    if 'MAJORITY' in statistics:
+        outputTypes['MAJORITY'] = numpy.uint8 if len(classIds) < numpy.iinfo(numpy.uint8).max else numpy.uint16
+
+    providedOutputs = outputs or {}
+    outputs = OrderedDict()
+    for name, outputType in outputTypes.items():
+        if providedOutputs.get(name) is not None:
+            outputs[name] = providedOutputs[name]
+        else:
+            outputs[name] = numpy.empty(shape, dtype=outputType)
+
+    for window in raster.iterateBlocks(landCoverRaster, blockRows, blockColumns, halo=max(rowRadius, columnRadius)):
+        block = window.array
+        if mask is not None:
+            effective = ~mask.read(window)
+        else:
+            effective = numpy.in1d(block, excludedValueIds, invert=True).reshape(block.shape)
+            valid = zonal.getValidMask(block, nodata)
+            if valid is not None:
+                effective &= valid
+
+        # The class layers and the effective layer, summed together
+        layers = numpy.empty((len(classIds) + 1,) + block.shape, dtype=bool)
+        for classIndex, valueIds in enumerate(classValueIds):
+            layers[classIndex] = numpy.in1d(block, valueIds).reshape(block.shape) & effective
+        layers[-1] = effective
+
+        sums = getWindowSums(getIntegralImage(layers), rowRadius, columnRadius, window.coreSlices)
+        classSums = sums[:-1]
+        effectiveSums = sums[-1]
+        noEffective = effectiveSums == 0
+        divisor = numpy.where(noEffective, 1, effectiveSums)
+
+        for classIndex, classId in enumerate(classIds):
+            if 'SUM' in statistics:
+                window.writeCore(outputs[classId + '_SUM'], classSums[classIndex])
+            if 'PROPORTION' in statistics:
+                percentages = classSums[classIndex] * 100.0 / divisor
+                percentages[noEffective] = numpy.nan
+                window.writeCore(outputs[classId], percentages)
+
+        if 'MAJORITY' in statistics:
+            if classIds:
+                majority = numpy.argmax(classSums, axis=0) + 1
+                majority[classSums.max(axis=0) == 0] = reclass.NOT_IN_CLASS
+            else:
+                majority = numpy.full(effectiveSums.shape, reclass.NOT_IN_CLASS, dtype=outputTypes['MAJORITY'])
+            window.writeCore(outputs['MAJORITY'], majority)
+
+    return outputs
@@ -0,0 +1,218 @@
+""" This module contains an affine transform between raster row and column indexes and map coordinates.
+
+    Rows and columns are zero based and start in the upper left corner of the raster.  Rows increase downward, so the
+    y coordinate decreases as the row increases.  Rasters are assumed to be north up, without rotation.
+
+    Extents are aligned to the cells of a grid with :py:func:`getAlignedExtent`.
+
+"""
+
+import math
+import numpy
+
+
+class GeoTransform(object):
+    """ This class converts between zero based row and column indexes and map coordinates for a raster.
+
+    **Description:**
+
+        All conversions accept scalars or NumPy arrays of any shape, and convert every element in one vectorized
+        operation.  Use :py:meth:`fromRaster` or :py:meth:`fromExtent` to create this object.
+
+        Map coordinates can refer to the center of a cell or to its upper left corner, controlled by the *cellCenter*
+        argument of each method.
+
+    **Arguments:**
+
+        * *xMin* - x coordinate of the left edge of the raster
+        * *yMax* - y coordinate of the top edge of the raster
+        * *cellWidth* - width of a cell in map units
+        * *cellHeight* - height of a cell in map units, a positive number
+
+    """
+
+    def __init__(self, xMin, yMax, cellWidth, cellHeight):
+
+        self.xMin = float(xMin)
+        self.yMax = float(yMax)
+        self.cellWidth = float(cellWidth)
+        self.cellHeight = float(cellHeight)
+
+    def __repr__(self):
+        return "GeoTransform({0!r}, {1!r}, {2!r}, {3!r})".format(self.xMin, self.yMax, self.cellWidth, self.cellHeight)
+
+    def __eq__(self, other):
+        return isinstance(other, GeoTransform) and self.asGdal() == other.asGdal()
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def fromExtent(cls, extent, cellWidth, cellHeight=None):
+        """ Create a :py:class:`GeoTransform` from an extent and a cell size.
+
+        **Description:**
+
+            The *extent* may be a (XMin, YMin, XMax, YMax) tuple or any object with XMin and YMax attributes, such as
+            an arcpy `Extent`_ object.  If *cellHeight* is not provided, cells are square.
+
+            .. _Extent: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/Extent/000v000000p4000000/
+
+        **Arguments:**
+
+            * *extent* - extent of the raster
+            * *cellWidth* - width of a cell in map units
+            * *cellHeight* - height of a cell in map units
+
+        **Returns:**
+
+            * :py:class:`GeoTransform`
+
+        """
+
+        if cellHeight is None:
+            cellHeight = cellWidth
+
+        if hasattr(extent, 'XMin'):
+            return cls(extent.XMin, extent.YMax, cellWidth, cellHeight)
+        else:
+            return cls(extent[0], extent[3], cellWidth, cellHeight)
+
+    @classmethod
+    def fromRaster(cls, raster):
+        """ Create a :py:class:`GeoTransform` from a raster object.
+
+        **Description:**
+
+            The *raster* may be a :py:class:`pylet.numpyutil.raster.RasterGrid` object or an arcpy `Raster`_ object.
+
+            .. _Raster: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/Raster/000v000000wt000000/
+
+        **Arguments:**
+
+            * *raster* - raster object with an extent and cell size
+
+        **Returns:**
+
+            * :py:class:`GeoTransform`
+
+        """
+
+        if hasattr(raster, 'meanCellWidth'):
+            return cls.fromExtent(raster.extent, raster.meanCellWidth, raster.meanCellHeight)
+        else:
+            return cls.fromExtent(raster.extent, raster.cellWidth, raster.cellHeight)
+
+    def asGdal(self):
+        """ Get the GDAL style (XMin, cellWidth, 0, YMax, 0, -cellHeight) tuple for this transform """
+        return (self.xMin, self.cellWidth, 0.0, self.yMax, 0.0, -self.cellHeight)
+
+    def getWindowTransform(self, row, column):
+        """ Get the :py:class:`GeoTransform` for a window whose upper left cell is at the given row and column """
+        return GeoTransform(self.xMin + column * self.cellWidth, self.yMax - row * self.cellHeight,
+                            self.cellWidth, self.cellHeight)
+
+    def toMap(self, rows, columns, cellCenter=True):
+        """ Convert zero based row and column indexes to map coordinates.
+
+        **Description:**
+
+            If *cellCenter* is True, the coordinates of the center of each cell are returned, otherwise the coordinates
+            of the upper left corner of each cell.
+
+        **Arguments:**
+
+            * *rows* - integer or NumPy array of row indexes
+            * *columns* - integer or NumPy array of column indexes, the same shape as rows
+            * *cellCenter* - boolean to return cell centers instead of upper left corners
+
+        **Returns:**
+
+            * tuple - (x, y) as floats or NumPy float64 arrays
+
+        """
+
+        offset = 0.5 if cellCenter else 0.0
+
+        x = self.xMin + (numpy.asarray(columns, dtype=numpy.float64) + offset) * self.cellWidth
+        y = self.yMax - (numpy.asarray(rows, dtype=numpy.float64) + offset) * self.cellHeight
+
+        return x, y
+
+    def toRowColumn(self, x, y, cellCenter=None):
+        """ Convert map coordinates to zero based row and column indexes.
+
+        **Description:**
+
+            By default the indexes of the cell containing each coordinate are returned, which is the inverse of
+            :py:meth:`toMap` for either convention.  When the coordinates are known to be cell centers or upper left
+            corners, set *cellCenter* to True or False to round to the nearest cell instead, which is not affected by
+            floating point error at cell edges.
+
+            Indexes are not checked against the size of the raster, so coordinates outside the raster give negative
+            indexes or indexes past the last row or column.
+
+        **Arguments:**
+
+            * *x* - float or NumPy array of x coordinates
+            * *y* - float or NumPy array of y coordinates, the same shape as x
+            * *cellCenter* - None for any coordinate, True for cell centers, False for upper left corners
+
+        **Returns:**
+
+            * tuple - (rows, columns) as NumPy int64 arrays
+
+        """
+
+        columns = (numpy.asarray(x, dtype=numpy.float64) - self.xMin) / self.cellWidth
+        rows = (self.yMax - numpy.asarray(y, dtype=numpy.float64)) / self.cellHeight
+
+        if cellCenter is None:
+            rows = numpy.floor(rows)
+            columns = numpy.floor(columns)
+        else:
+            offset = 0.5 if cellCenter else 0.0
+            rows = numpy.round(rows - offset)
+            columns = numpy.round(columns - offset)
+
+        return rows.astype(numpy.int64), columns.astype(numpy.int64)
+
+
+def getAlignedExtent(geoTransform, extents):
+    """ Get the extent of the intersection of several extents, expanded out to the cell boundaries of a grid.
+
+    **Description:**
+
+        This is the NumPy equivalent of :py:func:`pylet.arcpyutil.environment.getAlignedExtent`.  Each extent is a
+        (XMin, YMin, XMax, YMax) tuple or an object with XMin, YMin, XMax and YMax attributes.  Include the extent of
+        the grid itself to keep the result within the grid.
+
+    **Arguments:**
+
+        * *geoTransform* - :py:class:`GeoTransform` of the grid to align to
+        * *extents* - sequence of extents
+
+    **Returns:**
+
+        * tuple - (XMin, YMin, XMax, YMax) of the aligned extent
+
+    """
+
+    coords = [(extent.XMin, extent.YMin, extent.XMax, extent.YMax) if hasattr(extent, 'XMin') else tuple(extent)
+              for extent in extents]
+
+    xMin = max([coord[0] for coord in coords])
+    yMin = max([coord[1] for coord in coords])
+    xMax = min([coord[2] for coord in coords])
+    yMax = min([coord[3] for coord in coords])
+
+    cellWidth = geoTransform.cellWidth
+    cellHeight = geoTransform.cellHeight
+
+    alignedXMin = ((xMin - geoTransform.xMin) // cellWidth) * cellWidth + geoTransform.xMin
+    alignedXMax = math.ceil((xMax - geoTransform.xMin) / cellWidth) * cellWidth + geoTransform.xMin
+    alignedYMin = geoTransform.yMax - math.ceil((geoTransform.yMax - yMin) / cellHeight) * cellHeight
+    alignedYMax = geoTransform.yMax - ((geoTransform.yMax - yMax) // cellHeight) * cellHeight
+
+    return (alignedXMin, alignedYMin, alignedXMax, alignedYMax)
+
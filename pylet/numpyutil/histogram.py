@@ -0,0 +1,217 @@
+""" This module contains utilities for counting the cells of each value in a raster, block by block.
+
+    .. _frozenset: http://docs.python.org/library/stdtypes.html#frozenset
+
+"""
+
+import numpy
+import raster
+
+#: Largest range of integer values counted with a dense array, larger ranges are counted in a dictionary
+MAX_DENSE_RANGE = 2**20
+
+
+class ValueHistogram(object):
+    """ This class accumulates the number of cells for each value over any number of raster blocks.
+
+    **Description:**
+
+        Integer values are counted with `numpy.bincount`_ into a dense array covering the range of values seen so far.
+        If a block would widen that range beyond :py:data:`MAX_DENSE_RANGE`, or the values are floating point, the
+        block is counted into a dictionary instead, so sparse values spread over a large range do not require a large
+        array.  Cells equal to *nodata*, and NaN cells, are counted separately.
+
+        .. _numpy.bincount: http://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+
+    **Arguments:**
+
+        * *nodata* - the value representing NoData, or None
+
+    """
+
+    #: The value representing NoData, or None
+    nodata = None
+
+    #: The number of NoData and NaN cells counted
+    nodataCount = 0
+
+    def __init__(self, nodata=None):
+
+        self.nodata = nodata
+        self.nodataCount = 0
+        self._denseOffset = None
+        self._denseCounts = None
+        self._sparseCounts = {}
+
+    def addBlock(self, array):
+        """ Count the cells of each value in a NumPy array and add them to the histogram """
+
+        values = numpy.asarray(array).ravel()
+
+        if self.nodata is not None:
+            values = values[values != self.nodata]
+        if values.dtype.kind == 'f':
+            values = values[~numpy.isnan(values)]
+        self.nodataCount += array.size - values.size
+
+        if not values.size:
+            return
+
+        if values.dtype.kind in 'iub':
+            minValue = int(values.min())
+            maxValue = int(values.max())
+
+            if self._denseCounts is not None:
+                minValue = min(minValue, self._denseOffset)
+                maxValue = max(maxValue, self._denseOffset + len(self._denseCounts) - 1)
+
+            if maxValue - minValue < MAX_DENSE_RANGE:
+                self._growDenseCounts(minValue, maxValue)
+                self._denseCounts += numpy.bincount(values.astype(numpy.int64) - self._denseOffset,
+                                                    minlength=len(self._denseCounts))
+                return
+
+        uniqueValues, inverse = numpy.unique(values, return_inverse=True)
+        for value, count in zip(uniqueValues.tolist(), numpy.bincount(inverse).tolist()):
+            self._sparseCounts[value] = self._sparseCounts.get(value, 0) + count
+
+    def _growDenseCounts(self, minValue, maxValue):
+        """ Extends the dense count array to cover minValue through maxValue """
+
+        if self._denseCounts is None:
+            self._denseOffset = minValue
+            self._denseCounts = numpy.zeros(maxValue - minValue + 1, dtype=numpy.int64)
+        elif minValue < self._denseOffset or maxValue >= self._denseOffset + len(self._denseCounts):
+            denseCounts = numpy.zeros(maxValue - minValue + 1, dtype=numpy.int64)
+            start = self._denseOffset - minValue
+            denseCounts[start:start + len(self._denseCounts)] = self._denseCounts
+            self._denseOffset = minValue
+            self._denseCounts = denseCounts
+
+    def getValuesAndCounts(self):
+        """ Get the unique values and the number of cells for each.
+
+        **Description:**
+
+            Only values with at least one cell are returned, sorted in ascending order.
+
+        **Arguments:**
+
+            * Not applicable
+
+        **Returns:**
+
+            * NumPy array - unique values
+            * NumPy array - int64 cell counts for each value
+
+        """
+
+        counts = dict(self._sparseCounts)
+
+        if self._denseCounts is not None:
+            denseIndexes = numpy.flatnonzero(self._denseCounts)
+            for value, count in zip((denseIndexes + self._denseOffset).tolist(),
+                                    self._denseCounts[denseIndexes].tolist()):
+                counts[value] = counts.get(value, 0) + count
+
+        values = sorted(counts.keys())
+
+        return numpy.array(values), numpy.array([counts[value] for value in values], dtype=numpy.int64)
+
+    def getUndefinedValueIds(self, lccObj):
+        """ Get a `frozenset`_ of values counted which are not defined in a Land Cover Classification, see
+        :py:func:`getUndefinedValueIds` """
+        return getUndefinedValueIds(self.getValuesAndCounts()[0], lccObj)
+
+
+def getUndefinedValueIds(values, lccObj):
+    """ Get a `frozenset`_ of values found in a raster which are not defined in a Land Cover Classification.
+
+    **Description:**
+
+        A value is defined if it appears in the values or classes of the :py:class:`pylet.lcc.LandCoverClassification`,
+        including values marked excluded.  If lccObj is None, the set is empty.
+
+    **Arguments:**
+
+        * *values* - sequence or NumPy array of the values found in the raster
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object, or None
+
+    **Returns:**
+
+        * `frozenset`_
+
+    """
+
+    if lccObj is None:
+        return frozenset()
+
+    definedValueIds = lccObj.getUniqueValueIdsWithExcludes()
+
+    return frozenset([value for value in numpy.asarray(values).tolist() if value not in definedValueIds])
+
+
+def getBlockValueHistogram(windows, nodata=None, lccObj=None):
+    """ Count the cells of each value in a sequence of raster blocks.
+
+    **Description:**
+
+        This counts blocks from any source, such as :py:func:`pylet.numpyutil.raster.iterateBlocks` or
+        :py:func:`pylet.arcpyutil.raster.iterateRasterBlocks`, and returns the same as :py:func:`getValueHistogram`.
+
+    **Arguments:**
+
+        * *windows* - iterable of :py:class:`pylet.numpyutil.raster.RasterWindow` objects holding their block in
+          *array*
+        * *nodata* - the value representing NoData, or None
+        * *lccObj* - optional :py:class:`pylet.lcc.LandCoverClassification` object
+
+    **Returns:**
+
+        * NumPy array - unique values in ascending order
+        * NumPy array - int64 cell counts for each value
+        * `frozenset`_ - values not defined in lccObj, empty if lccObj is None
+
+    """
+
+    histogram = ValueHistogram(nodata)
+
+    for window in windows:
+        histogram.addBlock(window.array)
+
+    values, counts = histogram.getValuesAndCounts()
+
+    return values, counts, getUndefinedValueIds(values, lccObj)
+
+
+def getValueHistogram(inRaster, lccObj=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                      blockColumns=raster.DEFAULT_BLOCK_SIZE, bandIndex=0):
+    """ Count the cells of each value in a raster, reading one block at a time.
+
+    **Description:**
+
+        This is the arcpy-free replacement for scanning the value attribute table of a raster, and works for rasters
+        without one.  NoData cells are not counted.  If a Land Cover Classification is provided, values found in the
+        raster which are not defined in it are reported, for warning the user.
+
+        Use :py:func:`getBlockValueHistogram` to count blocks from another source, such as
+        :py:func:`pylet.arcpyutil.raster.iterateRasterBlocks`.
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *lccObj* - optional :py:class:`pylet.lcc.LandCoverClassification` object
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *bandIndex* - zero based index of the band to count
+
+    **Returns:**
+
+        * NumPy array - unique values in ascending order
+        * NumPy array - int64 cell counts for each value
+        * `frozenset`_ - values not defined in lccObj, empty if lccObj is None
+
+    """
+
+    windows = raster.iterateBlocks(inRaster, blockRows, blockColumns, bandIndex=bandIndex)
+
+    return getBlockValueHistogram(windows, getattr(inRaster, 'nodata', None), lccObj)
@@ -0,0 +1,145 @@
+""" This module contains an engine for land cover on slopes (lcosp) metrics within zones.
+
+    The zone, land cover and slope rasters are read block by block in lockstep.  Each cell is marked as on or off slope
+    by a slope threshold, and the land cover value and slope flag are counted together for each zone, so the areas of
+    every class on and off slopes come from a single pass, without intermediate rasters.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+from pylet.lcc import constants
+import raster
+import zonal
+import lcp
+
+#: Default prefix added to the classId to name the land cover on slopes field for a class
+LCOSP_FIELD_PREFIX = 's'
+
+#: Suffixes added to the field name of a class for its area on and off slopes
+ON_SLOPE_SUFFIX = '_OnSlope'
+OFF_SLOPE_SUFFIX = '_OffSlope'
+
+# Key of cells without a valid value or slope
+_INVALID_KEY = numpy.iinfo(numpy.int64).min
+
+
+def tabulateSlopeArea(zoneRaster, landCoverRaster, slopeRaster, slopeThreshold, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                      blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None, valueNodata=None, slopeNodata=None):
+    """ Count the cells of each land cover value within each zone, separately on and off slopes, in one pass.
+
+    **Description:**
+
+        A cell is on slope if its slope is greater than or equal to *slopeThreshold*, in the units of the slope raster.
+        Cells with a NoData slope are not counted.  All rasters must be on the same grid.  If the NoData values are not
+        provided, the nodata of each :py:class:`pylet.numpyutil.raster.RasterGrid` is used.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *slopeRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of slopes
+        * *slopeThreshold* - smallest slope counted as on slope
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *zoneNodata*, *valueNodata*, *slopeNodata* - the values representing NoData in each raster
+
+    **Returns:**
+
+        * :py:class:`pylet.numpyutil.zonal.ZonalCounts` - counts on slopes
+        * :py:class:`pylet.numpyutil.zonal.ZonalCounts` - counts off slopes, with the same zones and values
+
+    """
+
+    zoneArray, valueArray, slopeArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster, slopeRaster)
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+    if slopeNodata is None:
+        slopeNodata = getattr(slopeRaster, 'nodata', None)
+
+    # The value and slope flag of each cell are counted together, as value * 2 + 1 on slopes and value * 2 off slopes
+    tabulator = zonal.ZonalTabulator(zoneNodata, _INVALID_KEY)
+
+    for window in raster.getBlockWindows(zoneArray.shape[0], zoneArray.shape[1], blockRows, blockColumns):
+        values = window.read(valueArray)
+        slopes = window.read(slopeArray)
+
+        keys = values.astype(numpy.int64) * 2 + (slopes >= slopeThreshold)
+        for validMask in (zonal.getValidMask(values, valueNodata), zonal.getValidMask(slopes, slopeNodata)):
+            if validMask is not None:
+                keys[~validMask] = _INVALID_KEY
+
+        tabulator.addBlock(window.read(zoneArray), keys)
+
+    keyCounts = tabulator.getCounts()
+    keys = keyCounts.valueIds.astype(numpy.int64)
+    valueIds, valueIndexes = numpy.unique(keys // 2, return_inverse=True)
+
+    onSlope = numpy.zeros((len(keyCounts.zoneIds), len(valueIds)), dtype=keyCounts.counts.dtype)
+    offSlope = numpy.zeros(onSlope.shape, dtype=onSlope.dtype)
+    steep = keys % 2 == 1
+    onSlope[:, valueIndexes[steep]] = keyCounts.counts[:, steep]
+    offSlope[:, valueIndexes[~steep]] = keyCounts.counts[:, ~steep]
+
+    valueIds = valueIds.astype(valueArray.dtype)
+
+    return (zonal.ZonalCounts(keyCounts.zoneIds, valueIds, onSlope),
+            zonal.ZonalCounts(keyCounts.zoneIds, valueIds, offSlope))
+
+
+def getLandCoverOnSlopes(zoneRaster, landCoverRaster, slopeRaster, lccObj, slopeThreshold, cellArea=1.0,
+                         blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None,
+                         valueNodata=None, slopeNodata=None, fieldPrefix=LCOSP_FIELD_PREFIX):
+    """ Compute the land cover on slopes metrics of every class within each zone, in one pass over the rasters.
+
+    **Description:**
+
+        For each class three fields are reported: the percentage of the effective area on slopes in the class, named
+        by the lcospField attribute of the class or by *fieldPrefix* followed by the classId, and the area of the
+        class on and off slopes, named with :py:data:`ON_SLOPE_SUFFIX` and :py:data:`OFF_SLOPE_SUFFIX`.  Percentages
+        are computed as in :py:func:`pylet.numpyutil.lcp.getLandCoverProportions`, over the cells on slopes, so
+        excluded values do not count toward the effective area.  See :py:func:`tabulateSlopeArea` for the arguments.
+
+    **Arguments:**
+
+        * *zoneRaster*, *landCoverRaster*, *slopeRaster* - rasters on the same grid
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *slopeThreshold* - smallest slope counted as on slope
+        * *cellArea* - area of a single cell in the output area units
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *zoneNodata*, *valueNodata*, *slopeNodata* - the values representing NoData in each raster
+        * *fieldPrefix* - prefix for class field names without an lcospField attribute
+
+    **Returns:**
+
+        * NumPy array - zone ids in ascending order
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, one element per zone, as the value
+
+    """
+
+    onSlopeCounts, offSlopeCounts = tabulateSlopeArea(zoneRaster, landCoverRaster, slopeRaster, slopeThreshold,
+                                                      blockRows, blockColumns, zoneNodata, valueNodata, slopeNodata)
+
+    landCoverClasses = lcp.getOrderedClasses(lccObj)
+    membership = lcp.getClassMembership(onSlopeCounts.valueIds, landCoverClasses)
+    excludedValueIds = lccObj.values.getExcludedValueIds()
+    excluded = numpy.array([valueId in excludedValueIds for valueId in onSlopeCounts.valueIds.tolist()], dtype=bool)
+    membership[excluded, :] = 0.0
+
+    onSlopeAreas = numpy.dot(onSlopeCounts.counts, membership) * cellArea
+    offSlopeAreas = numpy.dot(offSlopeCounts.counts, membership) * cellArea
+    percentages = lcp.getLandCoverProportions(onSlopeCounts, lccObj, cellArea, fieldPrefix,
+                                              overwriteField=constants.XmlAttributeLcospField)
+
+    columns = OrderedDict()
+    for classIndex, landCoverClass in enumerate(landCoverClasses):
+        fieldName = lcp.getClassFieldName(landCoverClass, constants.XmlAttributeLcospField, fieldPrefix)
+        columns[fieldName] = percentages[fieldName]
+        columns[fieldName + ON_SLOPE_SUFFIX] = onSlopeAreas[:, classIndex]
+        columns[fieldName + OFF_SLOPE_SUFFIX] = offSlopeAreas[:, classIndex]
+
+    return onSlopeCounts.zoneIds, columns
@@ -0,0 +1,142 @@
+""" This module contains an engine for computing land cover proportions (lcp) for zones.
+
+    The percentage of each class in a :py:class:`pylet.lcc.LandCoverClassification` is computed from tabulated cell
+    counts for all zones and classes in one matrix operation.  Excluded values, such as water, do not count toward the
+    area of a zone.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+from pylet.lcc import constants
+
+#: Default output field name for the area of each zone which is not excluded
+EFFECTIVE_AREA_FIELD = 'EffectiveArea'
+
+#: Default output field name for the excluded area of each zone
+EXCLUDED_AREA_FIELD = 'ExcludedArea'
+
+#: Default prefix added to the classId to name the proportion field for a class
+LCP_FIELD_PREFIX = 'p'
+
+
+def getOrderedClasses(lccObj):
+    """ Get a `list` of the :py:class:`pylet.lcc.LandCoverClass` objects in the order they appear in the LCC file.
+
+    **Description:**
+
+        Each top level class is followed by its descendants.  Classes without values are left out when the classes of
+        the LCC are set to exclude empty classes.
+
+    **Arguments:**
+
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+
+    **Returns:**
+
+        * `list` of :py:class:`pylet.lcc.LandCoverClass` objects
+
+    """
+
+    orderedClasses = []
+
+    def addClass(landCoverClass):
+        if landCoverClass.uniqueValueIds or not lccObj.classes.excludeEmptyClasses:
+            orderedClasses.append(landCoverClass)
+        for childClass in landCoverClass.childClasses:
+            addClass(childClass)
+
+    for topLevelClass in lccObj.classes.topLevelClasses or []:
+        addClass(topLevelClass)
+
+    return orderedClasses
+
+
+def getClassFieldName(landCoverClass, overwriteField, fieldPrefix):
+    """ Get the output field name for a class, from its overwrite field attribute if set, else prefix + classId """
+
+    fieldName = landCoverClass.attributes.get(overwriteField) if landCoverClass.attributes else None
+
+    if not fieldName:
+        fieldName = (landCoverClass.classoverwriteFields or {}).get(overwriteField)
+
+    return fieldName or fieldPrefix + landCoverClass.classId
+
+
+def getClassMembership(valueIds, landCoverClasses):
+    """ Get a values by classes matrix, with 1.0 where the value is in the class and 0.0 otherwise """
+
+    membership = numpy.zeros((len(valueIds), len(landCoverClasses)), dtype=numpy.float64)
+
+    for classIndex, landCoverClass in enumerate(landCoverClasses):
+        for valueIndex, valueId in enumerate(numpy.asarray(valueIds).tolist()):
+            if valueId in (landCoverClass.uniqueValueIds or ()):
+                membership[valueIndex, classIndex] = 1.0
+
+    return membership
+
+
+def getLandCoverProportions(zonalCounts, lccObj, cellArea=1.0, fieldPrefix=LCP_FIELD_PREFIX,
+                            effectiveAreaField=EFFECTIVE_AREA_FIELD, excludedAreaField=EXCLUDED_AREA_FIELD,
+                            overwriteField=constants.XmlAttributeLcpField):
+    """ Compute the percentage of each land cover class within each zone.
+
+    **Description:**
+
+        The effective area of a zone is the area of all cells with a value which is not excluded in the LCC, including
+        values not in any class.  The percentage of a class is the area of its values, other than excluded values,
+        divided by the effective area, multiplied by 100.  Zones without an effective area have a percentage of 0 for
+        every class.
+
+        Classes are named by their *overwriteField* attribute in the LCC file, lcpField by default, or by
+        *fieldPrefix* followed by the classId.
+        Classes without values are skipped when the classes of the LCC are set to exclude empty classes.
+
+        All zones and classes are computed at once by multiplying the zones by values count matrix with a values by
+        classes membership matrix, so a value shared by several classes is counted once in each.
+
+    **Arguments:**
+
+        * *zonalCounts* - :py:class:`pylet.numpyutil.zonal.ZonalCounts` object
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *cellArea* - area of a single cell in the output area units
+        * *fieldPrefix* - prefix for class field names without an overwrite field attribute
+        * *effectiveAreaField*, *excludedAreaField* - names of the area fields
+        * *overwriteField* - name of the class attribute overwriting the field name, one of
+          :py:data:`pylet.lcc.constants.overwriteFieldList`
+
+    **Returns:**
+
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, with one element per zone in the order
+          of zonalCounts.zoneIds, as the value.  Class fields come first, in LCC order, followed by the area fields.
+
+    """
+
+    landCoverClasses = getOrderedClasses(lccObj)
+    counts = numpy.asarray(zonalCounts.counts, dtype=numpy.float64)
+
+    excludedValueIds = lccObj.values.getExcludedValueIds()
+    excluded = numpy.array([valueId in excludedValueIds for valueId in numpy.asarray(zonalCounts.valueIds).tolist()],
+                           dtype=bool)
+
+    excludedCounts = counts[:, excluded].sum(axis=1)
+    effectiveCounts = counts[:, ~excluded].sum(axis=1)
+
+    # Every zone and class in one product, then normalized by the effective count of each zone
+    membership = getClassMembership(zonalCounts.valueIds, landCoverClasses)
+    membership[excluded, :] = 0.0
+    classCounts = numpy.dot(counts, membership)
+    divisor = numpy.where(effectiveCounts > 0, effectiveCounts, 1.0)
+    percentages = classCounts / divisor[:, numpy.newaxis] * 100.0
+
+    columns = OrderedDict()
+    for classIndex, landCoverClass in enumerate(landCoverClasses):
+        fieldName = getClassFieldName(landCoverClass, overwriteField, fieldPrefix)
+        columns[fieldName] = percentages[:, classIndex]
+
+    columns[effectiveAreaField] = effectiveCounts * cellArea
+    columns[excludedAreaField] = excludedCounts * cellArea
+
+    return columns
@@ -0,0 +1,211 @@
+""" This module contains bit-packed cell masks, such as the NoData and excluded value masks of a land cover raster.
+
+    A :py:class:`PackedMask` stores one bit per cell, packed along each row with `numpy.packbits`_, so it takes an
+    eighth of the memory of a boolean array.  Masks are combined with the &, |, ^ and ~ operators on the packed bytes
+    without unpacking them, and a block is unpacked into a new boolean array only when an engine reads it, see
+    :py:meth:`PackedMask.read`.
+
+    The masks of a land cover raster are derived once with :py:func:`getLandCoverMasks`, and passed to the tabulation
+    and focal engines with their *mask* argument, instead of each engine recomputing them from the values.
+
+    .. _numpy.packbits: http://docs.scipy.org/doc/numpy/reference/generated/numpy.packbits.html
+
+"""
+
+import numpy
+import raster
+import zonal
+
+# Number of bits set in each byte value
+_BIT_COUNTS = numpy.unpackbits(numpy.arange(256, dtype=numpy.uint8)[:, numpy.newaxis], axis=1).sum(axis=1)
+
+
+class PackedMask(object):
+    """ This class holds a 2-D boolean mask with the cells of each row packed into bits.
+
+    **Description:**
+
+        Use :py:meth:`fromArray` or :py:meth:`zeros` to create a mask.  The padding bits past the last column of each
+        row are always 0.  The &, | and ^ operators combine two masks of the same shape, and ~ inverts a mask, on the
+        packed bytes.  Any other use of the cells, such as indexing an array, needs a block unpacked with
+        :py:meth:`read`.
+
+    **Arguments:**
+
+        * *packed* - 2-D NumPy uint8 array with (columnCount + 7) // 8 bytes per row
+        * *columnCount* - number of columns of the mask
+
+    """
+
+    def __init__(self, packed, columnCount):
+
+        self.packed = packed
+        self.columnCount = columnCount
+
+    @classmethod
+    def fromArray(cls, mask):
+        """ Create a :py:class:`PackedMask` from a 2-D boolean array """
+
+        mask = numpy.asarray(mask, dtype=bool)
+        return cls(numpy.packbits(mask, axis=1), mask.shape[1])
+
+    @classmethod
+    def zeros(cls, rowCount, columnCount):
+        """ Create a :py:class:`PackedMask` with no cells set """
+        return cls(numpy.zeros((rowCount, (columnCount + 7) // 8), dtype=numpy.uint8), columnCount)
+
+    @property
+    def shape(self):
+        """ The (rowCount, columnCount) of the mask """
+        return (self.packed.shape[0], self.columnCount)
+
+    @property
+    def nbytes(self):
+        """ The number of bytes of the packed cells """
+        return self.packed.nbytes
+
+    def count(self):
+        """ Get the number of cells set """
+        return int(_BIT_COUNTS[self.packed].sum())
+
+    def getRows(self, start, stop):
+        """ Get a :py:class:`PackedMask` of a range of rows which shares the packed bytes of this mask """
+        return PackedMask(self.packed[start:stop], self.columnCount)
+
+    def read(self, window):
+        """ Get a 2-D boolean array of the cells covered by a :py:class:`pylet.numpyutil.raster.RasterWindow`.
+
+        **Description:**
+
+            The halo of the window is included, as for :py:meth:`pylet.numpyutil.raster.RasterWindow.read`.  Only the
+            bytes covering the window are unpacked, but each call unpacks them into a new array, one byte per cell, so
+            the result is a copy and changing it does not change the mask.  Use :py:meth:`write` to change the mask.
+
+        **Arguments:**
+
+            * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` object
+
+        **Returns:**
+
+            * 2-D NumPy boolean array
+
+        """
+
+        rowSlice, columnSlice = window.slices
+        firstByte = columnSlice.start // 8
+        lastByte = (columnSlice.stop + 7) // 8
+        offset = columnSlice.start - firstByte * 8
+
+        bits = numpy.unpackbits(self.packed[rowSlice, firstByte:lastByte], axis=1)
+
+        return bits[:, offset:offset + columnSlice.stop - columnSlice.start].view(bool)
+
+    def write(self, window, mask):
+        """ Set the cells of the core of a :py:class:`pylet.numpyutil.raster.RasterWindow` from a 2-D boolean array.
+
+        **Description:**
+
+            Blocks starting on a multiple of 8 columns are packed directly, others are merged with the bits of the
+            neighboring columns which share their first and last bytes.
+
+        **Arguments:**
+
+            * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` object
+            * *mask* - 2-D NumPy boolean array with the shape of the core of the window
+
+        **Returns:**
+
+            * None
+
+        """
+
+        rows = slice(window.row, window.row + window.rowCount)
+        firstByte = window.column // 8
+        lastByte = (window.column + window.columnCount + 7) // 8
+        offset = window.column - firstByte * 8
+
+        endColumn = window.column + window.columnCount
+        if not offset and (endColumn % 8 == 0 or endColumn == self.columnCount):
+            self.packed[rows, firstByte:lastByte] = numpy.packbits(mask, axis=1)
+        else:
+            bits = numpy.unpackbits(self.packed[rows, firstByte:lastByte], axis=1)
+            bits[:, offset:offset + window.columnCount] = mask
+            self.packed[rows, firstByte:lastByte] = numpy.packbits(bits, axis=1)
+
+    def unpack(self):
+        """ Get the whole mask as a 2-D boolean array """
+        return numpy.unpackbits(self.packed, axis=1)[:, :self.columnCount].view(bool)
+
+    def _combine(self, other, operation):
+        """ Returns a new mask from an operation on the packed bytes of two masks of the same shape """
+
+        if self.shape != other.shape:
+            raise ValueError("Masks must have the same shape, found {0} and {1}".format(self.shape, other.shape))
+
+        return PackedMask(operation(self.packed, other.packed), self.columnCount)
+
+    def __and__(self, other):
+        return self._combine(other, numpy.bitwise_and)
+
+    def __or__(self, other):
+        return self._combine(other, numpy.bitwise_or)
+
+    def __xor__(self, other):
+        return self._combine(other, numpy.bitwise_xor)
+
+    def __invert__(self):
+        inverted = PackedMask(numpy.invert(self.packed), self.columnCount)
+
+        # Keep the padding bits past the last column clear
+        paddingBits = -self.columnCount % 8
+        if paddingBits and inverted.packed.size:
+            inverted.packed[:, -1] &= numpy.uint8((0xff << paddingBits) & 0xff)
+
+        return inverted
+
+
+def getLandCoverMasks(landCoverRaster, lccObj=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                      blockColumns=raster.DEFAULT_BLOCK_SIZE, nodata=None):
+    """ Derive the NoData and excluded value masks of a land cover raster, one block at a time.
+
+    **Description:**
+
+        The NoData mask is set for cells equal to *nodata*, or NaN.  The excluded mask is set for valid cells with a
+        value marked excluded in the Land Cover Classification, such as water, and is empty if *lccObj* is None.  If
+        *nodata* is not provided, the nodata of a :py:class:`pylet.numpyutil.raster.RasterGrid` is used.
+
+        Cells which do not count toward the effective area are *nodataMask* | *excludedMask*.
+
+    **Arguments:**
+
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *lccObj* - optional :py:class:`pylet.lcc.LandCoverClassification` object
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *nodata* - the value representing NoData
+
+    **Returns:**
+
+        * :py:class:`PackedMask` - NoData mask
+        * :py:class:`PackedMask` - excluded value mask
+
+    """
+
+    if nodata is None:
+        nodata = getattr(landCoverRaster, 'nodata', None)
+
+    excludedValueIds = numpy.array(sorted(lccObj.values.getExcludedValueIds())) if lccObj is not None else []
+    rowCount, columnCount = raster.getRasterArray(landCoverRaster).shape
+    nodataMask = PackedMask.zeros(rowCount, columnCount)
+    excludedMask = PackedMask.zeros(rowCount, columnCount)
+
+    for window in raster.iterateBlocks(landCoverRaster, blockRows, blockColumns):
+        block = window.array
+        validMask = zonal.getValidMask(block, nodata)
+        excluded = numpy.in1d(block, excludedValueIds).reshape(block.shape)
+
+        if validMask is not None:
+            nodataMask.write(window, ~validMask)
+            excluded &= validMask
+        excludedMask.write(window, excluded)
+
+    return nodataMask, excludedMask
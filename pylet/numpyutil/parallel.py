@@ -0,0 +1,154 @@
+""" This module contains a multi-process driver for tabulating land cover within zones.
+
+    The rasters are split into tiles with :py:func:`pylet.numpyutil.raster.getBlockWindows`, the tiles are split into
+    groups of adjacent tiles, and each group is counted by a worker process from a pool of the `multiprocessing`_
+    module into its own :py:class:`pylet.numpyutil.zonal.ZonalTabulator`.  The counts of the groups are added together
+    in group order as they are returned, so every tile is read once, tiles are counted without locking, and the
+    results are identical for any number of workers.
+
+    Memory-mapped binary grids are reopened by path in each worker, so the pixel data is never copied between
+    processes.  In-memory arrays are shared with the workers when the pool is created, which avoids copying on
+    platforms that fork, but are pickled on Windows.
+
+    .. _multiprocessing: http://docs.python.org/library/multiprocessing.html
+
+"""
+
+import multiprocessing
+import numpy
+import raster
+import zonal
+
+#: Layouts of rasters reopened by path in each worker, rather than passed to it
+_MEMMAP_LAYOUTS = ('BIL', 'BIP', 'BSQ')
+
+# Number of groups of tiles per worker process, so workers which finish early pick up more of the work
+_GROUPS_PER_PROCESS = 4
+
+# Per process state, set by _initializeWorker
+_workerState = {}
+
+
+def tabulateAreaParallel(zoneRaster, landCoverRaster, processes=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                         blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None, valueNodata=None):
+    """ Count the cells of each land cover value within each zone, using a pool of worker processes.
+
+    **Description:**
+
+        This gives the same result as :py:func:`pylet.numpyutil.zonal.tabulateArea`.  The tiles are split into a few
+        groups of adjacent tiles per process, each group is counted in one pass by a worker, and the counts of all
+        groups are merged with :py:meth:`pylet.numpyutil.zonal.ZonalTabulator.addCounts`.
+
+        If *processes* is None, one worker per CPU is used.  With one process, or a single tile, the tiles are counted
+        in this process, without a pool, at the cost of the serial engine.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *processes* - number of worker processes
+        * *blockRows*, *blockColumns* - size of the tiles counted by a worker at once
+        * *zoneNodata* - the value representing NoData in the zone raster
+        * *valueNodata* - the value representing NoData in the land cover raster
+
+    **Returns:**
+
+        * :py:class:`pylet.numpyutil.zonal.ZonalCounts`
+
+    """
+
+    zoneArray, valueArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster)
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    tiles = [(window.row, window.column, window.rowCount, window.columnCount) for window in
+             raster.getBlockWindows(zoneArray.shape[0], zoneArray.shape[1], blockRows, blockColumns)]
+    groupCount = max(min(len(tiles), processes * _GROUPS_PER_PROCESS if processes > 1 else 1), 1)
+    groups = [tiles[groupIndex * len(tiles) // groupCount:(groupIndex + 1) * len(tiles) // groupCount]
+              for groupIndex in range(groupCount)]
+    sources = (_getSource(zoneRaster), _getSource(landCoverRaster), zoneNodata, valueNodata)
+
+    tabulator = zonal.ZonalTabulator(zoneNodata, valueNodata)
+    for groupCounts in _mapGroups(_countGroup, groups, processes, sources):
+        tabulator.addCounts(groupCounts)
+
+    zonalCounts = tabulator.getCounts()
+    zonalCounts.zoneIds = zonalCounts.zoneIds.astype(zoneArray.dtype)
+    zonalCounts.valueIds = zonalCounts.valueIds.astype(valueArray.dtype)
+
+    return zonalCounts
+
+
+def _getSource(inRaster):
+    """ Returns the path of a memory-mapped raster, to reopen in a worker, otherwise its array """
+
+    if isinstance(inRaster, raster.RasterGrid) and inRaster.layout in _MEMMAP_LAYOUTS and inRaster.path:
+        return inRaster.path
+    else:
+        return raster.getRasterArray(inRaster)
+
+
+def _mapGroups(function, groups, processes, initializerArguments):
+    """ A generator for the results of function on each group of tiles, in order, from a pool of processes, or from
+    this process for one process """
+
+    if processes <= 1 or len(groups) <= 1:
+        _initializeWorker(*initializerArguments)
+        try:
+            for group in groups:
+                yield function(group)
+        finally:
+            _workerState.clear()
+        return
+
+    pool = multiprocessing.Pool(min(processes, len(groups)), _initializeWorker, initializerArguments)
+    try:
+        for result in pool.imap(function, groups):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _initializeWorker(*arguments):
+    """ Keeps the arguments of the pool for :py:func:`_getWorkerState` """
+
+    # Nothing here may raise, as the pool would keep replacing a worker whose initializer fails instead of reporting it
+    _workerState.clear()
+    _workerState['arguments'] = arguments
+
+
+def _getWorkerState():
+    """ Opens the rasters for this process, on its first group of tiles """
+
+    if 'arguments' in _workerState:
+        zoneSource, valueSource, zoneNodata, valueNodata = _workerState.pop('arguments')
+
+        for key, source in (('zones', zoneSource), ('values', valueSource)):
+            if isinstance(source, basestring):
+                _workerState[key] = raster.openRaster(source).array
+            else:
+                _workerState[key] = source
+
+        _workerState['zoneNodata'] = zoneNodata
+        _workerState['valueNodata'] = valueNodata
+
+    return _workerState
+
+
+def _countGroup(tiles):
+    """ Returns the :py:class:`pylet.numpyutil.zonal.ZonalCounts` of a group of tiles """
+
+    workerState = _getWorkerState()
+    tabulator = zonal.ZonalTabulator(workerState['zoneNodata'], workerState['valueNodata'])
+
+    for tile in tiles:
+        window = raster.RasterWindow(*tile)
+        tabulator.addBlock(window.read(workerState['zones']), window.read(workerState['values']))
+
+    return tabulator.getCounts()
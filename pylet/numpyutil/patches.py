@@ -0,0 +1,387 @@
+""" This module contains a streaming connected-component labeler for land cover patches, and patch metrics for zones.
+
+    A patch is a group of connected cells of a land cover class within a single zone, so patches are clipped to the
+    zones.  Cells are connected to their four orthogonal neighbors, or also to their four diagonal neighbors with
+    8-connectivity.
+
+    Each block is labeled on its own, by splitting its rows into runs of class cells in one zone and joining the runs
+    which touch in adjacent rows.  Patches which cross block seams are stitched with a union-find over the labels along
+    the seams, so only the last row of the previous row of blocks and the last column of the previous block are kept,
+    never the whole label raster.  The only state that grows with the raster is the size and zone of each block patch.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import numpy
+from collections import OrderedDict
+import raster
+import zonal
+import histogram
+import lcp
+
+#: Suffixes added to the field name of a class for each patch metric
+NUMBER_OF_PATCHES_SUFFIX = '_NP'
+MEAN_PATCH_SIZE_SUFFIX = '_MPS'
+MEDIAN_PATCH_SIZE_SUFFIX = '_MDPS'
+LARGEST_PATCH_SIZE_SUFFIX = '_LPS'
+PATCH_DENSITY_SUFFIX = '_PD'
+
+#: Label of cells in no patch
+NO_PATCH = -1
+
+
+def resolveEquivalences(count, firstLabels, secondLabels):
+    """ Get the smallest equivalent label for each of count labels, given pairs of equivalent labels.
+
+    **Description:**
+
+        This is a union-find over NumPy arrays.  In each round, the root of every pair is pointed at the smaller of
+        the two roots, and then every label is pointed at its root by pointer jumping, until all pairs share a root.
+
+    **Arguments:**
+
+        * *count* - number of labels, from 0 to count - 1
+        * *firstLabels*, *secondLabels* - 1-D NumPy integer arrays of equivalent label pairs
+
+    **Returns:**
+
+        * 1-D NumPy int64 array with the root label of each label
+
+    """
+
+    parents = numpy.arange(count, dtype=numpy.int64)
+    firstLabels = numpy.asarray(firstLabels, dtype=numpy.int64)
+    secondLabels = numpy.asarray(secondLabels, dtype=numpy.int64)
+
+    while firstLabels.size:
+        firstRoots = parents[firstLabels]
+        secondRoots = parents[secondLabels]
+        unresolved = firstRoots != secondRoots
+        if not unresolved.any():
+            break
+
+        firstRoots = firstRoots[unresolved]
+        secondRoots = secondRoots[unresolved]
+        smallerRoots = numpy.minimum(firstRoots, secondRoots)
+        numpy.minimum.at(parents, firstRoots, smallerRoots)
+        numpy.minimum.at(parents, secondRoots, smallerRoots)
+
+        while True:
+            grandparents = parents[parents]
+            if (grandparents == parents).all():
+                break
+            parents = grandparents
+
+    return parents
+
+
+def labelBlock(mask, zones, connectivity=8):
+    """ Label the patches in a block, each a connected group of cells in the mask with the same zone.
+
+    **Arguments:**
+
+        * *mask* - 2-D NumPy boolean array of class cells
+        * *zones* - 2-D NumPy array of zone ids of the same shape
+        * *connectivity* - 4 or 8
+
+    **Returns:**
+
+        * 2-D NumPy int64 array of labels from 0, with :py:data:`NO_PATCH` outside the mask
+        * 1-D NumPy int64 array of the number of cells in each patch
+
+    """
+
+    rowCount, columnCount = mask.shape
+    sameZone = zones[:, 1:] == zones[:, :-1]
+
+    # Runs of class cells in one zone along each row
+    startFlags = mask.copy()
+    startFlags[:, 1:] &= ~(mask[:, :-1] & sameZone)
+    endFlags = mask.copy()
+    endFlags[:, :-1] &= ~(mask[:, 1:] & sameZone)
+
+    runRows, runStarts = numpy.nonzero(startFlags)
+    runEnds = numpy.nonzero(endFlags)[1] + 1
+    runZones = zones[runRows, runStarts]
+
+    # Runs in the row above which overlap each run, widened by one cell for diagonal neighbors
+    reach = 1 if connectivity == 8 else 0
+    rowWidth = columnCount + 2
+    startKeys = runRows * rowWidth + runStarts
+    endKeys = runRows * rowWidth + runEnds
+    aboveRows = (runRows - 1) * rowWidth
+
+    firsts = numpy.searchsorted(endKeys, aboveRows + runStarts - reach, 'right')
+    lasts = numpy.searchsorted(startKeys, aboveRows + runEnds + reach, 'left')
+    pairCounts = numpy.where(runRows > 0, numpy.maximum(lasts - firsts, 0), 0)
+
+    runIndexes = numpy.repeat(numpy.arange(len(runRows)), pairCounts)
+    pairOffsets = numpy.arange(pairCounts.sum()) - numpy.repeat(numpy.cumsum(pairCounts) - pairCounts, pairCounts)
+    aboveIndexes = numpy.repeat(firsts, pairCounts) + pairOffsets
+
+    touching = runZones[runIndexes] == runZones[aboveIndexes]
+    roots = resolveEquivalences(len(runRows), runIndexes[touching], aboveIndexes[touching])
+    rootIds, runLabels = numpy.unique(roots, return_inverse=True)
+
+    sizes = numpy.bincount(runLabels, weights=runEnds - runStarts, minlength=len(rootIds)).astype(numpy.int64)
+
+    labels = numpy.empty(mask.shape, dtype=numpy.int64)
+    labels.fill(NO_PATCH)
+    cellRuns = numpy.cumsum(startFlags.ravel()).reshape(mask.shape) - 1
+    labels[mask] = runLabels[cellRuns[mask]]
+
+    return labels, sizes
+
+
+class PatchLabeler(object):
+    """ This class labels the patches of a class mask block by block, and stitches them across block seams.
+
+    **Description:**
+
+        Pass the blocks to :py:meth:`addBlock` row by row, as yielded by
+        :py:func:`pylet.numpyutil.raster.getBlockWindows` without *columnMajor*.  Then get the size and zone of every
+        whole patch with :py:meth:`getPatches`.
+
+    **Arguments:**
+
+        * *columnCount* - number of columns in the raster
+        * *connectivity* - 4 or 8
+
+    """
+
+    def __init__(self, columnCount, connectivity=8):
+
+        if connectivity not in (4, 8):
+            raise ValueError("Connectivity must be 4 or 8, not {0}".format(connectivity))
+
+        self.connectivity = connectivity
+        self._patchCount = 0
+        self._patchSizes = []
+        self._patchZones = []
+        self._firstLabels = []
+        self._secondLabels = []
+        self._blockRow = None
+
+        # Labels and zones of the last row above the current row of blocks, and of the row being completed
+        self._aboveLabels = numpy.empty(columnCount, dtype=numpy.int64)
+        self._aboveLabels.fill(NO_PATCH)
+        self._aboveZones = None
+        self._bottomLabels = self._aboveLabels.copy()
+        self._bottomZones = None
+        self._leftLabels = None
+        self._leftZones = None
+
+    def addBlock(self, window, mask, zones):
+        """ Label the patches of a block and record the patches it joins across its top and left seams.
+
+        **Arguments:**
+
+            * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` of the block, without a halo
+            * *mask* - 2-D NumPy boolean array of class cells in the block
+            * *zones* - 2-D NumPy array of zone ids in the block
+
+        **Returns:**
+
+            * None
+
+        """
+
+        if self._aboveZones is None:
+            self._aboveZones = numpy.zeros(len(self._aboveLabels), dtype=zones.dtype)
+            self._bottomZones = self._aboveZones.copy()
+
+        if window.row != self._blockRow:
+            self._blockRow = window.row
+            self._aboveLabels, self._bottomLabels = self._bottomLabels, self._aboveLabels
+            self._aboveZones, self._bottomZones = self._bottomZones, self._aboveZones
+            self._leftLabels = None
+
+        localLabels, sizes = labelBlock(mask, zones, self.connectivity)
+        labels = numpy.where(localLabels == NO_PATCH, NO_PATCH, localLabels + self._patchCount)
+
+        patchZones = numpy.zeros(len(sizes), dtype=zones.dtype)
+        patchZones[localLabels[mask]] = zones[mask]
+        self._patchSizes.append(sizes)
+        self._patchZones.append(patchZones)
+        self._patchCount += len(sizes)
+
+        # Neighbors across the top seam, from one column left to one column right of the block
+        left = window.column
+        right = window.column + window.columnCount
+        if window.row > 0:
+            offsets = (-1, 0, 1) if self.connectivity == 8 else (0,)
+            for offset in offsets:
+                start = max(left + offset, 0)
+                stop = min(right + offset, len(self._aboveLabels))
+                self._addSeamPairs(labels[0, start - offset - left:stop - offset - left],
+                                   zones[0, start - offset - left:stop - offset - left],
+                                   self._aboveLabels[start:stop], self._aboveZones[start:stop])
+
+        # Neighbors across the left seam, within the rows of the block
+        if self._leftLabels is not None:
+            offsets = (-1, 0, 1) if self.connectivity == 8 else (0,)
+            rowCount = window.rowCount
+            for offset in offsets:
+                start = max(offset, 0)
+                stop = min(rowCount + offset, rowCount)
+                self._addSeamPairs(labels[start - offset:stop - offset, 0], zones[start - offset:stop - offset, 0],
+                                   self._leftLabels[start:stop], self._leftZones[start:stop])
+
+        self._leftLabels = labels[:, -1].copy()
+        self._leftZones = zones[:, -1].copy()
+        self._bottomLabels[left:right] = labels[-1]
+        self._bottomZones[left:right] = zones[-1]
+
+    def _addSeamPairs(self, labels, zones, neighborLabels, neighborZones):
+        """ Records the labels of neighboring patch cells in the same zone as equivalent """
+
+        joined = (labels != NO_PATCH) & (neighborLabels != NO_PATCH) & (zones == neighborZones)
+        self._firstLabels.append(labels[joined])
+        self._secondLabels.append(neighborLabels[joined])
+
+    def getPatches(self):
+        """ Get the zone and number of cells of every patch, after stitching the patches across block seams.
+
+        **Arguments:**
+
+            * Not applicable
+
+        **Returns:**
+
+            * 1-D NumPy array - zone id of each patch
+            * 1-D NumPy int64 array - number of cells in each patch
+
+        """
+
+        noLabels = [numpy.zeros(0, dtype=numpy.int64)]
+        patchSizes = numpy.concatenate(self._patchSizes or noLabels)
+        patchZones = numpy.concatenate(self._patchZones or noLabels)
+
+        roots = resolveEquivalences(self._patchCount, numpy.concatenate(self._firstLabels or noLabels),
+                                    numpy.concatenate(self._secondLabels or noLabels))
+        rootSizes = numpy.bincount(roots, weights=patchSizes, minlength=self._patchCount).astype(numpy.int64)
+        isRoot = roots == numpy.arange(self._patchCount)
+
+        return patchZones[isRoot], rootSizes[isRoot]
+
+
+def getPatchStatistics(patchZones, patchSizes, zoneIds):
+    """ Get the number of patches and the mean, median and largest patch size for each zone.
+
+    **Arguments:**
+
+        * *patchZones* - 1-D NumPy array of the zone id of each patch
+        * *patchSizes* - 1-D NumPy array of the size of each patch
+        * *zoneIds* - 1-D NumPy array of zone ids in ascending order, including every zone in patchZones
+
+    **Returns:**
+
+        * NumPy int64 array - number of patches in each zone
+        * NumPy float64 arrays - mean, median and largest patch size in each zone, 0 for zones without patches
+
+    """
+
+    zoneIndexes = numpy.searchsorted(zoneIds, patchZones)
+    order = numpy.lexsort((patchSizes, zoneIndexes))
+    sortedSizes = numpy.asarray(patchSizes, dtype=numpy.float64)[order]
+
+    counts = numpy.bincount(zoneIndexes, minlength=len(zoneIds)).astype(numpy.int64)
+    totals = numpy.bincount(zoneIndexes, weights=patchSizes, minlength=len(zoneIds))
+    starts = numpy.cumsum(counts) - counts
+    hasPatches = counts > 0
+
+    means = numpy.zeros(len(zoneIds))
+    medians = numpy.zeros(len(zoneIds))
+    largest = numpy.zeros(len(zoneIds))
+
+    means[hasPatches] = totals[hasPatches] / counts[hasPatches]
+    lowerMiddles = sortedSizes[(starts + (counts - 1) // 2)[hasPatches]]
+    upperMiddles = sortedSizes[(starts + counts // 2)[hasPatches]]
+    medians[hasPatches] = (lowerMiddles + upperMiddles) / 2.0
+    largest[hasPatches] = sortedSizes[(starts + counts - 1)[hasPatches]]
+
+    return counts, means, medians, largest
+
+
+def getPatchMetrics(zoneRaster, landCoverRaster, lccObj, connectivity=8, classIds=None, cellArea=1.0,
+                    blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None,
+                    valueNodata=None, fieldPrefix=''):
+    """ Compute patch metrics for land cover classes within each zone, one block at a time.
+
+    **Description:**
+
+        See the module description for the definition of a patch.  For each class the number of patches (NP), the
+        mean (MPS), median (MDPS) and largest (LPS) patch size in area units, and the patch density (PD), the number of
+        patches per area unit of the zone, are reported.  Excluded values are not part of any class.
+
+        Both rasters must be on the same grid.  If the NoData values are not provided, the nodata of each
+        :py:class:`pylet.numpyutil.raster.RasterGrid` is used.  Fields are named *fieldPrefix* followed by the classId
+        and the suffix of the metric.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *connectivity* - 4 or 8
+        * *classIds* - `list` of classIds, by default all classes in LCC order
+        * *cellArea* - area of a single cell in the output area units
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *zoneNodata* - the value representing NoData in the zone raster
+        * *valueNodata* - the value representing NoData in the land cover raster
+        * *fieldPrefix* - prefix for the field names
+
+    **Returns:**
+
+        * NumPy array - zone ids in ascending order
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy array, one element per zone, as the value
+
+    """
+
+    zoneArray, valueArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster)
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+
+    if classIds is None:
+        landCoverClasses = lcp.getOrderedClasses(lccObj)
+    else:
+        landCoverClasses = [lccObj.classes[classId] for classId in classIds]
+
+    excludedValueIds = numpy.array(sorted(lccObj.values.getExcludedValueIds()))
+    classValueIds = [numpy.array(sorted(landCoverClass.uniqueValueIds or ())) for landCoverClass in landCoverClasses]
+    labelers = [PatchLabeler(zoneArray.shape[1], connectivity) for landCoverClass in landCoverClasses]
+    zoneHistogram = histogram.ValueHistogram(zoneNodata)
+
+    for window in raster.getBlockWindows(zoneArray.shape[0], zoneArray.shape[1], blockRows, blockColumns):
+        zones = window.read(zoneArray)
+        values = window.read(valueArray)
+        zoneHistogram.addBlock(zones)
+
+        valid = numpy.in1d(values, excludedValueIds, invert=True).reshape(values.shape)
+        for validMask in (zonal.getValidMask(zones, zoneNodata), zonal.getValidMask(values, valueNodata)):
+            if validMask is not None:
+                valid &= validMask
+
+        for labeler, valueIds in zip(labelers, classValueIds):
+            labeler.addBlock(window, numpy.in1d(values, valueIds).reshape(values.shape) & valid, zones)
+
+    zoneIds, zoneCounts = zoneHistogram.getValuesAndCounts()
+    zoneAreas = zoneCounts * float(cellArea)
+
+    columns = OrderedDict()
+    for landCoverClass, labeler in zip(landCoverClasses, labelers):
+        patchZones, patchSizes = labeler.getPatches()
+        counts, means, medians, largest = getPatchStatistics(patchZones, patchSizes, zoneIds)
+
+        fieldName = fieldPrefix + landCoverClass.classId
+        columns[fieldName + NUMBER_OF_PATCHES_SUFFIX] = counts
+        columns[fieldName + MEAN_PATCH_SIZE_SUFFIX] = means * cellArea
+        columns[fieldName + MEDIAN_PATCH_SIZE_SUFFIX] = medians * cellArea
+        columns[fieldName + LARGEST_PATCH_SIZE_SUFFIX] = largest * cellArea
+        columns[fieldName + PATCH_DENSITY_SUFFIX] = counts / zoneAreas
+
+    return zoneIds, columns
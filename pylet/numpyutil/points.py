@@ -0,0 +1,185 @@
+""" This module contains an engine for sample point land cover proportions (splcp) within circular buffers.
+
+    The buffer of a point is every cell whose center is within the buffer radius of the point.  A circle is a stack of
+    row runs, so the count of a value in a buffer is the sum of one run per row, and each run is read from row-wise
+    prefix sums of the value in two lookups, however wide the buffer.
+
+    Points are grouped by the raster block containing them.  Each block with points is read once with a halo of the
+    buffer radius, prefix sums are built for each value in the block, and the buffers of all its points are counted at
+    once.  No cells are extracted point by point.
+
+"""
+
+import math
+import numpy
+from pylet.lcc import constants
+import raster
+import zonal
+import lcp
+from geotransform import GeoTransform
+
+#: Default prefix added to the classId to name the sample point proportion field for a class
+SPLCP_FIELD_PREFIX = 'sp'
+
+
+def getRowPrefixSums(layers):
+    """ Get the prefix sums along the rows of each layer, with a leading column of zeros, as int32 """
+
+    prefixSums = numpy.zeros(layers.shape[:-1] + (layers.shape[-1] + 1,), dtype=numpy.int32)
+    numpy.cumsum(layers, axis=-1, dtype=numpy.int32, out=prefixSums[..., 1:])
+
+    return prefixSums
+
+
+def tabulatePointBuffers(landCoverRaster, x, y, radius, geoTransform=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                         blockColumns=raster.DEFAULT_BLOCK_SIZE, valueNodata=None):
+    """ Count the cells of each land cover value within a circular buffer around each point.
+
+    **Description:**
+
+        The *x*, *y* coordinates and the *radius* are in map units.  The *geoTransform* is taken from a
+        :py:class:`pylet.numpyutil.raster.RasterGrid` if not provided.  Buffers are clipped at the edges of the raster,
+        and NoData cells are not counted.
+
+        The result has one zone per point, with the zone id being the index of the point.  Points outside the raster
+        have no counts.
+
+    **Arguments:**
+
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *x*, *y* - 1-D NumPy arrays of point coordinates
+        * *radius* - radius of the buffers in map units
+        * *geoTransform* - optional :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the raster
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *valueNodata* - the value representing NoData in the land cover raster
+
+    **Returns:**
+
+        * :py:class:`pylet.numpyutil.zonal.ZonalCounts`
+
+    """
+
+    array = raster.getRasterArray(landCoverRaster)
+    rowCount, columnCount = array.shape
+    x = numpy.asarray(x, dtype=numpy.float64).ravel()
+    y = numpy.asarray(y, dtype=numpy.float64).ravel()
+
+    if geoTransform is None:
+        geoTransform = GeoTransform.fromRaster(landCoverRaster)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+
+    blockRows = blockRows or rowCount
+    blockColumns = blockColumns or columnCount
+    rowReach = int(math.ceil(float(radius) / geoTransform.cellHeight)) + 1
+    halo = max(rowReach, int(math.ceil(float(radius) / geoTransform.cellWidth)) + 1)
+
+    # Group the points by the block containing them
+    pointRows, pointColumns = geoTransform.toRowColumn(x, y)
+    inRaster = (pointRows >= 0) & (pointRows < rowCount) & (pointColumns >= 0) & (pointColumns < columnCount)
+    blockKeys = numpy.where(inRaster, (pointRows // blockRows) * columnCount + pointColumns // blockColumns, -1)
+    pointOrder = numpy.argsort(blockKeys, kind='mergesort')
+    sortedKeys = blockKeys[pointOrder]
+
+    tabulator = zonal.ZonalTabulator()
+    rowOffsets = numpy.arange(-rowReach, rowReach + 1)
+
+    for window in raster.getBlockWindows(rowCount, columnCount, blockRows, blockColumns, halo):
+        blockKey = (window.row // blockRows) * columnCount + window.column // blockColumns
+        points = pointOrder[numpy.searchsorted(sortedKeys, blockKey):numpy.searchsorted(sortedKeys, blockKey, 'right')]
+        if not points.size:
+            continue
+
+        block = window.read(array)
+        validMask = zonal.getValidMask(block, valueNodata)
+        values = block if validMask is None else block[validMask]
+        if not values.size:
+            continue
+
+        # One layer per value in the block, with prefix sums along each row
+        valueIds, valueIndexes = zonal.encodeValues(values.ravel())
+        indexes = numpy.empty(block.shape, dtype=numpy.intp)
+        indexes.fill(-1)
+        if validMask is None:
+            indexes[...] = valueIndexes.reshape(block.shape)
+        else:
+            indexes[validMask] = valueIndexes
+        layers = indexes[numpy.newaxis, :, :] == numpy.arange(len(valueIds))[:, numpy.newaxis, numpy.newaxis]
+        prefixSums = getRowPrefixSums(layers)
+
+        # The run of each buffer in each row, in the coordinates of the window
+        windowTransform = geoTransform.getWindowTransform(window.row - window.haloTop, window.column - window.haloLeft)
+        windowRows, windowColumns = block.shape
+        pointX = x[points, numpy.newaxis]
+        pointY = y[points, numpy.newaxis]
+        centerRow = windowTransform.toRowColumn(pointX, pointY)[0]
+
+        rows = centerRow + rowOffsets
+        rowY = windowTransform.yMax - (rows + 0.5) * windowTransform.cellHeight
+        halfWidths = numpy.sqrt(numpy.maximum(radius ** 2 - (rowY - pointY) ** 2, 0.0))
+        firsts = numpy.ceil((pointX - halfWidths - windowTransform.xMin) / windowTransform.cellWidth - 0.5)
+        lasts = numpy.floor((pointX + halfWidths - windowTransform.xMin) / windowTransform.cellWidth - 0.5)
+        firsts = numpy.maximum(firsts, 0).astype(numpy.intp)
+        lasts = numpy.minimum(lasts, windowColumns - 1).astype(numpy.intp)
+
+        inRun = (abs(rowY - pointY) <= radius) & (rows >= 0) & (rows < windowRows) & (lasts >= firsts)
+        rows = numpy.where(inRun, rows, 0)
+        firsts = numpy.where(inRun, firsts, 0)
+        lasts = numpy.where(inRun, lasts + 1, 0)
+
+        counts = (prefixSums[:, rows, lasts] - prefixSums[:, rows, firsts]).sum(axis=2)
+        tabulator.addCounts(zonal.ZonalCounts(points, valueIds, counts.T.astype(numpy.int64)))
+
+    bufferCounts = tabulator.getCounts()
+    counts = numpy.zeros((len(x), len(bufferCounts.valueIds)), dtype=numpy.int64)
+    counts[bufferCounts.zoneIds.astype(numpy.intp)] = bufferCounts.counts
+
+    return zonal.ZonalCounts(numpy.arange(len(x)), bufferCounts.valueIds, counts)
+
+
+def getPointLandCoverProportions(landCoverRaster, x, y, radius, lccObj, cellArea=1.0, geoTransform=None,
+                                 blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE,
+                                 valueNodata=None, fieldPrefix=SPLCP_FIELD_PREFIX):
+    """ Compute the percentage of each land cover class within a circular buffer around each point.
+
+    **Description:**
+
+        The buffers are counted with :py:func:`tabulatePointBuffers`, and the percentages are computed with
+        :py:func:`pylet.numpyutil.lcp.getLandCoverProportions`, naming classes by their splcpField attribute or by
+        *fieldPrefix* followed by the classId.  Points outside the raster have NaN for every field.
+
+    **Arguments:**
+
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *x*, *y* - 1-D NumPy arrays of point coordinates
+        * *radius* - radius of the buffers in map units
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *cellArea* - area of a single cell in the output area units
+        * *geoTransform* - optional :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the raster
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *valueNodata* - the value representing NoData in the land cover raster
+        * *fieldPrefix* - prefix for class field names without an splcpField attribute
+
+    **Returns:**
+
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, one element per point, as the value
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+    """
+
+    bufferCounts = tabulatePointBuffers(landCoverRaster, x, y, radius, geoTransform, blockRows, blockColumns,
+                                        valueNodata)
+    columns = lcp.getLandCoverProportions(bufferCounts, lccObj, cellArea, fieldPrefix,
+                                          overwriteField=constants.XmlAttributeSplcpField)
+
+    if geoTransform is None:
+        geoTransform = GeoTransform.fromRaster(landCoverRaster)
+    rowCount, columnCount = raster.getRasterArray(landCoverRaster).shape
+    pointRows, pointColumns = geoTransform.toRowColumn(x, y)
+    outside = (pointRows < 0) | (pointRows >= rowCount) | (pointColumns < 0) | (pointColumns >= columnCount)
+
+    for column in columns.values():
+        column[outside] = numpy.nan
+
+    return columns
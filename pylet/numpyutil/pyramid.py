@@ -0,0 +1,455 @@
+""" This module contains a multi-resolution pyramid of land cover counts for fast approximate zonal proportions.
+
+    Each level of a :py:class:`CountPyramid` aggregates the land cover raster by a factor of 2, 4, 8 and so on, and
+    stores the number of fine cells of each value in every coarse cell, rather than a majority value, so the counts of
+    any classification can be summed from any level.  Counts are kept per value, so a classification can be changed
+    without rebuilding the pyramid.
+
+    Level *k* holds one count per value for every 4 ** *k* fine cells, so the finest levels are the largest.  Only the
+    levels needed are stored, from a *firstLevel*, and they can be kept in memory-mapped files rather than in memory,
+    see :py:func:`buildCountPyramid`.
+
+    A :py:class:`ZoneAggregation` records, for the same factor, the coarse cells lying entirely in one zone and the
+    number of fine cells of each zone in the other, mixed, coarse cells.  Counts in pure coarse cells are exact, and
+    counts in mixed coarse cells are shared among their zones in proportion to their cells, so the error of a zone is
+    bounded by its number of cells in mixed coarse cells, see :py:func:`getPyramidLandCoverProportions`.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import os
+import numpy
+from pylet.lcc import constants
+import raster
+import zonal
+import lcp
+import valuecache
+
+#: Default number of levels built, for factors of 2, 4, 8 and 16
+DEFAULT_LEVEL_COUNT = 4
+
+#: Extension of the files holding the counts of a level, see :py:func:`buildCountPyramid`
+LEVEL_EXTENSION = '.counts'
+
+#: Largest number of first level counts of a block held at once, see :py:func:`buildCountPyramid`
+COUNT_CHUNK_SIZE = 2 ** 20
+
+
+def _getCountType(factor):
+    """ Returns the smallest unsigned integer type holding the count of factor x factor cells """
+
+    for countType in (numpy.uint8, numpy.uint16, numpy.uint32):
+        if factor * factor <= numpy.iinfo(countType).max:
+            return countType
+
+    return numpy.uint64
+
+
+def _getAlignedBlockSize(blockSize, factor, size):
+    """ Returns the block size rounded up to a multiple of the factor, or the size if blockSize is None """
+    return -(-(blockSize or size) // factor) * factor
+
+
+def aggregateCounts(counts, factor=2, dtype=numpy.int64):
+    """ Sum the counts of each factor x factor group of cells of a 3-D (value, row, column) array.
+
+    **Description:**
+
+        Rows and columns which do not fill a whole group at the bottom and right are summed as partial groups.  The
+        counts are only copied to pad such partial groups.  The *dtype* must hold the count of a whole group.
+
+    **Arguments:**
+
+        * *counts* - 3-D NumPy array of counts
+        * *factor* - number of cells along each side of a group
+        * *dtype* - NumPy type of the sums
+
+    **Returns:**
+
+        * 3-D NumPy array of *dtype*
+
+    """
+
+    valueCount, rowCount, columnCount = counts.shape
+    coarseRows = -(-rowCount // factor)
+    coarseColumns = -(-columnCount // factor)
+
+    if rowCount % factor or columnCount % factor:
+        padded = numpy.zeros((valueCount, coarseRows * factor, coarseColumns * factor), dtype=counts.dtype)
+        padded[:, :rowCount, :columnCount] = counts
+    else:
+        padded = counts
+
+    groups = padded.reshape(valueCount, coarseRows, factor, coarseColumns, factor)
+    return groups.sum(axis=4, dtype=dtype).sum(axis=2, dtype=dtype)
+
+
+class CountPyramid(object):
+    """ This class holds the counts of each land cover value in the coarse cells of each level of a pyramid.
+
+    **Description:**
+
+        Use :py:func:`buildCountPyramid` to create a pyramid.  Level *k*, from 1, aggregates by a factor of 2 ** *k*,
+        and its counts are a 3-D NumPy array, or `numpy.memmap`_, with one (row, column) layer for each value in
+        *valueIds*.  Coarse cells along the bottom and right edges may cover fewer fine cells.  NoData cells are not
+        counted.  Only the levels from *firstLevel* are stored.
+
+        .. _numpy.memmap: http://docs.scipy.org/doc/numpy/reference/generated/numpy.memmap.html
+
+    **Arguments:**
+
+        * *valueIds* - NumPy array of the values counted, in ascending order
+        * *shape* - (rowCount, columnCount) of the full resolution raster
+        * *levels* - `list` of 3-D NumPy arrays, the counts of each level from firstLevel
+        * *firstLevel* - the finest level stored
+
+    """
+
+    def __init__(self, valueIds, shape, levels, firstLevel=1):
+
+        self.valueIds = valueIds
+        self.shape = tuple(shape)
+        self.levels = levels
+        self.firstLevel = firstLevel
+
+    @property
+    def lastLevel(self):
+        """ The coarsest level stored """
+        return self.firstLevel + len(self.levels) - 1
+
+    def getFactor(self, level):
+        """ Get the aggregation factor of a level """
+        return 2 ** level
+
+    def getCounts(self, level):
+        """ Get the 3-D (value, row, column) NumPy array of counts of a level, raising a ValueError if it is not
+        stored """
+
+        if not self.firstLevel <= level <= self.lastLevel:
+            raise ValueError("Level {0} is not stored, the pyramid has levels {1} to {2}".format(level, self.firstLevel,
+                                                                                              self.lastLevel))
+
+        return self.levels[level - self.firstLevel]
+
+
+def buildCountPyramid(landCoverRaster, levelCount=DEFAULT_LEVEL_COUNT, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                      blockColumns=raster.DEFAULT_BLOCK_SIZE, nodata=None, firstLevel=1, directory=None):
+    """ Build a :py:class:`CountPyramid` of a categorical land cover raster in one pass over its blocks.
+
+    **Description:**
+
+        The values are found with :py:func:`pylet.numpyutil.valuecache.getValueCache`, so an unchanged raster file
+        is not scanned twice.  The blocks are rounded up to a multiple of the coarsest factor, and each level is
+        aggregated from the level below it within the block.  Counts are stored in the smallest unsigned integer type
+        holding the counts of a level.  If *nodata* is not provided, the nodata of a
+        :py:class:`pylet.numpyutil.raster.RasterGrid` is used.
+
+        Levels finer than *firstLevel* are only aggregated within each block, and not stored.  For a raster of *N*
+        cells and *V* values, level *k* takes about *N* * *V* / 4 ** *k* counts, so skipping level 1 alone divides the
+        size of the pyramid by 4.  If *directory* is provided, each level is stored in a memory-mapped file named
+        level<k>.counts in it, replacing any existing file, so the pyramid does not need to fit in memory.
+
+        The values of each block are counted in chunks of values, so at most :py:data:`COUNT_CHUNK_SIZE` first level
+        counts of a block are held at once, in the count type of each level, whatever the number of values.
+
+    **Arguments:**
+
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *levelCount* - number of levels, with factors 2 through 2 ** levelCount
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *nodata* - the value representing NoData
+        * *firstLevel* - the finest level stored, from 1 to levelCount
+        * *directory* - optional existing directory for the memory-mapped files of the levels
+
+    **Returns:**
+
+        * :py:class:`CountPyramid`
+
+    """
+
+    if not 1 <= firstLevel <= levelCount:
+        raise ValueError("The first level must be from 1 to {0}, found {1}".format(levelCount, firstLevel))
+    if nodata is None:
+        nodata = getattr(landCoverRaster, 'nodata', None)
+
+    array = raster.getRasterArray(landCoverRaster)
+    rowCount, columnCount = array.shape
+
+    valueIds = valuecache.getValueCache(landCoverRaster, blockRows, blockColumns).values
+    if nodata is not None:
+        valueIds = valueIds[valueIds != nodata]
+
+    factors = [2 ** level for level in range(1, levelCount + 1)]
+    levels = []
+    for level in range(firstLevel, levelCount + 1):
+        factor = 2 ** level
+        levelShape = (len(valueIds), -(-rowCount // factor), -(-columnCount // factor))
+        if directory is None or not numpy.prod(levelShape):
+            levels.append(numpy.zeros(levelShape, dtype=_getCountType(factor)))
+        else:
+            levelPath = os.path.join(directory, 'level{0}{1}'.format(level, LEVEL_EXTENSION))
+            levels.append(numpy.memmap(levelPath, dtype=_getCountType(factor), mode='w+', shape=levelShape))
+
+    blockRows = _getAlignedBlockSize(blockRows, factors[-1], rowCount)
+    blockColumns = _getAlignedBlockSize(blockColumns, factors[-1], columnCount)
+
+    for window in raster.getBlockWindows(rowCount, columnCount, blockRows, blockColumns):
+        block = window.read(array)
+        validMask = zonal.getValidMask(block, nodata)
+        if validMask is None:
+            validMask = numpy.ones(block.shape, dtype=bool)
+
+        # Keys of the values of the block in the cells of the first level, sorted by value
+        blockRowIndexes, blockColumnIndexes = numpy.nonzero(validMask)
+        valueIndexes = numpy.searchsorted(valueIds, block[validMask])
+        coarseRows = -(-window.rowCount // 2)
+        coarseColumns = -(-window.columnCount // 2)
+        cellCount = coarseRows * coarseColumns
+        keys = valueIndexes * cellCount + (blockRowIndexes // 2) * coarseColumns + blockColumnIndexes // 2
+
+        chunkValueCount = max(COUNT_CHUNK_SIZE // cellCount, 1)
+        if chunkValueCount < len(valueIds):
+            keys.sort()
+
+        for chunkStart in range(0, len(valueIds), chunkValueCount):
+            chunkStop = min(chunkStart + chunkValueCount, len(valueIds))
+            if chunkValueCount < len(valueIds):
+                keyStart, keyStop = numpy.searchsorted(keys, [chunkStart * cellCount, chunkStop * cellCount])
+                chunkKeys = keys[keyStart:keyStop] - chunkStart * cellCount
+            else:
+                chunkKeys = keys
+
+            counts = numpy.bincount(chunkKeys, minlength=(chunkStop - chunkStart) * cellCount).astype(
+                _getCountType(factors[0]))
+            counts = counts.reshape(chunkStop - chunkStart, coarseRows, coarseColumns)
+
+            for levelIndex, factor in enumerate(factors):
+                if levelIndex:
+                    counts = aggregateCounts(counts, dtype=_getCountType(factor))
+                if levelIndex + 1 >= firstLevel:
+                    coarseRow = window.row // factor
+                    coarseColumn = window.column // factor
+                    levels[levelIndex + 1 - firstLevel][chunkStart:chunkStop, coarseRow:coarseRow + counts.shape[1],
+                                                        coarseColumn:coarseColumn + counts.shape[2]] = counts
+
+    return CountPyramid(valueIds, array.shape, levels, firstLevel)
+
+
+class ZoneAggregation(object):
+    """ This class holds the zones of the coarse cells of a raster aggregated by a factor.
+
+    **Description:**
+
+        Use :py:func:`aggregateZones` to create this object.  A coarse cell is pure if all of its fine cells are in
+        the same zone, and mixed otherwise.  Mixed coarse cells include those with zone NoData cells, and coarse cells
+        with only zone NoData cells are neither.
+
+    **Arguments:**
+
+        * *factor* - number of fine cells along each side of a coarse cell
+        * *pureMask* - 2-D NumPy boolean array of the pure coarse cells
+        * *pureZones* - 2-D NumPy array with the zone of each pure coarse cell
+        * *mixedCells* - 1-D NumPy array of the flat index of a mixed coarse cell, for each zone in it
+        * *mixedZoneIds* - 1-D NumPy array of the zone, for each zone in a mixed coarse cell
+        * *mixedCounts* - 1-D NumPy int64 array of the number of fine cells of the zone in the mixed coarse cell
+
+    """
+
+    def __init__(self, factor, pureMask, pureZones, mixedCells, mixedZoneIds, mixedCounts):
+
+        self.factor = factor
+        self.pureMask = pureMask
+        self.pureZones = pureZones
+        self.mixedCells = mixedCells
+        self.mixedZoneIds = mixedZoneIds
+        self.mixedCounts = mixedCounts
+
+
+def aggregateZones(zoneRaster, factor, blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE,
+                   zoneNodata=None):
+    """ Find the pure and mixed coarse cells of a zone raster aggregated by a factor, one block at a time.
+
+    **Description:**
+
+        The zone raster must be on the grid of the land cover of the pyramid.  The result only depends on the zones,
+        so it can be reused for every classification and every run at the same level.  If *zoneNodata* is not
+        provided, the nodata of a :py:class:`pylet.numpyutil.raster.RasterGrid` is used.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *factor* - number of fine cells along each side of a coarse cell, such as from
+          :py:meth:`CountPyramid.getFactor`
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *zoneNodata* - the value representing NoData in the zone raster
+
+    **Returns:**
+
+        * :py:class:`ZoneAggregation`
+
+    """
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+
+    array = raster.getRasterArray(zoneRaster)
+    rowCount, columnCount = array.shape
+    coarseShape = (-(-rowCount // factor), -(-columnCount // factor))
+
+    pureMask = numpy.zeros(coarseShape, dtype=bool)
+    pureZones = numpy.zeros(coarseShape, dtype=array.dtype)
+    mixedCells = [numpy.zeros(0, dtype=numpy.int64)]
+    mixedZoneIds = [numpy.zeros(0, dtype=array.dtype)]
+    mixedCounts = [numpy.zeros(0, dtype=numpy.int64)]
+
+    blockRows = _getAlignedBlockSize(blockRows, factor, rowCount)
+    blockColumns = _getAlignedBlockSize(blockColumns, factor, columnCount)
+
+    for window in raster.getBlockWindows(rowCount, columnCount, blockRows, blockColumns):
+        block = window.read(array)
+        validMask = zonal.getValidMask(block, zoneNodata)
+        if validMask is None:
+            validMask = numpy.ones(block.shape, dtype=bool)
+        if not validMask.any():
+            continue
+
+        # Zone indexes padded to whole coarse cells, with -1 for NoData and -2 for the padding past the raster
+        zoneIds, zoneIndexes = zonal.encodeValues(block[validMask])
+        coarseRows = -(-window.rowCount // factor)
+        coarseColumns = -(-window.columnCount // factor)
+        indexes = numpy.empty((coarseRows * factor, coarseColumns * factor), dtype=numpy.int64)
+        indexes.fill(-2)
+        indexes[:window.rowCount, :window.columnCount] = -1
+        indexes[:window.rowCount, :window.columnCount][validMask] = zoneIndexes
+
+        groups = indexes.reshape(coarseRows, factor, coarseColumns, factor)
+        lowest = numpy.where(groups == -2, len(zoneIds), groups).min(axis=3).min(axis=1)
+        highest = groups.max(axis=3).max(axis=1)
+
+        coarseSlices = (slice(window.row // factor, window.row // factor + coarseRows),
+                        slice(window.column // factor, window.column // factor + coarseColumns))
+        pure = (lowest == highest) & (lowest >= 0)
+        pureMask[coarseSlices] = pure
+        pureZones[coarseSlices][pure] = zoneIds[lowest[pure]]
+
+        # The cells of each zone in the mixed coarse cells
+        mixed = ~pure & (highest >= 0)
+        if not mixed.any():
+            continue
+
+        cellRows, cellColumns = numpy.nonzero(mixed)
+        cellIndexes = numpy.empty(mixed.shape, dtype=numpy.int64)
+        cellIndexes[mixed] = numpy.arange(len(cellRows))
+        fineCells = numpy.repeat(numpy.repeat(cellIndexes, factor, axis=0), factor, axis=1)
+        fineMixed = numpy.repeat(numpy.repeat(mixed, factor, axis=0), factor, axis=1) & (indexes >= 0)
+
+        keys = fineCells[fineMixed] * len(zoneIds) + indexes[fineMixed]
+        counts = numpy.bincount(keys, minlength=len(cellRows) * len(zoneIds))
+        present = numpy.flatnonzero(counts)
+
+        globalCells = ((cellRows + window.row // factor) * coarseShape[1] +
+                       cellColumns + window.column // factor).astype(numpy.int64)
+        mixedCells.append(globalCells[present // len(zoneIds)])
+        mixedZoneIds.append(zoneIds[present % len(zoneIds)])
+        mixedCounts.append(counts[present].astype(numpy.int64))
+
+    return ZoneAggregation(factor, pureMask, pureZones, numpy.concatenate(mixedCells),
+                           numpy.concatenate(mixedZoneIds), numpy.concatenate(mixedCounts))
+
+
+def getPyramidLandCoverProportions(countPyramid, level, zoneAggregation, lccObj, cellArea=1.0,
+                                   fieldPrefix=lcp.LCP_FIELD_PREFIX):
+    """ Estimate the land cover proportions of each zone from a coarse level of a pyramid, with an error bound.
+
+    **Description:**
+
+        The counts of pure coarse cells are added to their zone exactly, and the counts of mixed coarse cells are
+        shared among their zones in proportion to the number of fine cells of each zone.  The estimated counts are
+        passed to :py:func:`pylet.numpyutil.lcp.getLandCoverProportions`, so the fields are named as for lcp.
+
+        If a zone has *A* cells of a class and *E* effective cells in its pure coarse cells, and *U* fine cells in
+        mixed coarse cells, whatever the land cover of those *U* cells its true percentage of the class lies between
+        100 * A / (E + U) and 100 * (A + U) / (E + U).  The error bound of a zone is the largest distance between the
+        estimate and these limits for any class, in percentage points.  It is NaN for zones without any effective or
+        mixed cells, and 0 for zones which are only made of pure coarse cells.
+
+    **Arguments:**
+
+        * *countPyramid* - :py:class:`CountPyramid` object
+        * *level* - level of the pyramid, from 1
+        * *zoneAggregation* - :py:class:`ZoneAggregation` object for the factor of the level
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *cellArea* - area of a single fine cell in the output area units
+        * *fieldPrefix* - prefix for class field names without an lcpField attribute
+
+    **Returns:**
+
+        * NumPy array - zone ids in ascending order
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, one element per zone, as the value
+        * NumPy float64 array - error bound of each zone in percentage points
+
+    """
+
+    factor = countPyramid.getFactor(level)
+    if zoneAggregation.factor != factor:
+        raise ValueError("Zones are aggregated by {0}, but level {1} has a factor of {2}".format(
+                         zoneAggregation.factor, level, factor))
+
+    counts = countPyramid.getCounts(level)
+    valueCount = len(countPyramid.valueIds)
+    flatCounts = counts.reshape(valueCount, -1)
+
+    zoneIds = numpy.union1d(zoneAggregation.pureZones[zoneAggregation.pureMask], zoneAggregation.mixedZoneIds)
+    pureZoneIndexes = numpy.searchsorted(zoneIds, zoneAggregation.pureZones[zoneAggregation.pureMask])
+    mixedZoneIndexes = numpy.searchsorted(zoneIds, zoneAggregation.mixedZoneIds)
+
+    # Exact counts of the pure coarse cells of each zone
+    pureCells = numpy.flatnonzero(zoneAggregation.pureMask)
+    pureCounts = numpy.empty((len(zoneIds), valueCount), dtype=numpy.float64)
+    for valueIndex in range(valueCount):
+        pureCounts[:, valueIndex] = numpy.bincount(pureZoneIndexes, weights=flatCounts[valueIndex, pureCells],
+                                                   minlength=len(zoneIds))
+
+    # Counts of the mixed coarse cells, shared by the fraction of the fine cells of the coarse cell in each zone
+    rowCount, columnCount = countPyramid.shape
+    coarseColumns = counts.shape[2]
+    cellRows = zoneAggregation.mixedCells // coarseColumns
+    cellColumns = zoneAggregation.mixedCells % coarseColumns
+    fineCellCounts = ((numpy.minimum((cellRows + 1) * factor, rowCount) - cellRows * factor) *
+                      (numpy.minimum((cellColumns + 1) * factor, columnCount) - cellColumns * factor))
+    shares = zoneAggregation.mixedCounts / fineCellCounts.astype(numpy.float64)
+
+    estimatedCounts = pureCounts.copy()
+    for valueIndex in range(valueCount):
+        estimatedCounts[:, valueIndex] += numpy.bincount(
+            mixedZoneIndexes, weights=flatCounts[valueIndex, zoneAggregation.mixedCells] * shares,
+            minlength=len(zoneIds))
+
+    columns = lcp.getLandCoverProportions(zonal.ZonalCounts(zoneIds, countPyramid.valueIds, estimatedCounts), lccObj,
+                                          cellArea, fieldPrefix, overwriteField=constants.XmlAttributeLcpField)
+
+    # The limits of the true percentages, from the pure counts and the cells in mixed coarse cells
+    landCoverClasses = lcp.getOrderedClasses(lccObj)
+    excludedValueIds = lccObj.values.getExcludedValueIds()
+    excluded = numpy.array([valueId in excludedValueIds for valueId in countPyramid.valueIds.tolist()], dtype=bool)
+    membership = lcp.getClassMembership(countPyramid.valueIds, landCoverClasses)
+    membership[excluded, :] = 0.0
+
+    pureClassCounts = numpy.dot(pureCounts, membership)
+    pureEffective = pureCounts[:, ~excluded].sum(axis=1)
+    uncertainCells = numpy.bincount(mixedZoneIndexes, weights=zoneAggregation.mixedCounts, minlength=len(zoneIds))
+
+    divisor = pureEffective + uncertainCells
+    noCells = divisor == 0
+    divisor[noCells] = 1.0
+    lowest = pureClassCounts / divisor[:, numpy.newaxis] * 100.0
+    highest = (pureClassCounts + uncertainCells[:, numpy.newaxis]) / divisor[:, numpy.newaxis] * 100.0
+
+    estimates = numpy.column_stack([columns[lcp.getClassFieldName(landCoverClass, constants.XmlAttributeLcpField,
+                                                                  fieldPrefix)]
+                                    for landCoverClass in landCoverClasses])
+    errorBounds = numpy.maximum(estimates - lowest, highest - estimates).max(axis=1)
+    errorBounds[noCells] = numpy.nan
+
+    return zoneIds, columns, errorBounds
@@ -0,0 +1,782 @@
+""" This module contains utilities for reading raster datasets as `NumPy`_ arrays without `arcpy`_.
+
+    The following formats are supported:
+
+    * ESRI ASCII grids (.asc) - read into memory, as text cannot be memory-mapped
+    * ESRI BIL, BIP and BSQ binary grids (.bil, .bip, .bsq) with a .hdr header file
+    * ESRI float grids (.flt) with a .hdr header file
+    * Tiled grids (.tiles), a directory of raw or zlib compressed tiles with a BIL style .hdr header file, as written
+      by :py:mod:`pylet.numpyutil.rasterwriter`
+
+    Binary grids are exposed as read-only `memmap`_ arrays, so opening a grid does not read its pixel data.  Pixels are
+    only paged in from disk as they are accessed.  Tiled grids are exposed as a :py:class:`TiledArray`, which reads
+    only the tiles covered by each slice.  Rasters larger than memory can be processed block by block with
+    :py:func:`iterateBlocks`.
+
+    The engines read blocks with :py:meth:`RasterWindow.read` and write them with :py:meth:`RasterWindow.writeCore`,
+    which only slice the raster.  Besides NumPy arrays, they therefore accept any object with a *shape* and a *dtype*
+    which is sliced like a 2-D array, such as a :py:class:`TiledArray`.
+
+    .. _NumPy: http://docs.scipy.org/doc/numpy/reference/
+    .. _arcpy: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/What_is_ArcPy/000v000000v7000000/
+    .. _memmap: http://docs.scipy.org/doc/numpy/reference/generated/numpy.memmap.html
+    .. _BIL: http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#//009t00000010000000
+    .. _generator: http://docs.python.org/tutorial/classes.html#generators
+
+"""
+
+import os
+import zlib
+import numpy
+from geotransform import GeoTransform
+
+DEFAULT_BLOCK_SIZE = 512
+
+ASCII_EXTENSIONS = ('.asc', '.txt')
+BINARY_EXTENSIONS = ('.bil', '.bip', '.bsq', '.flt')
+HEADER_EXTENSION = '.hdr'
+
+#: Extension of the directory holding the tiles of a tiled grid
+TILED_EXTENSION = '.tiles'
+
+#: Extension of raw tile files in a tiled grid
+RAW_TILE_EXTENSION = '.raw'
+
+#: Extension of zlib compressed tile files in a tiled grid
+COMPRESSED_TILE_EXTENSION = '.z'
+
+
+class RasterGrid(object):
+    """ This class holds the pixel data and georeferencing of a raster dataset.
+
+    **Description:**
+
+        Each band is a 2-D NumPy array with the first row at the top of the raster.  For binary grids the arrays are
+        read-only views into a memory-mapped file, and for BIL and BIP layouts the views are strided, as the bands are
+        interleaved on disk.  For tiled grids the band is a :py:class:`TiledArray`, which is sliced like one.
+
+        Use :py:func:`openRaster` to create this object from a file.
+
+    **Arguments:**
+
+        * *bands* - list of 2-D NumPy arrays, all with the same shape
+        * *extent* - tuple of (XMin, YMin, XMax, YMax) map coordinates for the outer edges of the raster
+        * *nodata* - the value representing NoData, or None
+        * *path* - full path to the raster dataset, if any
+        * *layout* - one of 'ASCII', 'BIL', 'BIP', 'BSQ', 'TILED' or None for in-memory arrays
+
+    """
+
+    #: A `list` of 2-D NumPy arrays, one per band
+    bands = None
+
+    #: A tuple of (XMin, YMin, XMax, YMax) map coordinates
+    extent = None
+
+    #: The width of a cell in map units
+    cellWidth = None
+
+    #: The height of a cell in map units
+    cellHeight = None
+
+    #: The value representing NoData, or None
+    nodata = None
+
+    #: The full path to the raster dataset
+    path = None
+
+    #: The layout of the pixels on disk: 'ASCII', 'BIL', 'BIP', 'BSQ' or 'TILED'
+    layout = None
+
+    def __init__(self, bands, extent, nodata=None, path=None, layout=None):
+
+        self.bands = list(bands)
+        self.extent = tuple([float(coordinate) for coordinate in extent])
+        self.nodata = nodata
+        self.path = path
+        self.layout = layout
+
+        xMin, yMin, xMax, yMax = self.extent
+        self.cellWidth = (xMax - xMin) / self.columnCount
+        self.cellHeight = (yMax - yMin) / self.rowCount
+
+    @property
+    def array(self):
+        """ The 2-D NumPy array for the first band """
+        return self.bands[0]
+
+    @property
+    def rowCount(self):
+        """ The number of rows """
+        return self.bands[0].shape[0]
+
+    @property
+    def columnCount(self):
+        """ The number of columns """
+        return self.bands[0].shape[1]
+
+    @property
+    def bandCount(self):
+        """ The number of bands """
+        return len(self.bands)
+
+    @property
+    def dtype(self):
+        """ The NumPy data type of the pixel values """
+        return self.bands[0].dtype
+
+    def getBand(self, bandIndex=0):
+        """ Get the 2-D NumPy array for the band with the given zero based index """
+        return self.bands[bandIndex]
+
+    @property
+    def geoTransform(self):
+        """ The :py:class:`pylet.numpyutil.geotransform.GeoTransform` for converting cells to map coordinates """
+        return GeoTransform.fromRaster(self)
+
+
+class RasterWindow(object):
+    """ This class holds a rectangular block of a raster, with an optional halo of surrounding cells.
+
+    **Description:**
+
+        The core of the window is the block of cells it is responsible for.  The halo is a border of up to *halo* cells
+        on each side, read from the neighboring blocks, for metrics which depend on a cell's neighborhood.  At the edges
+        of the raster the halo is clipped, so check *haloTop*, *haloBottom*, *haloLeft* and *haloRight* for the actual
+        number of halo cells on each side.
+
+        The *array* holds the core and the halo.  Use *coreSlices* to select the core from it, or the *core* property.
+        Windows are created by :py:func:`getBlockWindows` and :py:func:`iterateBlocks`.
+
+    **Arguments:**
+
+        * *row*, *column* - zero based indexes of the upper left cell of the core in the raster
+        * *rowCount*, *columnCount* - size of the core in cells
+        * *haloTop*, *haloBottom*, *haloLeft*, *haloRight* - number of halo cells on each side
+
+    """
+
+    #: A 2-D NumPy array for the core and halo, or None if the window has not been read
+    array = None
+
+    #: A :py:class:`pylet.numpyutil.geotransform.GeoTransform` for the upper left corner of *array*
+    transform = None
+
+    #: A tuple of (XMin, YMin, XMax, YMax) map coordinates for *array*
+    extent = None
+
+    def __init__(self, row, column, rowCount, columnCount, haloTop=0, haloBottom=0, haloLeft=0, haloRight=0):
+
+        self.row = row
+        self.column = column
+        self.rowCount = rowCount
+        self.columnCount = columnCount
+        self.haloTop = haloTop
+        self.haloBottom = haloBottom
+        self.haloLeft = haloLeft
+        self.haloRight = haloRight
+
+    @property
+    def slices(self):
+        """ A (row slice, column slice) tuple selecting the core and halo from the full raster """
+        return (slice(self.row - self.haloTop, self.row + self.rowCount + self.haloBottom),
+                slice(self.column - self.haloLeft, self.column + self.columnCount + self.haloRight))
+
+    @property
+    def coreSlices(self):
+        """ A (row slice, column slice) tuple selecting the core from the window *array* """
+        return (slice(self.haloTop, self.haloTop + self.rowCount),
+                slice(self.haloLeft, self.haloLeft + self.columnCount))
+
+    @property
+    def core(self):
+        """ A view of the core of the window *array*, without the halo """
+        return self.array[self.coreSlices]
+
+    def read(self, array):
+        """ Get the view of a full raster array covered by this window, including the halo """
+        return array[self.slices]
+
+    def readCore(self, array):
+        """ Get the view of a full raster array covered by the core of this window, without the halo """
+        return array[self.row:self.row + self.rowCount, self.column:self.column + self.columnCount]
+
+    def writeCore(self, array, block):
+        """ Set the cells of a full raster array covered by the core of this window from a block of the core shape """
+        array[self.row:self.row + self.rowCount, self.column:self.column + self.columnCount] = block
+
+
+class TiledArray(object):
+    """ This class is the base of 2-D rasters stored as separate tiles, which are read and written by slicing.
+
+    **Description:**
+
+        The raster is split into tiles of *tileRows* by *tileColumns* cells, aligned to the upper left corner, and
+        subclasses store each tile with :py:meth:`_readTile` and :py:meth:`_writeTile`.  Blocks of any size and
+        position are read with :py:meth:`read` and written with :py:meth:`write`, only touching the tiles they
+        overlap.  Tiles which were never written read as *fill*, so the base class, which stores no tiles, is a
+        read-only raster of *fill*.
+
+        Indexing with a pair of row and column slices, as in tiledArray[10:20, 30:40], reads or writes the cells of
+        the rectangle, so the raster can be read and written by the engines like a 2-D NumPy array.  Only contiguous
+        slices are supported, other keys raise an IndexError.
+
+    **Arguments:**
+
+        * *rowCount*, *columnCount* - size of the raster in cells
+        * *dtype* - NumPy data type of the cells
+        * *tileRows*, *tileColumns* - size of the tiles in cells, None for the full height or width of the raster
+        * *fill* - the value of cells which were never written
+
+    """
+
+    #: Number of dimensions, as for a 2-D NumPy array
+    ndim = 2
+
+    def __init__(self, rowCount, columnCount, dtype, tileRows=DEFAULT_BLOCK_SIZE, tileColumns=DEFAULT_BLOCK_SIZE,
+                 fill=0):
+
+        self.shape = (rowCount, columnCount)
+        self.dtype = numpy.dtype(dtype)
+        self.tileRows = tileRows or rowCount
+        self.tileColumns = tileColumns or columnCount
+        self.fill = fill
+
+    def __getitem__(self, key):
+        return self.read(self._getKeyWindow(key))
+
+    def __setitem__(self, key, block):
+        window = self._getKeyWindow(key)
+
+        block = numpy.asarray(block)
+        if block.shape != (window.rowCount, window.columnCount):
+            expanded = numpy.empty((window.rowCount, window.columnCount), dtype=self.dtype)
+            expanded[...] = block
+            block = expanded
+
+        self.write(window, block)
+
+    def __array__(self, dtype=None):
+        array = self.toArray()
+        return array if dtype is None else array.astype(dtype)
+
+    def _getKeyWindow(self, key):
+        """ Returns the window of a (row slice, column slice) key, raising an IndexError for other keys """
+
+        if not isinstance(key, tuple) or len(key) != 2 or not all([isinstance(part, slice) for part in key]):
+            raise IndexError("Tiled rasters are indexed by a pair of slices, found {0!r}".format(key))
+
+        starts = []
+        counts = []
+        for part, size in zip(key, self.shape):
+            start, stop, step = part.indices(size)
+            if step != 1:
+                raise IndexError("Tiled rasters are indexed by contiguous slices, found a step of {0}".format(step))
+            starts.append(start)
+            counts.append(max(stop - start, 0))
+
+        return RasterWindow(starts[0], starts[1], counts[0], counts[1])
+
+    def getTileWindows(self, rowSlice=None, columnSlice=None):
+        """ A `generator`_ for the :py:class:`RasterWindow` objects of the tiles which overlap a rectangle of cells,
+        by default the whole raster """
+
+        rowCount, columnCount = self.shape
+        rowSlice = rowSlice or slice(0, rowCount)
+        columnSlice = columnSlice or slice(0, columnCount)
+        firstRow = rowSlice.start // self.tileRows * self.tileRows
+        firstColumn = columnSlice.start // self.tileColumns * self.tileColumns
+
+        for row in range(firstRow, rowSlice.stop, self.tileRows):
+            for column in range(firstColumn, columnSlice.stop, self.tileColumns):
+                yield RasterWindow(row, column, min(self.tileRows, rowCount - row),
+                                   min(self.tileColumns, columnCount - column))
+
+    def _readTile(self, tileWindow):
+        """ Returns the array of a tile, or None if it was never written, which is every tile of the base class """
+        return None
+
+    def _writeTile(self, tileWindow, tile):
+        """ Stores the array of a tile """
+        raise TypeError("{0} objects are read-only".format(type(self).__name__))
+
+    def _getTile(self, tileWindow):
+        """ Returns the array of a tile, filled if it was never written """
+
+        tile = self._readTile(tileWindow)
+        if tile is None:
+            tile = numpy.empty((tileWindow.rowCount, tileWindow.columnCount), dtype=self.dtype)
+            tile.fill(self.fill)
+
+        return tile
+
+    def _getOverlap(self, tileWindow, rowSlice, columnSlice):
+        """ Returns the slices of the overlap of a tile and a rectangle, within the tile and within the rectangle """
+
+        top = max(rowSlice.start, tileWindow.row)
+        bottom = min(rowSlice.stop, tileWindow.row + tileWindow.rowCount)
+        left = max(columnSlice.start, tileWindow.column)
+        right = min(columnSlice.stop, tileWindow.column + tileWindow.columnCount)
+
+        return ((slice(top - tileWindow.row, bottom - tileWindow.row),
+                 slice(left - tileWindow.column, right - tileWindow.column)),
+                (slice(top - rowSlice.start, bottom - rowSlice.start),
+                 slice(left - columnSlice.start, right - columnSlice.start)))
+
+    def _getBlockTiles(self, window, block):
+        """ A generator for the tile windows overlapped by the core of a window and their tiles with the cells of the
+        block applied, reading the tiles which are only partly covered """
+
+        rowSlice = slice(window.row, window.row + window.rowCount)
+        columnSlice = slice(window.column, window.column + window.columnCount)
+
+        for tileWindow in self.getTileWindows(rowSlice, columnSlice):
+            tileSlices, blockSlices = self._getOverlap(tileWindow, rowSlice, columnSlice)
+
+            if tileSlices == tileWindow.coreSlices:
+                tile = block[blockSlices]
+            else:
+                tile = numpy.array(self._getTile(tileWindow))
+                tile[tileSlices] = block[blockSlices]
+
+            yield tileWindow, tile.astype(self.dtype, copy=False)
+
+    def read(self, window):
+        """ Get a new 2-D NumPy array of the cells covered by a :py:class:`RasterWindow`, including its halo """
+
+        rowSlice, columnSlice = window.slices
+        block = numpy.empty((rowSlice.stop - rowSlice.start, columnSlice.stop - columnSlice.start), dtype=self.dtype)
+
+        for tileWindow in self.getTileWindows(rowSlice, columnSlice):
+            tileSlices, blockSlices = self._getOverlap(tileWindow, rowSlice, columnSlice)
+            block[blockSlices] = self._getTile(tileWindow)[tileSlices]
+
+        return block
+
+    def write(self, window, block):
+        """ Store a 2-D NumPy array as the cells of the core of a :py:class:`RasterWindow` """
+
+        for tileWindow, tile in self._getBlockTiles(window, numpy.asarray(block)):
+            self._writeTile(tileWindow, tile)
+
+    def toArray(self):
+        """ Get the whole raster as a 2-D NumPy array """
+        return self.read(RasterWindow(0, 0, self.shape[0], self.shape[1]))
+
+
+class TileFileArray(TiledArray):
+    """ This class reads the tiles of a tiled grid from the files in its tile directory.
+
+    **Description:**
+
+        Each tile is stored in the directory as <row>_<column> followed by :py:data:`RAW_TILE_EXTENSION` for raw
+        cells, or :py:data:`COMPRESSED_TILE_EXTENSION` for cells compressed with zlib, where row and column are the
+        zero based indexes of its upper left cell.  Cells are stored row by row in little endian byte order.  Tiles
+        without a file read as *fill*.  Use :py:func:`readTiledGrid` to create this object from a tiled grid.
+
+    **Arguments:**
+
+        * *tileDirectory* - Full path to the directory of tiles
+        * *rowCount*, *columnCount* - size of the raster in cells
+        * *dtype* - NumPy data type of the cells
+        * *tileRows*, *tileColumns* - size of the tiles in cells
+        * *fill* - the value of cells without a tile file
+
+    """
+
+    def __init__(self, tileDirectory, rowCount, columnCount, dtype, tileRows=DEFAULT_BLOCK_SIZE,
+                 tileColumns=DEFAULT_BLOCK_SIZE, fill=0):
+
+        TiledArray.__init__(self, rowCount, columnCount, numpy.dtype(dtype).newbyteorder('<'), tileRows, tileColumns,
+                            fill)
+        self.tileDirectory = tileDirectory
+
+    def getTilePath(self, tileWindow, compressed=False):
+        """ Get the path of the raw or compressed file of a tile """
+
+        extension = COMPRESSED_TILE_EXTENSION if compressed else RAW_TILE_EXTENSION
+        return os.path.join(self.tileDirectory, '{0}_{1}{2}'.format(tileWindow.row, tileWindow.column, extension))
+
+    def _readTile(self, tileWindow):
+        """ Returns the array of a tile from its raw or compressed file, or None if it has neither """
+
+        for compressed in (False, True):
+            try:
+                with open(self.getTilePath(tileWindow, compressed), 'rb') as tileFile:
+                    data = tileFile.read()
+            except IOError:
+                continue
+
+            if compressed:
+                data = zlib.decompress(data)
+            return numpy.frombuffer(data, dtype=self.dtype).reshape(tileWindow.rowCount, tileWindow.columnCount)
+
+        return None
+
+
+def getRasterArray(raster, bandIndex=0):
+    """ Get the 2-D NumPy array for a band of a :py:class:`RasterGrid`, or the array itself for a NumPy array or
+    another object sliced like one """
+
+    if isinstance(raster, RasterGrid):
+        return raster.getBand(bandIndex)
+    elif hasattr(raster, 'shape') and hasattr(raster, '__getitem__'):
+        return raster
+    else:
+        return numpy.asanyarray(raster)
+
+
+def getBlockWindows(rowCount, columnCount, blockRows=DEFAULT_BLOCK_SIZE, blockColumns=DEFAULT_BLOCK_SIZE, halo=0,
+                    columnMajor=False):
+    """ A `generator`_ for :py:class:`RasterWindow` objects tiling a raster of the given size.
+
+    **Description:**
+
+        The raster is split into aligned blocks of *blockRows* by *blockColumns* cells, with smaller blocks along the
+        right and bottom edges.  Each block is extended by a halo of up to *halo* cells on each side.  The windows do
+        not hold any data, use :py:meth:`RasterWindow.read` to get the view of an array covered by a window.  This
+        allows several rasters on the same grid to be read in lockstep.
+
+        Blocks are yielded row by row, unless *columnMajor* is True, in which case they are yielded column by column.
+
+    **Arguments:**
+
+        * *rowCount*, *columnCount* - size of the raster in cells
+        * *blockRows*, *blockColumns* - size of the blocks in cells, None for the full height or width of the raster
+        * *halo* - number of cells to extend each block on each side
+        * *columnMajor* - boolean to yield blocks column by column
+
+    **Returns:**
+
+        * `generator`_ for :py:class:`RasterWindow` objects
+
+    """
+
+    blockRows = blockRows or rowCount
+    blockColumns = blockColumns or columnCount
+
+    rowStarts = range(0, rowCount, blockRows)
+    columnStarts = range(0, columnCount, blockColumns)
+
+    if columnMajor:
+        blockOrigins = [(row, column) for column in columnStarts for row in rowStarts]
+    else:
+        blockOrigins = [(row, column) for row in rowStarts for column in columnStarts]
+
+    for row, column in blockOrigins:
+        windowRows = min(blockRows, rowCount - row)
+        windowColumns = min(blockColumns, columnCount - column)
+
+        yield RasterWindow(row, column, windowRows, windowColumns,
+                           haloTop=min(halo, row),
+                           haloBottom=min(halo, rowCount - row - windowRows),
+                           haloLeft=min(halo, column),
+                           haloRight=min(halo, columnCount - column - windowColumns))
+
+
+def iterateBlocks(raster, blockRows=DEFAULT_BLOCK_SIZE, blockColumns=DEFAULT_BLOCK_SIZE, halo=0, bandIndex=0):
+    """ A `generator`_ for :py:class:`RasterWindow` objects holding the blocks of a raster.
+
+    **Description:**
+
+        See :py:func:`getBlockWindows` for how the raster is split into blocks.  Each window *array* is a view of the
+        raster band, so no pixel data is copied, and for memory-mapped rasters only the pages covered by the window are
+        read from disk as the array is accessed.
+
+        The blocks are yielded in the order the cells are stored on disk: row by row for rasters where cells in a row
+        are adjacent, which covers all ESRI binary layouts, and column by column for column-major arrays.  For
+        :py:class:`RasterGrid` objects each window also holds its *transform* and *extent*.
+
+    **Arguments:**
+
+        * *raster* - :py:class:`RasterGrid` object, 2-D NumPy array or other object sliced like one
+        * *blockRows*, *blockColumns* - size of the blocks in cells, None for the full height or width of the raster
+        * *halo* - number of cells to extend each block on each side
+        * *bandIndex* - zero based index of the band to read from a :py:class:`RasterGrid`
+
+    **Returns:**
+
+        * `generator`_ for :py:class:`RasterWindow` objects
+
+    """
+
+    array = getRasterArray(raster, bandIndex)
+    if isinstance(raster, RasterGrid):
+        geoTransform = raster.geoTransform
+
+    rowCount, columnCount = array.shape
+    strides = getattr(array, 'strides', (0, 0))
+    columnMajor = abs(strides[1]) > abs(strides[0])
+
+    for window in getBlockWindows(rowCount, columnCount, blockRows, blockColumns, halo, columnMajor):
+        window.array = window.read(array)
+
+        if isinstance(raster, RasterGrid):
+            window.transform = geoTransform.getWindowTransform(window.row - window.haloTop,
+                                                               window.column - window.haloLeft)
+            xMin, yMax = window.transform.xMin, window.transform.yMax
+            windowRows, windowColumns = window.array.shape
+            window.extent = (xMin, yMax - windowRows * raster.cellHeight, xMin + windowColumns * raster.cellWidth, yMax)
+
+        yield window
+
+
+def openRaster(rasterPath):
+    """ Open a raster dataset as a :py:class:`RasterGrid` without arcpy.
+
+    **Description:**
+
+        The format is determined from the file extension.  ESRI ASCII grids are read into memory, binary grids are
+        memory-mapped and tiled grids are read a tile at a time.  See the module description for supported formats.  A
+        ValueError is raised for unsupported file extensions.
+
+    **Arguments:**
+
+        * *rasterPath* - Full path to the raster file
+
+    **Returns:**
+
+        * :py:class:`RasterGrid`
+
+    """
+
+    extension = os.path.splitext(rasterPath)[1].lower()
+
+    if extension in ASCII_EXTENSIONS:
+        return readAsciiGrid(rasterPath)
+    elif extension in BINARY_EXTENSIONS:
+        return readBinaryGrid(rasterPath)
+    elif extension == TILED_EXTENSION:
+        return readTiledGrid(rasterPath)
+    else:
+        raise ValueError("Unsupported raster format: {0}".format(rasterPath))
+
+
+def readAsciiGrid(asciiPath):
+    """ Read an ESRI ASCII grid into a :py:class:`RasterGrid`.
+
+    **Description:**
+
+        The header keywords ncols, nrows, xllcorner or xllcenter, yllcorner or yllcenter, cellsize and the optional
+        nodata_value are recognized in any case.  The pixel values are returned as a 32-bit integer array if they are
+        all whole numbers, otherwise as a 32-bit float array.
+
+    **Arguments:**
+
+        * *asciiPath* - Full path to the ASCII grid file
+
+    **Returns:**
+
+        * :py:class:`RasterGrid`
+
+    """
+
+    header = {}
+
+    with open(asciiPath, 'r') as asciiFile:
+
+        # Header lines start with a keyword, the first line starting with a number begins the pixel values
+        while True:
+            position = asciiFile.tell()
+            line = asciiFile.readline()
+            tokens = line.split()
+            if not tokens or not tokens[0][0].isalpha():
+                asciiFile.seek(position)
+                break
+            header[tokens[0].lower()] = tokens[1]
+
+        values = numpy.fromstring(asciiFile.read(), dtype=numpy.float64, sep=' ')
+
+    columnCount = int(header['ncols'])
+    rowCount = int(header['nrows'])
+    cellSize = float(header['cellsize'])
+
+    if values.size != rowCount * columnCount:
+        raise ValueError("Expected {0} values in {1}, found {2}".format(rowCount * columnCount, asciiPath, values.size))
+
+    # Corner coordinates are the outer edge of the lower left cell, centers are half a cell inside
+    if 'xllcenter' in header:
+        xMin = float(header['xllcenter']) - cellSize / 2.0
+    else:
+        xMin = float(header['xllcorner'])
+    if 'yllcenter' in header:
+        yMin = float(header['yllcenter']) - cellSize / 2.0
+    else:
+        yMin = float(header['yllcorner'])
+
+    if numpy.all(numpy.mod(values, 1) == 0) and values.size and abs(values).max() < 2**31:
+        dtype = numpy.int32
+    else:
+        dtype = numpy.float32
+
+    nodata = header.get('nodata_value')
+    if nodata is not None:
+        nodata = numpy.dtype(dtype).type(float(nodata))
+
+    array = values.astype(dtype).reshape(rowCount, columnCount)
+    extent = (xMin, yMin, xMin + columnCount * cellSize, yMin + rowCount * cellSize)
+
+    return RasterGrid([array], extent, nodata, asciiPath, 'ASCII')
+
+
+def readBinaryGrid(binaryPath):
+    """ Open an ESRI BIL, BIP, BSQ or FLT binary grid as a memory-mapped :py:class:`RasterGrid`.
+
+    **Description:**
+
+        The header is read from the .hdr file with the same base name as the binary file.  Both header styles are
+        recognized, in any case:
+
+        * `BIL`_ style - nrows, ncols, nbands, nbits, pixeltype, byteorder, layout, skipbytes, bandrowbytes,
+          totalrowbytes, bandgapbytes, ulxmap, ulymap, xdim, ydim and nodata
+        * Float grid style - ncols, nrows, xllcorner, yllcorner, cellsize, nodata_value and byteorder
+
+        The pixel data is not read.  Each band is a read-only strided view into a single `memmap`_ of the file.
+
+    **Arguments:**
+
+        * *binaryPath* - Full path to the binary grid file
+
+    **Returns:**
+
+        * :py:class:`RasterGrid`
+
+    """
+
+    basePath, extension = os.path.splitext(binaryPath)
+    header = _readHeader(basePath + HEADER_EXTENSION)
+    extension = extension.lower()
+
+    rowCount = int(header['nrows'])
+    columnCount = int(header['ncols'])
+    bandCount = int(header.get('nbands', 1))
+
+    if extension == '.flt':
+        layout = 'BSQ'
+        dtype = numpy.dtype(numpy.float32)
+    else:
+        layout = header.get('layout', extension[1:]).upper()
+        dtype = _getPixelDataType(header)
+
+    # LSBFIRST and I (Intel) are little endian, MSBFIRST and M (Motorola) are big endian
+    byteOrder = header.get('byteorder', 'I').upper()
+    dtype = dtype.newbyteorder('>' if byteOrder in ('M', 'MSBFIRST') else '<')
+
+    itemSize = dtype.itemsize
+    skipBytes = int(header.get('skipbytes', 0))
+
+    # Strides in bytes between rows and between the start of each band, following the ESRI header definitions
+    if layout == 'BIP':
+        totalRowBytes = int(header.get('totalrowbytes', columnCount * bandCount * itemSize))
+        rowStride, columnStride, bandStride = totalRowBytes, bandCount * itemSize, itemSize
+    elif layout == 'BIL':
+        bandRowBytes = int(header.get('bandrowbytes', columnCount * itemSize))
+        totalRowBytes = int(header.get('totalrowbytes', bandCount * bandRowBytes))
+        rowStride, columnStride, bandStride = totalRowBytes, itemSize, bandRowBytes
+    elif layout == 'BSQ':
+        bandRowBytes = int(header.get('bandrowbytes', columnCount * itemSize))
+        bandGapBytes = int(header.get('bandgapbytes', 0))
+        rowStride, columnStride, bandStride = bandRowBytes, itemSize, rowCount * bandRowBytes + bandGapBytes
+    else:
+        raise ValueError("Unsupported layout {0} in header for {1}".format(layout, binaryPath))
+
+    fileMap = numpy.memmap(binaryPath, dtype=numpy.uint8, mode='r')
+
+    bands = []
+    for bandIndex in range(bandCount):
+        band = numpy.ndarray(shape=(rowCount, columnCount), dtype=dtype, buffer=fileMap,
+                             offset=skipBytes + bandIndex * bandStride, strides=(rowStride, columnStride))
+        bands.append(band)
+
+    extent = _getHeaderExtent(header, rowCount, columnCount)
+
+    nodata = header.get('nodata', header.get('nodata_value'))
+    if nodata is not None:
+        nodata = dtype.type(float(nodata))
+
+    return RasterGrid(bands, extent, nodata, binaryPath, layout)
+
+
+def readTiledGrid(tiledPath):
+    """ Open a tiled grid as a :py:class:`RasterGrid` whose band is a :py:class:`TileFileArray`.
+
+    **Description:**
+
+        The header is read from the .hdr file with the same base name as the tile directory.  It is a `BIL`_ style
+        header with nrows, ncols, nbits, pixeltype, ulxmap, ulymap, xdim, ydim and nodata, and the size of the tiles
+        in tilerows and tilecolumns.  Besides the data types of binary grids, tiled grids may hold 64 bit integers.
+        Tiles are only read as the band is sliced, and tiles without a file read as NoData, or 0 without a nodata.
+
+    **Arguments:**
+
+        * *tiledPath* - Full path to the .tiles directory
+
+    **Returns:**
+
+        * :py:class:`RasterGrid`
+
+    """
+
+    header = _readHeader(os.path.splitext(tiledPath)[0] + HEADER_EXTENSION)
+
+    rowCount = int(header['nrows'])
+    columnCount = int(header['ncols'])
+    dtype = _getPixelDataType(header, (8, 16, 32, 64))
+
+    nodata = header.get('nodata')
+    if nodata is not None:
+        nodata = dtype.type(float(nodata) if dtype.kind == 'f' else int(nodata))
+
+    tiles = TileFileArray(tiledPath, rowCount, columnCount, dtype, int(header.get('tilerows', DEFAULT_BLOCK_SIZE)),
+                          int(header.get('tilecolumns', DEFAULT_BLOCK_SIZE)), 0 if nodata is None else nodata)
+
+    return RasterGrid([tiles], _getHeaderExtent(header, rowCount, columnCount), nodata, tiledPath, 'TILED')
+
+
+def _readHeader(headerPath):
+    """ Returns a dictionary of lower case keywords and their values from an ESRI .hdr file """
+
+    header = {}
+
+    with open(headerPath, 'r') as headerFile:
+        for line in headerFile:
+            tokens = line.split()
+            if len(tokens) >= 2:
+                header[tokens[0].lower()] = tokens[1]
+
+    return header
+
+
+def _getPixelDataType(header, integerBits=(8, 16, 32)):
+    """ Returns the NumPy dtype for the nbits and pixeltype keywords of a BIL style header """
+
+    bitCount = int(header.get('nbits', 8))
+    pixelType = header.get('pixeltype', 'UNSIGNEDINT').upper()
+
+    if pixelType == 'FLOAT' and bitCount in (32, 64):
+        return numpy.dtype('f{0}'.format(bitCount // 8))
+    elif pixelType == 'SIGNEDINT' and bitCount in integerBits:
+        return numpy.dtype('i{0}'.format(bitCount // 8))
+    elif pixelType in ('UNSIGNEDINT', 'INTEGER') and bitCount in integerBits:
+        return numpy.dtype('u{0}'.format(bitCount // 8))
+    else:
+        raise ValueError("Unsupported pixel type: {0} with {1} bits".format(pixelType, bitCount))
+
+
+def _getHeaderExtent(header, rowCount, columnCount):
+    """ Returns the (XMin, YMin, XMax, YMax) extent described by an ESRI .hdr file """
+
+    if 'cellsize' in header:
+        # Float grid style, lower left corner
+        cellWidth = cellHeight = float(header['cellsize'])
+        xMin = float(header.get('xllcorner', 0))
+        yMin = float(header.get('yllcorner', 0))
+    else:
+        # BIL style, center of the upper left cell.  Defaults follow the ESRI BIL specification.
+        cellWidth = float(header.get('xdim', 1))
+        cellHeight = float(header.get('ydim', 1))
+        xMin = float(header.get('ulxmap', 0)) - cellWidth / 2.0
+        yMax = float(header.get('ulymap', rowCount - 1)) + cellHeight / 2.0
+        yMin = yMax - rowCount * cellHeight
+
+    return (xMin, yMin, xMin + columnCount * cellWidth, yMin + rowCount * cellHeight)
@@ -0,0 +1,290 @@
+""" This module contains utilities for converting vector features, given as NumPy coordinate arrays, to raster cells.
+
+    Coordinates are converted to cells with a :py:class:`pylet.numpyutil.geotransform.GeoTransform`, so features can
+    be rasterized into any block of a raster by using the transform of its window.
+
+    Polygons are rasterized by scanlines through the cell centers of each row.  The crossings of each scanline with the
+    edges of a polygon are sorted, and the cells between each pair of crossings are filled, so holes and multipart
+    polygons need no special handling.  Zone rasters are made from polygons with :py:func:`rasterizeZones`, which
+    writes one block at a time into any array, such as a memory mapped raster file.
+
+"""
+
+import numpy
+import raster
+
+#: Zone id of cells not covered by any polygon
+ZONE_NODATA = -1
+
+#: Fraction of the smallest cell dimension between the points sampled along a line
+LINE_SAMPLE_SPACING = 0.25
+
+
+def getLineSegments(lines):
+    """ Get the segments of polylines as an n x 4 NumPy float64 array of (x0, y0, x1, y1) rows.
+
+    **Description:**
+
+        Each line is a sequence of (x, y) vertices, such as an n x 2 NumPy array or a `list` of tuples.  Multipart
+        lines should be passed as one line per part.
+
+    **Arguments:**
+
+        * *lines* - sequence of lines
+
+    **Returns:**
+
+        * 2-D NumPy float64 array
+
+    """
+
+    segments = [numpy.zeros((0, 4))]
+
+    for line in lines:
+        vertices = numpy.asarray(line, dtype=numpy.float64).reshape(-1, 2)
+        if len(vertices) == 1:
+            vertices = numpy.vstack([vertices, vertices])
+        segments.append(numpy.hstack([vertices[:-1], vertices[1:]]))
+
+    return numpy.vstack(segments)
+
+
+def rasterizeSegments(segments, rowCount, columnCount, geoTransform, output=None):
+    """ Mark the cells crossed by line segments in a 2-D boolean array.
+
+    **Description:**
+
+        Points are sampled along each segment every :py:data:`LINE_SAMPLE_SPACING` of the smallest cell dimension,
+        and the cells containing the points are marked, so a cell is only missed if a line clips one of its corners.
+        Segments outside the array are skipped, so this can be called for each block of a raster with all segments,
+        using the transform of the block.
+
+    **Arguments:**
+
+        * *segments* - n x 4 NumPy array from :py:func:`getLineSegments`
+        * *rowCount*, *columnCount* - size of the array
+        * *geoTransform* - :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the upper left corner of the array
+        * *output* - optional 2-D NumPy boolean array to mark, which is created if None
+
+    **Returns:**
+
+        * 2-D NumPy boolean array
+
+    """
+
+    if output is None:
+        output = numpy.zeros((rowCount, columnCount), dtype=bool)
+
+    # Only the segments whose bounding box touches the array
+    xMax = geoTransform.xMin + columnCount * geoTransform.cellWidth
+    yMin = geoTransform.yMax - rowCount * geoTransform.cellHeight
+    x0, y0, x1, y1 = segments.T
+    inside = ((numpy.maximum(x0, x1) >= geoTransform.xMin) & (numpy.minimum(x0, x1) <= xMax) &
+              (numpy.maximum(y0, y1) >= yMin) & (numpy.minimum(y0, y1) <= geoTransform.yMax))
+    x0, y0, x1, y1 = x0[inside], y0[inside], x1[inside], y1[inside]
+
+    if not x0.size:
+        return output
+
+    spacing = LINE_SAMPLE_SPACING * min(geoTransform.cellWidth, geoTransform.cellHeight)
+    sampleCounts = numpy.ceil(numpy.hypot(x1 - x0, y1 - y0) / spacing).astype(numpy.int64) + 1
+
+    segmentIndexes = numpy.repeat(numpy.arange(len(x0)), sampleCounts)
+    sampleIndexes = numpy.arange(sampleCounts.sum()) - numpy.repeat(numpy.cumsum(sampleCounts) - sampleCounts,
+                                                                     sampleCounts)
+    fractions = sampleIndexes / numpy.maximum(sampleCounts - 1, 1).astype(numpy.float64)[segmentIndexes]
+
+    x = x0[segmentIndexes] + (x1 - x0)[segmentIndexes] * fractions
+    y = y0[segmentIndexes] + (y1 - y0)[segmentIndexes] * fractions
+    rows, columns = geoTransform.toRowColumn(x, y)
+
+    inArray = (rows >= 0) & (rows < rowCount) & (columns >= 0) & (columns < columnCount)
+    output[rows[inArray], columns[inArray]] = True
+
+    return output
+
+
+def getPolygonEdges(polygons):
+    """ Get the edges of polygons as an n x 4 NumPy float64 array of (x0, y0, x1, y1) rows, and the polygon of each.
+
+    **Description:**
+
+        Each polygon is a sequence of rings, and each ring is a sequence of (x, y) vertices, such as an n x 2 NumPy
+        array.  The rings of a polygon include the outer rings of all its parts and all its holes, in any order and
+        orientation.  Rings are closed if the last vertex is not the first, and horizontal edges are dropped, as they
+        never cross a scanline.
+
+    **Arguments:**
+
+        * *polygons* - sequence of polygons
+
+    **Returns:**
+
+        * 2-D NumPy float64 array - edges
+        * 1-D NumPy array - index of the polygon of each edge
+
+    """
+
+    edges = [numpy.zeros((0, 4))]
+    polygonIndexes = [numpy.zeros(0, dtype=numpy.intp)]
+
+    for polygonIndex, rings in enumerate(polygons):
+        for ring in rings:
+            vertices = numpy.asarray(ring, dtype=numpy.float64).reshape(-1, 2)
+            if not len(vertices):
+                continue
+            if (vertices[0] != vertices[-1]).any():
+                vertices = numpy.vstack([vertices, vertices[:1]])
+
+            ringEdges = numpy.hstack([vertices[:-1], vertices[1:]])
+            ringEdges = ringEdges[ringEdges[:, 1] != ringEdges[:, 3]]
+            edges.append(ringEdges)
+            polygonIndexes.append(numpy.empty(len(ringEdges), dtype=numpy.intp))
+            polygonIndexes[-1].fill(polygonIndex)
+
+    return numpy.vstack(edges), numpy.concatenate(polygonIndexes)
+
+
+def rasterizePolygons(edges, polygonIndexes, values, rowCount, columnCount, geoTransform, output=None):
+    """ Fill the cells whose centers are inside polygons with a value for each polygon.
+
+    **Description:**
+
+        A cell is inside a polygon if its center is inside, by the even-odd rule.  Cell centers on a left or bottom
+        edge are inside and those on a right or top edge are not, so polygons sharing an edge never share a cell.
+        Where polygons overlap, the polygon with the highest index wins.
+
+        Only the scanlines of the rows of the array are filled, so this can be called for each block of a raster,
+        using the transform of the block, with all edges of the polygons crossing it.
+
+    **Arguments:**
+
+        * *edges*, *polygonIndexes* - edges and polygon indexes from :py:func:`getPolygonEdges`
+        * *values* - 1-D NumPy array with the value of each polygon
+        * *rowCount*, *columnCount* - size of the array
+        * *geoTransform* - :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the upper left corner of the array
+        * *output* - 2-D NumPy array to fill, which is created with the dtype of values and zeros if None
+
+    **Returns:**
+
+        * 2-D NumPy array
+
+    """
+
+    values = numpy.asarray(values)
+    if output is None:
+        output = numpy.zeros((rowCount, columnCount), dtype=values.dtype)
+
+    # The rows whose center might be crossed by each edge, with a row to spare on each side for rounding
+    x0, y0, x1, y1 = edges.T
+    firstRows = numpy.floor((geoTransform.yMax - numpy.maximum(y0, y1)) / geoTransform.cellHeight - 0.5)
+    lastRows = numpy.floor((geoTransform.yMax - numpy.minimum(y0, y1)) / geoTransform.cellHeight - 0.5) + 1
+    firstRows = numpy.maximum(firstRows, 0).astype(numpy.int64)
+    lastRows = numpy.minimum(lastRows, rowCount - 1).astype(numpy.int64)
+    rowCounts = numpy.maximum(lastRows - firstRows + 1, 0)
+
+    if not rowCounts.sum():
+        return output
+
+    edgeIndexes = numpy.repeat(numpy.arange(len(edges)), rowCounts)
+    rows = (numpy.arange(rowCounts.sum()) - numpy.repeat(numpy.cumsum(rowCounts) - rowCounts, rowCounts) +
+            firstRows[edgeIndexes])
+
+    # Each edge crosses the scanline through the centers of a row if one end is at or below it and the other above
+    centerY = geoTransform.yMax - (rows + 0.5) * geoTransform.cellHeight
+    crossed = (y0[edgeIndexes] <= centerY) != (y1[edgeIndexes] <= centerY)
+    edgeIndexes = edgeIndexes[crossed]
+    rows = rows[crossed]
+    centerY = centerY[crossed]
+
+    fractions = (centerY - y0[edgeIndexes]) / (y1 - y0)[edgeIndexes]
+    crossingX = x0[edgeIndexes] + (x1 - x0)[edgeIndexes] * fractions
+    polygons = polygonIndexes[edgeIndexes]
+
+    # Every polygon crosses each scanline an even number of times, so sorted crossings pair up as runs inside it
+    order = numpy.lexsort((crossingX, rows, polygons))
+    starts = order[0::2]
+    ends = order[1::2]
+
+    firstColumns = numpy.ceil((crossingX[starts] - geoTransform.xMin) / geoTransform.cellWidth - 0.5)
+    endColumns = numpy.ceil((crossingX[ends] - geoTransform.xMin) / geoTransform.cellWidth - 0.5)
+    firstColumns = numpy.maximum(firstColumns, 0).astype(numpy.int64)
+    endColumns = numpy.minimum(endColumns, columnCount).astype(numpy.int64)
+    runLengths = numpy.maximum(endColumns - firstColumns, 0)
+
+    runIndexes = numpy.repeat(numpy.arange(len(runLengths)), runLengths)
+    columns = (numpy.arange(runLengths.sum()) - numpy.repeat(numpy.cumsum(runLengths) - runLengths, runLengths) +
+               firstColumns[runIndexes])
+
+    # The runs are in polygon order, so the last assignment to a cell is from the highest polygon
+    output[rows[starts][runIndexes], columns] = values[polygons[starts]][runIndexes]
+
+    return output
+
+
+def rasterizeZones(polygons, keys, rowCount, columnCount, geoTransform, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                   blockColumns=raster.DEFAULT_BLOCK_SIZE, output=None):
+    """ Rasterize zone polygons to a zone raster on a grid, one block at a time.
+
+    **Description:**
+
+        The *keys* are the values of the zone key field of each polygon, of any type, such as strings.  The keys are
+        dictionary encoded, so the zone raster holds an int32 zone id for each cell, which is the index of its key in
+        the sorted unique keys.  Polygons with the same key get the same zone id, so multipart zones may also be
+        passed as one polygon per part.  Cells outside every polygon are :py:data:`ZONE_NODATA`.
+
+        Use :py:func:`pylet.numpyutil.geotransform.getAlignedExtent` with the extents of the polygons and of the land
+        cover to find a grid aligned to the land cover.  Cells are filled by the cell center rule of
+        :py:func:`rasterizePolygons`.
+
+        Each block is filled in memory and written to its window of *output*, which may be a NumPy memmap, or another
+        object written by slicing, such as a :py:class:`pylet.numpyutil.rasterwriter.RasterWriter`, so the zone raster
+        is written without holding all of it in memory.
+
+    **Arguments:**
+
+        * *polygons* - sequence of polygons, see :py:func:`getPolygonEdges`
+        * *keys* - sequence with the key of each polygon
+        * *rowCount*, *columnCount* - size of the zone raster
+        * *geoTransform* - :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the zone raster
+        * *blockRows*, *blockColumns* - size of the blocks written at once
+        * *output* - optional 2-D integer array to write the zone ids into
+
+    **Returns:**
+
+        * 2-D NumPy array, or *output* - zone ids
+        * NumPy array - key of each zone id, so the key of zone id i is element i
+
+    """
+
+    zoneKeys, zoneIds = numpy.unique(numpy.asarray(keys), return_inverse=True)
+    zoneIds = zoneIds.astype(numpy.int32)
+    edges, polygonIndexes = getPolygonEdges(polygons)
+    x0, y0, x1, y1 = edges.T
+
+    # The horizontal extent of each polygon, as a polygon must be rasterized with all of its edges in a row
+    polygonXMin = numpy.empty(len(zoneIds))
+    polygonXMin.fill(numpy.inf)
+    polygonXMax = -polygonXMin
+    numpy.minimum.at(polygonXMin, polygonIndexes, numpy.minimum(x0, x1))
+    numpy.maximum.at(polygonXMax, polygonIndexes, numpy.maximum(x0, x1))
+
+    if output is None:
+        output = numpy.empty((rowCount, columnCount), dtype=numpy.int32)
+
+    for window in raster.getBlockWindows(rowCount, columnCount, blockRows, blockColumns):
+        block = numpy.empty((window.rowCount, window.columnCount), dtype=output.dtype)
+        block.fill(ZONE_NODATA)
+
+        windowTransform = geoTransform.getWindowTransform(window.row, window.column)
+        xMax = windowTransform.xMin + window.columnCount * windowTransform.cellWidth
+        yMin = windowTransform.yMax - window.rowCount * windowTransform.cellHeight
+
+        # Only the edges within the rows of the block, of polygons overlapping its columns
+        inside = ((numpy.maximum(y0, y1) >= yMin) & (numpy.minimum(y0, y1) <= windowTransform.yMax) &
+                  (polygonXMax[polygonIndexes] >= windowTransform.xMin) & (polygonXMin[polygonIndexes] <= xMax))
+        rasterizePolygons(edges[inside], polygonIndexes[inside], zoneIds, window.rowCount, window.columnCount,
+                          windowTransform, block)
+        window.writeCore(output, block)
+
+    return output, zoneKeys
@@ -0,0 +1,224 @@
+""" This module contains a streaming writer for rasters larger than memory, such as the outputs of the engines.
+
+    The output is a tiled grid: a .tiles directory holding one file per tile, and a BIL style .hdr header with the same
+    base name, which is opened by :py:func:`pylet.numpyutil.raster.openRaster`, see
+    :py:func:`pylet.numpyutil.raster.readTiledGrid`.  Blocks are written in any order, and each tile is stored as soon
+    as it is written, so the whole raster is never held in memory.  Each tile is written to its own file through a
+    temporary file, so worker processes can each open the raster with :py:class:`RasterWriter` and write their own
+    tiles at the same time, without a lock, and a reader never finds a tile half written.  On POSIX systems a tile
+    rewritten in the same form is replaced atomically, so a reader finds either the old or the new tile.  A tile which
+    changes between raw and compressed, or any rewritten tile on Windows, has no file for a moment, and a reader may
+    find it not written, but never finds the old tile once the new one is stored.
+
+    Each tile is stored either raw or compressed with zlib, chosen per write, which keeps sparse or constant outputs
+    small on disk.  Tiles which are never written are not stored at all, and read as NoData.
+
+    A :py:class:`RasterWriter` is sliced like a 2-D array, so it can be passed to the engines as one of their outputs,
+    see :py:mod:`pylet.numpyutil.raster`.
+
+"""
+
+import os
+import shutil
+import zlib
+import numpy
+import raster
+
+#: Default compression level of compressed tiles, from 1 to 9
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Pixel types of the header for each NumPy dtype kind
+_PIXEL_TYPES = {'u': 'UNSIGNEDINT', 'b': 'UNSIGNEDINT', 'i': 'SIGNEDINT', 'f': 'FLOAT'}
+
+
+def createRaster(rasterPath, rowCount, columnCount, dtype, extent, nodata=None, tileRows=raster.DEFAULT_BLOCK_SIZE,
+                 tileColumns=raster.DEFAULT_BLOCK_SIZE, compress=False, compressionLevel=DEFAULT_COMPRESSION_LEVEL):
+    """ Create an empty tiled grid and its header, and open it for writing.
+
+    **Description:**
+
+        The tiled grid is a directory of tiles of *rowCount* by *columnCount* cells, with a BIL style .hdr header
+        holding the extent, cell size, nodata and tile size.  Any tiles of an existing raster at the path are removed.
+        Integers of 8 to 64 bits, floats of 32 or 64 bits and booleans, stored as 8 bit integers, are supported, other
+        data types raise a ValueError.  The path must have the :py:data:`pylet.numpyutil.raster.TILED_EXTENSION`.
+
+    **Arguments:**
+
+        * *rasterPath* - Full path to the .tiles directory
+        * *rowCount*, *columnCount* - size of the raster in cells
+        * *dtype* - NumPy data type of the cells
+        * *extent* - (XMin, YMin, XMax, YMax) extent of the raster
+        * *nodata* - the value representing NoData, or None
+        * *tileRows*, *tileColumns* - size of the tiles in cells, None for the full height or width of the raster
+        * *compress*, *compressionLevel* - default compression of the writer, see :py:class:`RasterWriter`
+
+    **Returns:**
+
+        * :py:class:`RasterWriter`
+
+    """
+
+    if os.path.splitext(rasterPath)[1].lower() != raster.TILED_EXTENSION:
+        raise ValueError("Tiled grids must have the {0} extension, found {1}".format(raster.TILED_EXTENSION,
+                                                                                    rasterPath))
+
+    dtype = numpy.dtype(dtype)
+    if dtype.kind == 'b':
+        dtype = numpy.dtype(numpy.uint8)
+    if dtype.kind not in _PIXEL_TYPES or dtype.itemsize not in ((4, 8) if dtype.kind == 'f' else (1, 2, 4, 8)):
+        raise ValueError("Unsupported data type for a raster file: {0}".format(dtype))
+
+    xMin, yMin, xMax, yMax = [float(coordinate) for coordinate in extent]
+    cellWidth = (xMax - xMin) / columnCount
+    cellHeight = (yMax - yMin) / rowCount
+
+    header = [('nrows', rowCount), ('ncols', columnCount), ('nbands', 1), ('nbits', dtype.itemsize * 8),
+              ('pixeltype', _PIXEL_TYPES[dtype.kind]), ('byteorder', 'I'), ('layout', 'TILED'),
+              ('ulxmap', repr(xMin + cellWidth / 2.0)), ('ulymap', repr(yMax - cellHeight / 2.0)),
+              ('xdim', repr(cellWidth)), ('ydim', repr(cellHeight)), ('tilerows', tileRows or rowCount),
+              ('tilecolumns', tileColumns or columnCount)]
+    if nodata is not None:
+        header.append(('nodata', repr(dtype.type(nodata).item())))
+
+    if os.path.isdir(rasterPath):
+        shutil.rmtree(rasterPath)
+    os.mkdir(rasterPath)
+
+    with open(os.path.splitext(rasterPath)[0] + raster.HEADER_EXTENSION, 'w') as headerFile:
+        for keyword, value in header:
+            headerFile.write('{0} {1}\n'.format(keyword.upper(), value))
+
+    return RasterWriter(rasterPath, compress, compressionLevel)
+
+
+class RasterWriter(raster.TileFileArray):
+    """ This class writes blocks of a tiled grid created by :py:func:`createRaster`, in any order.
+
+    **Description:**
+
+        Each process writing to the raster opens its own writer with the path of the raster, which reads the size,
+        data type and tiles from the header.  Blocks of any size and position are written with :py:meth:`writeBlock`,
+        or by slicing, as in writer[10:20, 30:40] = block.  A tile only partly covered by a block is read, updated and
+        stored again, so writes from several processes are safe as long as they are to disjoint tiles.
+
+        Tiles are stored compressed if *compress* is True, unless overridden for a block in :py:meth:`writeBlock`.
+        Storing a tile removes any earlier file of the tile, raw or compressed.  There is nothing to close.
+
+    **Arguments:**
+
+        * *rasterPath* - Full path to the .tiles directory
+        * *compress* - boolean to store tiles compressed by default
+        * *compressionLevel* - default zlib compression level, from 1 to 9
+
+    """
+
+    def __init__(self, rasterPath, compress=False, compressionLevel=DEFAULT_COMPRESSION_LEVEL):
+
+        grid = raster.readTiledGrid(rasterPath)
+        tiles = grid.array
+        raster.TileFileArray.__init__(self, rasterPath, grid.rowCount, grid.columnCount, grid.dtype, tiles.tileRows,
+                                      tiles.tileColumns, tiles.fill)
+
+        self.rasterPath = rasterPath
+        self.extent = grid.extent
+        self.nodata = grid.nodata
+        self.compress = compress
+        self.compressionLevel = compressionLevel
+
+    def writeBlock(self, window, block, compress=None, compressionLevel=None):
+        """ Write the cells of the core of a :py:class:`pylet.numpyutil.raster.RasterWindow`.
+
+        **Description:**
+
+            Blocks may be of any size and position.  Each tile overlapped by the block is stored raw or compressed,
+            by default as set for the writer.
+
+        **Arguments:**
+
+            * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` object of the block
+            * *block* - 2-D NumPy array with the shape of the core of the window
+            * *compress* - boolean to store the tiles of the block compressed, or None for the writer default
+            * *compressionLevel* - zlib compression level, from 1 to 9, or None for the writer default
+
+        **Returns:**
+
+            * None
+
+        """
+
+        if compress is None:
+            compress = self.compress
+        if compressionLevel is None:
+            compressionLevel = self.compressionLevel
+
+        for tileWindow, tile in self._getBlockTiles(window, numpy.asarray(block)):
+            self._storeTile(tileWindow, tile, compress, compressionLevel)
+
+    def _writeTile(self, tileWindow, tile):
+        """ Stores the array of a tile with the default compression of the writer """
+        self._storeTile(tileWindow, tile, self.compress, self.compressionLevel)
+
+    def _storeTile(self, tileWindow, tile, compress, compressionLevel):
+        """ Writes the file of a tile, raw or compressed, and removes its file in the other form """
+
+        data = numpy.ascontiguousarray(tile, dtype=self.dtype).tostring()
+        if compress:
+            data = zlib.compress(data, compressionLevel)
+
+        # Write to a temporary file first, so a reader never finds a tile half written
+        tilePath = self.getTilePath(tileWindow, compress)
+        temporaryPath = '{0}.{1}.tmp'.format(tilePath, os.getpid())
+        with open(temporaryPath, 'wb') as tileFile:
+            tileFile.write(data)
+
+        # Remove the other form before storing the tile, as readers try the raw file first and would find it stale
+        otherPath = self.getTilePath(tileWindow, not compress)
+        if os.path.exists(otherPath):
+            os.remove(otherPath)
+
+        # Renaming over an existing file replaces it atomically, except on Windows where it must be removed first
+        if os.name == 'nt' and os.path.exists(tilePath):
+            os.remove(tilePath)
+        os.rename(temporaryPath, tilePath)
+
+
+def writeRaster(rasterPath, inRaster, extent=None, nodata=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                blockColumns=raster.DEFAULT_BLOCK_SIZE, compress=False, compressionLevel=DEFAULT_COMPRESSION_LEVEL):
+    """ Write a whole raster to a tiled grid, one block at a time.
+
+    **Description:**
+
+        The raster is read and written one block at a time, so a memory-mapped or tiled raster, such as a
+        :py:class:`pylet.numpyutil.tilecache.CachedRaster`, is never held in memory.  To write the output of an engine
+        without holding it in memory, pass the writer from :py:func:`createRaster` as the output of the engine
+        instead.
+
+        The extent and nodata are taken from a :py:class:`pylet.numpyutil.raster.RasterGrid` unless provided.  For a
+        raster without an extent, cells are 1 map unit square with the lower left corner at the origin.
+
+    **Arguments:**
+
+        * *rasterPath* - Full path to the .tiles directory
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object, 2-D NumPy array or other object sliced
+          like one
+        * *extent* - optional (XMin, YMin, XMax, YMax) extent of the raster
+        * *nodata* - optional value representing NoData
+        * *blockRows*, *blockColumns* - size of the blocks written at once, and of the tiles
+        * *compress*, *compressionLevel* - compression of the tiles, see :py:class:`RasterWriter`
+
+    **Returns:**
+
+        * None
+
+    """
+
+    array = raster.getRasterArray(inRaster)
+    if extent is None:
+        extent = getattr(inRaster, 'extent', (0, 0, array.shape[1], array.shape[0]))
+    if nodata is None:
+        nodata = getattr(inRaster, 'nodata', None)
+
+    writer = createRaster(rasterPath, array.shape[0], array.shape[1], array.dtype, extent, nodata, blockRows,
+                          blockColumns, compress, compressionLevel)
+    for window in raster.getBlockWindows(array.shape[0], array.shape[1], blockRows, blockColumns):
+        writer.writeBlock(window, window.read(array))
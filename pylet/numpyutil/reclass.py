@@ -0,0 +1,283 @@
+""" This module contains an engine for reclassifying land cover rasters through a Land Cover Classification(LCC).
+
+    A :py:class:`pylet.lcc.LandCoverClassification` is compiled into a lookup table indexed by value id, with one
+    column per output layer.  Each raster block is then reclassified into every layer with a single `take`_ from the
+    table, instead of one reclassification pass per class.
+
+    .. _take: http://docs.scipy.org/doc/numpy/reference/generated/numpy.take.html
+
+"""
+
+import numpy
+import raster
+
+#: Output value for cells in no class, or not excluded
+NOT_IN_CLASS = 0
+
+
+class ReclassEngine(object):
+    """ This class reclassifies land cover raster blocks into class, excluded and coefficient layers.
+
+    **Description:**
+
+        Add the layers to produce with the add methods, then pass blocks to :py:meth:`reclassifyBlock` or a whole raster
+        to :py:meth:`reclassifyRaster`.  The layers are:
+
+        * class index - uint8 or uint16, the one based position in a list of classIds of the first class containing the
+          value, or 0 if none do
+        * class - uint8, 1 if the value is in the class, otherwise 0
+        * excluded - uint8, 1 if the value is marked excluded in the LCC, otherwise 0
+        * coefficient - float32, the coefficient value for the value, or NaN if it has none
+
+        Cells equal to *nodata*, or with a value not defined in the LCC, are assigned the *nodata* of each layer: the
+        largest value of the integer type, or NaN.
+
+    **Arguments:**
+
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *nodata* - the value representing NoData in the land cover raster, or None
+
+    """
+
+    #: A `list` of the names of the layers added, in order
+    layerNames = None
+
+    def __init__(self, lccObj, nodata=None):
+
+        self.lccObj = lccObj
+        self.nodata = nodata
+        self.layerNames = []
+        self._layers = []
+        self._tables = {}
+        self._tableSize = None
+
+    def addClassIndexLayer(self, classIds=None, name='classIndex'):
+        """ Add a layer with the one based index of the first class in classIds containing each value.
+
+        **Description:**
+
+            If *classIds* is None, the top level classes are used.  The layer is uint8 for up to 254 classes and uint16
+            otherwise.
+
+        **Arguments:**
+
+            * *classIds* - `list` of classIds, ideally of classes without shared values
+            * *name* - name of the layer
+
+        **Returns:**
+
+            * integer - zero based index of the layer in the outputs
+
+        """
+
+        if classIds is None:
+            classIds = [landCoverClass.classId for landCoverClass in self.lccObj.classes.topLevelClasses or []]
+
+        valueTable = {}
+        for classIndex, classId in reversed(list(enumerate(classIds, 1))):
+            for valueId in self.lccObj.classes[classId].uniqueValueIds or ():
+                valueTable[valueId] = classIndex
+
+        dtype = numpy.uint8 if len(classIds) < numpy.iinfo(numpy.uint8).max else numpy.uint16
+
+        return self._addLayer(name, dtype, valueTable, NOT_IN_CLASS)
+
+    def addClassLayer(self, classId, name=None):
+        """ Add a layer with 1 for each value in the class and 0 otherwise, returning the index of the layer """
+
+        valueTable = dict([(valueId, 1) for valueId in self.lccObj.classes[classId].uniqueValueIds or ()])
+
+        return self._addLayer(name or classId, numpy.uint8, valueTable, NOT_IN_CLASS)
+
+    def addExcludedLayer(self, name='excluded'):
+        """ Add a layer with 1 for each value marked excluded and 0 otherwise, returning the index of the layer """
+
+        valueTable = dict([(valueId, 1) for valueId in self.lccObj.values.getExcludedValueIds()])
+
+        return self._addLayer(name, numpy.uint8, valueTable, NOT_IN_CLASS)
+
+    def addCoefficientLayer(self, coefId, name=None):
+        """ Add a layer with the value of the coefficient for each value, returning the index of the layer """
+
+        valueTable = {}
+        for valueId, landCoverValue in self.lccObj.values.items():
+            coefficientValue = landCoverValue.getCoefficientValueById(coefId)
+            if coefficientValue is not None:
+                valueTable[valueId] = coefficientValue
+
+        return self._addLayer(name or coefId, numpy.float32, valueTable, numpy.nan)
+
+    def _addLayer(self, name, dtype, valueTable, defaultValue):
+        """ Registers a layer and invalidates the compiled table """
+
+        self.layerNames.append(name)
+        self._layers.append((name, numpy.dtype(dtype), valueTable, defaultValue))
+        self._tables = {}
+
+        return len(self._layers) - 1
+
+    def getLayerNodata(self, layerIndex):
+        """ Get the value assigned to NoData cells in the layer with the given index """
+
+        dtype = self._layers[layerIndex][1]
+
+        if dtype.kind == 'f':
+            return numpy.nan
+        else:
+            return numpy.iinfo(dtype).max
+
+    def _getTableSize(self):
+        """ Returns the number of value ids covered by the lookup table """
+
+        if self._tableSize is None:
+            definedValueIds = self.lccObj.getUniqueValueIdsWithExcludes()
+            maxValueId = max([valueId for valueId in definedValueIds if valueId >= 0] or [0])
+
+            # Cover every value of 8 and 16 bit rasters, so their blocks need no range check
+            self._tableSize = max(maxValueId + 1, 256)
+            if maxValueId >= 256:
+                self._tableSize = max(self._tableSize, 65536)
+
+        return self._tableSize
+
+    def getLookupTable(self, nodata=None):
+        """ Get the compiled lookup table.
+
+        **Description:**
+
+            The table is a structured NumPy array with one field per layer, indexed by value id.  The last entry holds
+            the NoData output for each layer, and is used for NoData cells and values outside the table.  A table is
+            compiled once for each NoData value.
+
+        **Arguments:**
+
+            * *nodata* - the value representing NoData in the land cover raster, None for the *nodata* of the engine
+
+        **Returns:**
+
+            * NumPy structured array
+
+        """
+
+        if nodata is None:
+            nodata = self.nodata
+
+        tableSize = self._getTableSize()
+        nodataId = int(nodata) if nodata is not None and 0 <= nodata < tableSize and nodata == int(nodata) else None
+
+        if nodataId not in self._tables:
+            definedValueIds = self.lccObj.getUniqueValueIdsWithExcludes()
+
+            dtype = numpy.dtype([(str(name), layerDtype) for name, layerDtype, valueTable, defaultValue in self._layers])
+            table = numpy.empty(tableSize + 1, dtype=dtype)
+
+            validIds = numpy.zeros(tableSize, dtype=bool)
+            validIds[[valueId for valueId in definedValueIds if 0 <= valueId < tableSize]] = True
+            if nodataId is not None:
+                validIds[nodataId] = False
+
+            for layerIndex, (name, layerDtype, valueTable, defaultValue) in enumerate(self._layers):
+                column = numpy.empty(tableSize + 1, dtype=layerDtype)
+                column[:] = defaultValue
+                for valueId, outputValue in valueTable.items():
+                    if 0 <= valueId < tableSize:
+                        column[valueId] = outputValue
+                column[:-1][~validIds] = self.getLayerNodata(layerIndex)
+                column[-1] = self.getLayerNodata(layerIndex)
+                table[str(name)] = column
+
+            self._tables[nodataId] = table
+
+        return self._tables[nodataId]
+
+    def _getIndexes(self, block):
+        """ Returns the index into the lookup table for each cell in block """
+
+        tableSize = self._getTableSize()
+
+        if block.dtype.kind == 'u' and 2 ** (8 * block.dtype.itemsize) <= tableSize:
+            return block
+
+        if block.dtype.kind == 'f':
+            indexes = numpy.where(numpy.isnan(block), -1, block).astype(numpy.int64)
+            indexes[indexes != block] = -1
+        else:
+            indexes = block.astype(numpy.int64)
+
+        indexes[(indexes < 0) | (indexes >= tableSize)] = tableSize
+
+        return indexes
+
+    def reclassifyBlock(self, block, outputs=None, nodata=None):
+        """ Reclassify a block of land cover values into every layer.
+
+        **Description:**
+
+            All layers are looked up with a single take from the compiled table.  If *outputs* is provided, it must be a
+            list with an array for each layer, of the block shape, and the results are written into it.
+
+        **Arguments:**
+
+            * *block* - 2-D NumPy array of land cover values
+            * *outputs* - optional list of NumPy arrays to write the results into
+            * *nodata* - the value representing NoData in the block, None for the *nodata* of the engine
+
+        **Returns:**
+
+            * `list` of 2-D NumPy arrays, one per layer
+
+        """
+
+        records = self.getLookupTable(nodata).take(self._getIndexes(block))
+
+        if outputs is None:
+            outputs = [None] * len(self._layers)
+
+        for layerIndex, name in enumerate(self.layerNames):
+            if outputs[layerIndex] is None:
+                outputs[layerIndex] = records[str(name)]
+            else:
+                outputs[layerIndex][...] = records[str(name)]
+
+        return outputs
+
+    def reclassifyRaster(self, inRaster, outputs=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                         blockColumns=raster.DEFAULT_BLOCK_SIZE):
+        """ Reclassify a whole raster into every layer, one block at a time.
+
+        **Description:**
+
+            If *outputs* is not provided, an in-memory array is created for each layer.  To keep the outputs out of
+            memory, provide a list of writable `numpy.memmap`_ arrays of the raster shape, or of other objects
+            written by slicing, such as :py:class:`pylet.numpyutil.tilecache.CachedRaster` or
+            :py:class:`pylet.numpyutil.rasterwriter.RasterWriter` objects.  If *nodata* was not set when the engine
+            was created, the nodata of the raster is used for this call only.
+
+            .. _numpy.memmap: http://docs.scipy.org/doc/numpy/reference/generated/numpy.memmap.html
+
+        **Arguments:**
+
+            * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+            * *outputs* - optional list of 2-D NumPy arrays to write the results into
+            * *blockRows*, *blockColumns* - size of the blocks reclassified at once
+
+        **Returns:**
+
+            * `list` of 2-D NumPy arrays, one per layer
+
+        """
+
+        nodata = self.nodata
+        if nodata is None:
+            nodata = getattr(inRaster, 'nodata', None)
+
+        if outputs is None:
+            shape = raster.getRasterArray(inRaster).shape
+            outputs = [numpy.empty(shape, dtype=layerDtype) for name, layerDtype, valueTable, defaultValue
+                       in self._layers]
+
+        for window in raster.iterateBlocks(inRaster, blockRows, blockColumns):
+            for output, block in zip(outputs, self.reclassifyBlock(window.array, nodata=nodata)):
+                window.writeCore(output, block)
+
+        return outputs
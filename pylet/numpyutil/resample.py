@@ -0,0 +1,188 @@
+""" This module contains an engine for reading rasters with different origins and cell sizes on one aligned grid.
+
+    Each block of the aligned grid is resampled from each raster by nearest neighbor, which keeps categorical values,
+    such as land cover and zones, unchanged.  As rasters are north up without rotation, the source row of a target
+    cell only depends on its row, and the source column only on its column, so the index map of a block is one array
+    of source rows and one of source columns.  Only the source cells under the block are read, and the index map is
+    computed once per block for all rasters sharing a grid, so several rasters are read in lockstep without
+    temporary copies.
+
+"""
+
+import numpy
+import raster
+import geotransform
+
+#: Index in an index map of target rows or columns outside the source raster
+OUTSIDE = -1
+
+
+def getAlignedGrid(rasters, cellSize=None, extent=None):
+    """ Get the grid covering the intersection of several rasters, aligned to the cells of the first raster.
+
+    **Description:**
+
+        The first raster is the snap raster.  The extent is the intersection of the extents of all rasters, and of
+        *extent* if provided, expanded to the cell boundaries of the snap raster with
+        :py:func:`pylet.numpyutil.geotransform.getAlignedExtent`.  The cell size is that of the snap raster unless
+        *cellSize* is provided, in which case the grid is aligned to the origin of the snap raster with the new cell
+        size.
+
+    **Arguments:**
+
+        * *rasters* - sequence of :py:class:`pylet.numpyutil.raster.RasterGrid` objects
+        * *cellSize* - optional cell size of the grid in map units
+        * *extent* - optional (XMin, YMin, XMax, YMax) extent to clip the grid to
+
+    **Returns:**
+
+        * :py:class:`pylet.numpyutil.geotransform.GeoTransform` - transform of the grid
+        * tuple - (rowCount, columnCount) of the grid
+
+    """
+
+    snapRaster = rasters[0]
+    snapTransform = snapRaster.geoTransform
+    if cellSize is not None:
+        snapTransform = geotransform.GeoTransform(snapTransform.xMin, snapTransform.yMax, cellSize, cellSize)
+
+    extents = [inRaster.extent for inRaster in rasters]
+    if extent is not None:
+        extents.append(extent)
+
+    alignedExtent = geotransform.getAlignedExtent(snapTransform, extents)
+    gridTransform = geotransform.GeoTransform.fromExtent(alignedExtent, snapTransform.cellWidth,
+                                                         snapTransform.cellHeight)
+    rowCount = int(round((alignedExtent[3] - alignedExtent[1]) / snapTransform.cellHeight))
+    columnCount = int(round((alignedExtent[2] - alignedExtent[0]) / snapTransform.cellWidth))
+
+    return gridTransform, (max(rowCount, 0), max(columnCount, 0))
+
+
+def getIndexMap(sourceTransform, sourceShape, targetTransform, window):
+    """ Get the source rows and columns of the cells of a block of a target grid, by nearest neighbor.
+
+    **Description:**
+
+        The source cell of a target cell is the source cell containing the center of the target cell.  Target cells
+        outside the source raster have an index of :py:data:`OUTSIDE`.
+
+    **Arguments:**
+
+        * *sourceTransform* - :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the source raster
+        * *sourceShape* - (rowCount, columnCount) of the source raster
+        * *targetTransform* - :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the target grid
+        * *window* - :py:class:`pylet.numpyutil.raster.RasterWindow` of the block on the target grid, with its halo
+
+    **Returns:**
+
+        * 1-D NumPy int64 array - source row of each row of the block
+        * 1-D NumPy int64 array - source column of each column of the block
+
+    """
+
+    rowSlice, columnSlice = window.slices
+    x, y = targetTransform.toMap(numpy.arange(rowSlice.start, rowSlice.stop),
+                                 numpy.arange(columnSlice.start, columnSlice.stop))
+    sourceRows, sourceColumns = sourceTransform.toRowColumn(x, y)
+
+    sourceRows[(sourceRows < 0) | (sourceRows >= sourceShape[0])] = OUTSIDE
+    sourceColumns[(sourceColumns < 0) | (sourceColumns >= sourceShape[1])] = OUTSIDE
+
+    return sourceRows, sourceColumns
+
+
+def resampleBlock(sourceArray, sourceRows, sourceColumns, fill=0):
+    """ Read a block of a target grid from a source array with an index map from :py:func:`getIndexMap`.
+
+    **Description:**
+
+        Only the rectangle of source cells covered by the index map is read, which for a memory-mapped raster only
+        touches the pages under the block.  Target cells outside the source raster are *fill*.
+
+    **Arguments:**
+
+        * *sourceArray* - 2-D NumPy array of the source raster
+        * *sourceRows*, *sourceColumns* - index map of the block
+        * *fill* - value of target cells outside the source raster
+
+    **Returns:**
+
+        * 2-D NumPy array with the dtype of the source array
+
+    """
+
+    block = numpy.empty((len(sourceRows), len(sourceColumns)), dtype=sourceArray.dtype)
+    block.fill(fill)
+
+    insideRows = numpy.flatnonzero(sourceRows != OUTSIDE)
+    insideColumns = numpy.flatnonzero(sourceColumns != OUTSIDE)
+    if not insideRows.size or not insideColumns.size:
+        return block
+
+    rows = sourceRows[insideRows]
+    columns = sourceColumns[insideColumns]
+    rowStart, columnStart = rows.min(), columns.min()
+    source = sourceArray[rowStart:rows.max() + 1, columnStart:columns.max() + 1]
+
+    block[numpy.ix_(insideRows, insideColumns)] = source[numpy.ix_(rows - rowStart, columns - columnStart)]
+
+    return block
+
+
+def iterateAlignedBlocks(rasters, geoTransform=None, shape=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                         blockColumns=raster.DEFAULT_BLOCK_SIZE, halo=0, fills=None):
+    """ A `generator`_ for blocks of several rasters resampled in lockstep onto one aligned grid.
+
+    **Description:**
+
+        The grid is found with :py:func:`getAlignedGrid` unless *geoTransform* and *shape* are provided.  For each
+        block, a :py:class:`pylet.numpyutil.raster.RasterWindow` of the grid is yielded with a `list` of the
+        resampled blocks, one per raster, including the halo.  The window also holds its *transform*.
+
+        Cells outside a raster are the nodata of the raster, or the element of *fills* for the raster if it has no
+        nodata, 0 by default.  Index maps are computed once per block for each distinct source grid.
+
+        .. _generator: http://docs.python.org/tutorial/classes.html#generators
+
+    **Arguments:**
+
+        * *rasters* - sequence of :py:class:`pylet.numpyutil.raster.RasterGrid` objects
+        * *geoTransform* - optional :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the target grid
+        * *shape* - optional (rowCount, columnCount) of the target grid
+        * *blockRows*, *blockColumns* - size of the blocks in cells, not including the halo
+        * *halo* - number of cells to extend each block on each side
+        * *fills* - optional sequence with the value outside each raster without nodata
+
+    **Returns:**
+
+        * `generator`_ for (:py:class:`pylet.numpyutil.raster.RasterWindow`, `list` of 2-D NumPy arrays) tuples
+
+    """
+
+    if geoTransform is None or shape is None:
+        geoTransform, shape = getAlignedGrid(rasters)
+    if fills is None:
+        fills = [0] * len(rasters)
+
+    sources = []
+    for inRaster, fill in zip(rasters, fills):
+        sourceArray = raster.getRasterArray(inRaster)
+        if inRaster.nodata is not None:
+            fill = inRaster.nodata
+        gridKey = (inRaster.geoTransform.asGdal(), sourceArray.shape)
+        sources.append((sourceArray, fill, inRaster.geoTransform, gridKey))
+
+    for window in raster.getBlockWindows(shape[0], shape[1], blockRows, blockColumns, halo):
+        window.transform = geoTransform.getWindowTransform(window.row - window.haloTop,
+                                                           window.column - window.haloLeft)
+
+        indexMaps = {}
+        blocks = []
+        for sourceArray, fill, sourceTransform, gridKey in sources:
+            if gridKey not in indexMaps:
+                indexMaps[gridKey] = getIndexMap(sourceTransform, sourceArray.shape, geoTransform, window)
+            sourceRows, sourceColumns = indexMaps[gridKey]
+            blocks.append(resampleBlock(sourceArray, sourceRows, sourceColumns, fill))
+
+        yield window, blocks
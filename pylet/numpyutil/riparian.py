@@ -0,0 +1,145 @@
+""" This module contains an engine for riparian land cover proportions (rlcp) within zones.
+
+    The riparian buffer is every cell whose center is within a buffer distance of the center of a stream cell.  Instead
+    of buffering the stream features and intersecting the buffers with the zones, the streams are rasterized onto the
+    land cover grid one block at a time, and the buffer is found by thresholding the Euclidean distance transform of the
+    block.  The blocks are read with a halo of the buffer distance, so the buffer is exact, and the land cover inside
+    the buffer is tabulated for each zone in the same pass.
+
+    .. _OrderedDict: http://docs.python.org/library/collections.html#collections.OrderedDict
+
+"""
+
+import math
+import numpy
+from pylet.lcc import constants
+import raster
+import zonal
+import lcp
+import distance
+import rasterize
+from geotransform import GeoTransform
+
+#: Default prefix added to the classId to name the riparian proportion field for a class
+RLCP_FIELD_PREFIX = 'r'
+
+
+def tabulateRiparianArea(zoneRaster, landCoverRaster, streams, bufferDistance, geoTransform=None,
+                         blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None,
+                         valueNodata=None, streamNodata=None):
+    """ Count the cells of each land cover value within the riparian buffer of each zone, one block at a time.
+
+    **Description:**
+
+        The *streams* are either a raster on the same grid as the land cover, where stream cells are the valid
+        non-zero cells, or a sequence of stream lines, each a sequence of (x, y) map coordinates, which are rasterized
+        with :py:func:`pylet.numpyutil.rasterize.rasterizeSegments`.
+
+        The *bufferDistance* is in map units.  The *geoTransform* of the grid is taken from the land cover if it is a
+        :py:class:`pylet.numpyutil.raster.RasterGrid`, and must be provided for stream lines over NumPy arrays.  For
+        stream rasters over NumPy arrays, cells are 1 map unit square by default.
+
+        Zones without any cells in the buffer are not reported.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *streams* - stream raster, or sequence of stream lines
+        * *bufferDistance* - width of the buffer on each side of the streams in map units
+        * *geoTransform* - optional :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the grid
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *zoneNodata*, *valueNodata*, *streamNodata* - the values representing NoData in each raster
+
+    **Returns:**
+
+        * :py:class:`pylet.numpyutil.zonal.ZonalCounts`
+
+    """
+
+    streamArray = None
+    if isinstance(streams, (raster.RasterGrid, numpy.ndarray)):
+        zoneArray, valueArray, streamArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster, streams)
+        if streamNodata is None:
+            streamNodata = getattr(streams, 'nodata', None)
+    else:
+        zoneArray, valueArray = zonal.getAlignedArrays(zoneRaster, landCoverRaster)
+        segments = rasterize.getLineSegments(streams)
+
+    if geoTransform is None:
+        if isinstance(landCoverRaster, raster.RasterGrid):
+            geoTransform = landCoverRaster.geoTransform
+        elif streamArray is not None:
+            geoTransform = GeoTransform(0.0, 0.0, 1.0, 1.0)
+        else:
+            raise ValueError("A geoTransform is required to rasterize stream lines onto a NumPy array")
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+
+    cellWidth = geoTransform.cellWidth
+    cellHeight = geoTransform.cellHeight
+    halo = int(math.ceil(bufferDistance / min(cellWidth, cellHeight)))
+    tabulator = zonal.ZonalTabulator(zoneNodata, valueNodata)
+
+    for window in raster.getBlockWindows(zoneArray.shape[0], zoneArray.shape[1], blockRows, blockColumns, halo):
+        if streamArray is not None:
+            streamMask = distance.getFeatureMask(window.read(streamArray), nodata=streamNodata)
+        else:
+            windowRows = window.haloTop + window.rowCount + window.haloBottom
+            windowColumns = window.haloLeft + window.columnCount + window.haloRight
+            windowTransform = geoTransform.getWindowTransform(window.row - window.haloTop,
+                                                              window.column - window.haloLeft)
+            streamMask = rasterize.rasterizeSegments(segments, windowRows, windowColumns, windowTransform)
+
+        if not streamMask.any():
+            continue
+
+        distances = distance.euclideanDistance(streamMask, cellWidth, cellHeight)[window.coreSlices]
+        inBuffer = distances <= bufferDistance
+
+        tabulator.addBlock(window.readCore(zoneArray)[inBuffer], window.readCore(valueArray)[inBuffer])
+
+    return tabulator.getCounts()
+
+
+def getRiparianLandCoverProportions(zoneRaster, landCoverRaster, streams, lccObj, bufferDistance, cellArea=1.0,
+                                    geoTransform=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                                    blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None, valueNodata=None,
+                                    streamNodata=None, fieldPrefix=RLCP_FIELD_PREFIX):
+    """ Compute the percentage of each land cover class within the riparian buffer of each zone.
+
+    **Description:**
+
+        The buffer is found and tabulated with :py:func:`tabulateRiparianArea`, and the percentages are computed with
+        :py:func:`pylet.numpyutil.lcp.getLandCoverProportions`, naming classes by their rlcpField attribute or by
+        *fieldPrefix* followed by the classId.  The effective and excluded area fields are the areas in the buffer.
+
+    **Arguments:**
+
+        * *zoneRaster*, *landCoverRaster* - rasters on the same grid
+        * *streams* - stream raster, or sequence of stream lines
+        * *lccObj* - :py:class:`pylet.lcc.LandCoverClassification` object
+        * *bufferDistance* - width of the buffer on each side of the streams in map units
+        * *cellArea* - area of a single cell in the output area units
+        * *geoTransform* - optional :py:class:`pylet.numpyutil.geotransform.GeoTransform` of the grid
+        * *blockRows*, *blockColumns* - size of the blocks read at once, not including the halo
+        * *zoneNodata*, *valueNodata*, *streamNodata* - the values representing NoData in each raster
+        * *fieldPrefix* - prefix for class field names without an rlcpField attribute
+
+    **Returns:**
+
+        * NumPy array - zone ids in ascending order
+        * `OrderedDict`_ - field name as the key and a 1-D NumPy float64 array, one element per zone, as the value
+
+    """
+
+    zonalCounts = tabulateRiparianArea(zoneRaster, landCoverRaster, streams, bufferDistance, geoTransform, blockRows,
+                                       blockColumns, zoneNodata, valueNodata, streamNodata)
+
+    columns = lcp.getLandCoverProportions(zonalCounts, lccObj, cellArea, fieldPrefix,
+                                          overwriteField=constants.XmlAttributeRlcpField)
+
+    return zonalCounts.zoneIds, columns
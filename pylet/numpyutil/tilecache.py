@@ -0,0 +1,222 @@
+""" This module contains an in-process cache of compressed raster tiles, for handing off intermediate rasters between
+    the steps of a pipeline without writing whole datasets to a scratch workspace.
+
+    A :py:class:`TileCache` holds tiles compressed with zlib, or lzma where the Python installation provides it.  When
+    the compressed tiles exceed the memory budget, the least recently used tiles are spilled to files in a local
+    directory, and read back when they are used again.  A :py:class:`CachedRaster` stores an intermediate raster, such
+    as a reclassified, masked or distance raster, as tiles in a cache, and reads and writes it one block at a time.
+
+    A :py:class:`CachedRaster` is sliced like a 2-D array, so it can be passed to the engines in place of a raster, and
+    as one of their outputs, see :py:mod:`pylet.numpyutil.raster`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import zlib
+import numpy
+from collections import OrderedDict
+import raster
+
+#: Default number of bytes of compressed tiles held in memory
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+#: Default compression level, from 0 for none to 9 for the smallest tiles
+DEFAULT_COMPRESSION_LEVEL = 1
+
+#: Names of the supported compression methods
+COMPRESSION_METHODS = ('zlib', 'lzma')
+
+#: Extension of the files holding spilled tiles
+SPILL_EXTENSION = '.tile'
+
+
+class TileCache(object):
+    """ This class holds compressed NumPy arrays under a memory budget, spilling the least recently used to disk.
+
+    **Description:**
+
+        Arrays are stored under any hashable key with :py:meth:`put` and returned by :py:meth:`get`.  Only the
+        compressed bytes count toward *memoryBudget*.  When it is exceeded, the least recently used tiles are written
+        to *spillDirectory*, or to a temporary directory created when first needed and removed by :py:meth:`close`.
+
+        The lzma method is only available where the lzma module can be imported, a ValueError is raised otherwise.
+
+    **Arguments:**
+
+        * *memoryBudget* - number of bytes of compressed tiles held in memory
+        * *compressionLevel* - compression level, from 0 to 9
+        * *compressionMethod* - one of :py:data:`COMPRESSION_METHODS`
+        * *spillDirectory* - optional directory for tiles over the budget
+
+    """
+
+    def __init__(self, memoryBudget=DEFAULT_MEMORY_BUDGET, compressionLevel=DEFAULT_COMPRESSION_LEVEL,
+                 compressionMethod='zlib', spillDirectory=None):
+
+        if compressionMethod == 'zlib':
+            self._compress = lambda data: zlib.compress(data, compressionLevel)
+            self._decompress = zlib.decompress
+        elif compressionMethod == 'lzma':
+            try:
+                import lzma
+            except ImportError:
+                raise ValueError("The lzma compression method requires the lzma module")
+            self._compress = lambda data: lzma.compress(data, preset=compressionLevel)
+            self._decompress = lzma.decompress
+        else:
+            raise ValueError("Unknown compression method {0!r}, expected one of {1}".format(compressionMethod,
+                                                                                          COMPRESSION_METHODS))
+
+        self.memoryBudget = memoryBudget
+        self.spillDirectory = spillDirectory
+        self.memoryBytes = 0
+        self._ownsSpillDirectory = False
+        self._spillCount = 0
+        self._tiles = OrderedDict()
+        self._spilled = {}
+
+    def __contains__(self, key):
+        return key in self._tiles or key in self._spilled
+
+    def __len__(self):
+        return len(self._tiles) + len(self._spilled)
+
+    @property
+    def spilledCount(self):
+        """ The number of tiles currently spilled to disk """
+        return len(self._spilled)
+
+    def put(self, key, array):
+        """ Compress a NumPy array and store it under a key, replacing any array stored under the key """
+
+        self.remove(key)
+
+        array = numpy.ascontiguousarray(array)
+        compressed = self._compress(array.tostring())
+        self._tiles[key] = (compressed, array.dtype.str, array.shape)
+        self.memoryBytes += len(compressed)
+
+        self._evict()
+
+    def get(self, key):
+        """ Get the read only NumPy array stored under a key, raising a KeyError if there is none """
+
+        if key in self._tiles:
+            tile = self._tiles.pop(key)
+            self._tiles[key] = tile
+        else:
+            spillPath, dtype, shape = self._spilled.pop(key)
+            with open(spillPath, 'rb') as spillFile:
+                tile = (spillFile.read(), dtype, shape)
+            os.remove(spillPath)
+
+            self._tiles[key] = tile
+            self.memoryBytes += len(tile[0])
+            self._evict()
+
+        compressed, dtype, shape = tile
+        return numpy.frombuffer(self._decompress(compressed), dtype=numpy.dtype(dtype)).reshape(shape)
+
+    def remove(self, key):
+        """ Remove the array stored under a key, if any """
+
+        if key in self._tiles:
+            self.memoryBytes -= len(self._tiles.pop(key)[0])
+        elif key in self._spilled:
+            os.remove(self._spilled.pop(key)[0])
+
+    def close(self):
+        """ Remove all tiles, and the spill directory if it was created by the cache """
+
+        for key in list(self._spilled):
+            self.remove(key)
+        self._tiles.clear()
+        self.memoryBytes = 0
+
+        if self._ownsSpillDirectory:
+            shutil.rmtree(self.spillDirectory, ignore_errors=True)
+            self.spillDirectory = None
+            self._ownsSpillDirectory = False
+
+    def _evict(self):
+        """ Spills the least recently used tiles to disk until the tiles in memory are within the budget """
+
+        while self.memoryBytes > self.memoryBudget and len(self._tiles) > 1:
+            if self.spillDirectory is None:
+                self.spillDirectory = tempfile.mkdtemp(prefix='tilecache')
+                self._ownsSpillDirectory = True
+
+            key, (compressed, dtype, shape) = self._tiles.popitem(last=False)
+            self._spillCount += 1
+            spillPath = os.path.join(self.spillDirectory, '{0}{1}'.format(self._spillCount, SPILL_EXTENSION))
+            with open(spillPath, 'wb') as spillFile:
+                spillFile.write(compressed)
+
+            self._spilled[key] = (spillPath, dtype, shape)
+            self.memoryBytes -= len(compressed)
+
+
+class CachedRaster(raster.TiledArray):
+    """ This class holds an intermediate raster as tiles in a :py:class:`TileCache`.
+
+    **Description:**
+
+        This is a :py:class:`pylet.numpyutil.raster.TiledArray` whose tiles are stored in the cache, so blocks of any
+        size and position are written with :py:meth:`write` and read with :py:meth:`read`, and a pipeline step can
+        write the blocks it computes and the next step can read blocks of another size, with a halo.  Tiles which were
+        never written read as *fill*, which defaults to the *nodata* value or 0.
+
+        Several cached rasters may share one cache, each under its own *name*.
+
+    **Arguments:**
+
+        * *tileCache* - :py:class:`TileCache` object
+        * *name* - name of the raster, unique within the cache
+        * *rowCount*, *columnCount* - size of the raster in cells
+        * *dtype* - NumPy data type of the cells
+        * *tileRows*, *tileColumns* - size of the tiles in cells
+        * *nodata* - the value representing NoData, or None
+        * *fill* - the value of cells which were never written
+
+    """
+
+    def __init__(self, tileCache, name, rowCount, columnCount, dtype, tileRows=raster.DEFAULT_BLOCK_SIZE,
+                 tileColumns=raster.DEFAULT_BLOCK_SIZE, nodata=None, fill=None):
+
+        if fill is None:
+            fill = 0 if nodata is None else nodata
+        raster.TiledArray.__init__(self, rowCount, columnCount, dtype, tileRows, tileColumns, fill)
+
+        self.tileCache = tileCache
+        self.name = name
+        self.nodata = nodata
+
+    def _readTile(self, tileWindow):
+        """ Returns the array of a tile from the cache, or None if it was never written """
+
+        key = (self.name, tileWindow.row, tileWindow.column)
+        return self.tileCache.get(key) if key in self.tileCache else None
+
+    def _writeTile(self, tileWindow, tile):
+        """ Stores the array of a tile in the cache """
+        self.tileCache.put((self.name, tileWindow.row, tileWindow.column), tile)
+
+    def iterateBlocks(self, blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE, halo=0):
+        """ A `generator`_ for :py:class:`pylet.numpyutil.raster.RasterWindow` objects holding the blocks of the
+        raster in their *array*, as for :py:func:`pylet.numpyutil.raster.iterateBlocks`.
+
+        .. _generator: http://docs.python.org/tutorial/classes.html#generators
+
+        """
+
+        for window in raster.getBlockWindows(self.shape[0], self.shape[1], blockRows, blockColumns, halo):
+            window.array = self.read(window)
+            yield window
+
+    def remove(self):
+        """ Remove the tiles of the raster from the cache """
+
+        for tileWindow in self.getTileWindows():
+            self.tileCache.remove((self.name, tileWindow.row, tileWindow.column))
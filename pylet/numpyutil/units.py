@@ -0,0 +1,112 @@
+""" This module contains the conversion of map units to meters, for the engines which report areas and distances in
+    metric units.
+
+    The names of the units are those of the linear units of ArcGIS 10 coordinate systems, such as 'Foot_US', so the
+    engines accept the linear unit of a raster as it is reported by ArcGIS, without requiring arcpy.
+
+"""
+
+#: Number of meters in each ArcGIS 10 linear unit, by unit name
+METERS_PER_UNIT = {
+    '150_Kilometers': 150000.0,
+    '50_Kilometers': 50000.0,
+    'Centimeter': 0.01,
+    'Chain': 20.1168,
+    'Chain_Benoit_1895_A': 20.1167824,
+    'Chain_Benoit_1895_B': 20.1167824943759,
+    'Chain_Clarke': 20.11661949,
+    'Chain_Sears': 20.1167651215526,
+    'Chain_US': 20.1168402336805,
+    'Decimeter': 0.1,
+    'Fathom': 1.8288,
+    'Foot': 0.3048,
+    'Foot_1865': 0.304800833333333,
+    'Foot_Benoit_1895_A': 0.304799733333333,
+    'Foot_Benoit_1895_B': 0.304799734763271,
+    'Foot_British_1936': 0.3048007491,
+    'Foot_Clarke': 0.304797265,
+    'Foot_Gold_Coast': 0.304799710181509,
+    'Foot_Indian': 0.304799510248147,
+    'Foot_Indian_1937': 0.30479841,
+    'Foot_Indian_1962': 0.3047996,
+    'Foot_Indian_1975': 0.3047995,
+    'Foot_Sears': 0.304799471538676,
+    'Foot_US': 0.304800609601219,
+    'Inch': 0.0254,
+    'Inch_US': 0.0254000508001016,
+    'Kilometer': 1000.0,
+    'Link': 0.201168,
+    'Link_Benoit_1895_A': 0.201167824,
+    'Link_Benoit_1895_B': 0.201167824943759,
+    'Link_Clarke': 0.2011661949,
+    'Link_Sears': 0.201167651215526,
+    'Link_US': 0.201168402336805,
+    'Meter': 1.0,
+    'Meter_German': 1.0000135965,
+    'Mile_US': 1609.34721869444,
+    'Millimeter': 0.001,
+    'Nautical_Mile': 1852.0,
+    'Nautical_Mile_UK': 1853.184,
+    'Nautical_Mile_US': 1853.248,
+    'Rod': 5.0292,
+    'Rod_US': 5.02921005842012,
+    'Statute_Mile': 1609.344,
+    'Yard': 0.9144,
+    'Yard_Benoit_1895_A': 0.9143992,
+    'Yard_Benoit_1895_B': 0.914399204289812,
+    'Yard_Clarke': 0.914391795,
+    'Yard_Indian': 0.914398530744441,
+    'Yard_Indian_1937': 0.91439523,
+    'Yard_Indian_1962': 0.9143988,
+    'Yard_Indian_1975': 0.9143985,
+    'Yard_Sears': 0.914398414616029,
+    'Yard_Sears_1922_Truncated': 0.914398,
+    'Yard_US': 0.914401828803658
+}
+
+
+def getMeterConversionFactor(linearUnits):
+    """ Get the factor for converting map units to meters.
+
+    **Description:**
+
+        The *linearUnits* may be a number, which is returned as the factor, or the name of an ArcGIS 10 linear unit,
+        such as 'Foot_US', which is looked up in :py:data:`METERS_PER_UNIT`.  A KeyError is raised for unknown names.
+
+    **Arguments:**
+
+        * *linearUnits* - float factor or string with the ArcGIS 10 linear unit name
+
+    **Returns:**
+
+        * float
+
+    """
+
+    if isinstance(linearUnits, basestring):
+        return METERS_PER_UNIT[linearUnits]
+
+    return float(linearUnits)
+
+
+def getSquareMeterConversionFactor(linearUnits):
+    """ Get the factor for converting areas in square map units to square meters.
+
+    **Description:**
+
+        This is the square of :py:func:`getMeterConversionFactor`, so areas and distances are always converted with
+        the same unit definitions.
+
+    **Arguments:**
+
+        * *linearUnits* - float factor or string with the ArcGIS 10 linear unit name
+
+    **Returns:**
+
+        * float
+
+    """
+
+    meterFactor = getMeterConversionFactor(linearUnits)
+
+    return meterFactor * meterFactor
@@ -0,0 +1,304 @@
+""" This module contains a sidecar cache of the value counts of a raster file, so unchanged rasters are not re-scanned.
+
+    The cache is a NumPy .npz file next to the raster, holding the unique values and their cell counts, the NoData
+    count, the minimum and maximum value, and optionally the counts of each value in each block of the raster.  It is
+    keyed by a fingerprint of the raster: the size and modification time of the file and its header, and a checksum of
+    bytes sampled evenly through the file.  If the fingerprint of the raster no longer matches, the cache is ignored
+    and rebuilt.
+
+    The sampled checksum catches a raster rewritten in place within the resolution of the file system clock, without
+    reading the whole file, but it is not a full checksum of the pixel data.  Tiled grids are fingerprinted from the
+    name, size, modification time and inode of each tile file instead, as tiles are replaced rather than rewritten.
+
+"""
+
+import os
+import zlib
+import zipfile
+import numpy
+import raster
+import histogram
+
+#: Extension added to the raster path, after the band index, to name the cache file
+VALUE_CACHE_EXTENSION = '.vat.npz'
+
+#: Number of chunks sampled from the raster file for the checksum
+CHECKSUM_SAMPLE_COUNT = 64
+
+#: Size in bytes of each chunk sampled for the checksum
+CHECKSUM_SAMPLE_BYTES = 4096
+
+
+class ValueCache(object):
+    """ This class holds the value counts of one band of a raster, as stored in its cache file.
+
+    **Description:**
+
+        Use :py:func:`getValueCache` to read or build the cache of a raster.  If the cache holds block counts,
+        *tileCounts* has a row for each block of *blockRows* by *blockColumns* cells, in the order of
+        :py:func:`pylet.numpyutil.raster.getBlockWindows`, and a column for each value.
+
+    **Arguments:**
+
+        * *fingerprint* - tuple from :py:func:`getFingerprint` of the raster the counts were made from
+        * *values* - NumPy array of unique values in ascending order
+        * *counts* - NumPy int64 array of cell counts for each value
+        * *nodataCount* - number of NoData and NaN cells
+        * *blockRows*, *blockColumns* - size of the blocks of tileCounts, or None
+        * *tileCounts* - 2-D NumPy int64 array of counts for each block and value, or None
+
+    """
+
+    def __init__(self, fingerprint, values, counts, nodataCount, blockRows=None, blockColumns=None, tileCounts=None):
+
+        self.fingerprint = tuple(fingerprint)
+        self.values = values
+        self.counts = counts
+        self.nodataCount = int(nodataCount)
+        self.blockRows = blockRows
+        self.blockColumns = blockColumns
+        self.tileCounts = tileCounts
+
+    @property
+    def minValue(self):
+        """ The smallest value with at least one cell, or None if all cells are NoData """
+        return self.values[0] if len(self.values) else None
+
+    @property
+    def maxValue(self):
+        """ The largest value with at least one cell, or None if all cells are NoData """
+        return self.values[-1] if len(self.values) else None
+
+    def getTileValuesAndCounts(self, tileIndex):
+        """ Get the values with at least one cell in a block, and their counts, from the block counts """
+
+        if self.tileCounts is None:
+            raise ValueError("The cache does not hold block counts")
+
+        present = numpy.flatnonzero(self.tileCounts[tileIndex])
+        return self.values[present], self.tileCounts[tileIndex, present]
+
+    def save(self, cachePath):
+        """ Write the cache to a file, replacing any existing cache """
+
+        arrays = {'fingerprint': numpy.array(self.fingerprint, dtype=numpy.float64), 'values': self.values,
+                  'counts': self.counts, 'nodataCount': numpy.int64(self.nodataCount)}
+        if self.tileCounts is not None:
+            arrays.update(blockShape=numpy.array([self.blockRows, self.blockColumns]), tileCounts=self.tileCounts)
+
+        # Write to a temporary file first, so a cache is never read half written
+        temporaryPath = '{0}.{1}.tmp'.format(cachePath, os.getpid())
+        with open(temporaryPath, 'wb') as cacheFile:
+            numpy.savez(cacheFile, **arrays)
+        if os.path.exists(cachePath):
+            os.remove(cachePath)
+        os.rename(temporaryPath, cachePath)
+
+    @classmethod
+    def load(cls, cachePath):
+        """ Read a cache from a file """
+
+        with open(cachePath, 'rb') as cacheFile:
+            arrays = numpy.load(cacheFile)
+            if 'tileCounts' in arrays.files:
+                blockRows, blockColumns = arrays['blockShape'].tolist()
+                tileCounts = arrays['tileCounts']
+            else:
+                blockRows, blockColumns, tileCounts = None, None, None
+
+            return cls(arrays['fingerprint'].tolist(), arrays['values'], arrays['counts'], arrays['nodataCount'],
+                       blockRows, blockColumns, tileCounts)
+
+
+def getCachePath(rasterPath, bandIndex=0):
+    """ Get the path of the cache file for a band of a raster file """
+    return '{0}.{1}{2}'.format(rasterPath, bandIndex, VALUE_CACHE_EXTENSION)
+
+
+def getFingerprint(rasterPath):
+    """ Get the fingerprint identifying the current contents of a raster file.
+
+    **Description:**
+
+        The fingerprint is the size and modification time of the raster file, the same for its .hdr header if it has
+        one, and a CRC-32 checksum of :py:data:`CHECKSUM_SAMPLE_COUNT` chunks of :py:data:`CHECKSUM_SAMPLE_BYTES`
+        spread evenly through the raster file.  Only the sampled chunks are read.
+
+        For the directory of a tiled grid, the size is the total size of the tile files, the modification time is the
+        latest of the directory and its files, and the checksum is a CRC-32 checksum of the name, size, modification
+        time and inode of each file.  No pixel data is read.
+
+    **Arguments:**
+
+        * *rasterPath* - Full path to the raster file, or to the directory of a tiled grid
+
+    **Returns:**
+
+        * tuple - (size, mtime, header size, header mtime, checksum) as floats
+
+    """
+
+    headerPath = os.path.splitext(rasterPath)[0] + raster.HEADER_EXTENSION
+
+    if os.path.exists(headerPath):
+        headerSize, headerTime = os.path.getsize(headerPath), os.path.getmtime(headerPath)
+    else:
+        headerSize, headerTime = -1, -1
+
+    checksum = 0
+    if os.path.isdir(rasterPath):
+        size = 0
+        modifiedTime = os.path.getmtime(rasterPath)
+        for fileName in sorted(os.listdir(rasterPath)):
+            fileStat = os.stat(os.path.join(rasterPath, fileName))
+            size += fileStat.st_size
+            modifiedTime = max(modifiedTime, fileStat.st_mtime)
+            checksum = zlib.crc32('{0} {1} {2!r} {3}'.format(fileName, fileStat.st_size, fileStat.st_mtime,
+                                                             fileStat.st_ino), checksum)
+    else:
+        size = os.path.getsize(rasterPath)
+        modifiedTime = os.path.getmtime(rasterPath)
+        with open(rasterPath, 'rb') as rasterFile:
+            offsets = numpy.linspace(0, max(size - CHECKSUM_SAMPLE_BYTES, 0), CHECKSUM_SAMPLE_COUNT)
+            for offset in numpy.unique(offsets.astype(numpy.int64)).tolist():
+                rasterFile.seek(offset)
+                checksum = zlib.crc32(rasterFile.read(CHECKSUM_SAMPLE_BYTES), checksum)
+
+    return (float(size), modifiedTime, float(headerSize), float(headerTime), float(checksum & 0xffffffff))
+
+
+def buildValueCache(inRaster, blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE,
+                    bandIndex=0, tileCounts=False, fingerprint=()):
+    """ Count the cells of each value in a raster, one block at a time, into a :py:class:`ValueCache`.
+
+    **Description:**
+
+        The counts are the same as those of :py:func:`pylet.numpyutil.histogram.getValueHistogram`.  If *tileCounts*
+        is True the counts of each block are kept as well, which is only practical for rasters with few values.
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *bandIndex* - zero based index of the band to count
+        * *tileCounts* - boolean to keep the counts of each block
+        * *fingerprint* - fingerprint to store with the counts
+
+    **Returns:**
+
+        * :py:class:`ValueCache`
+
+    """
+
+    nodata = getattr(inRaster, 'nodata', None)
+
+    if not tileCounts:
+        valueHistogram = histogram.ValueHistogram(nodata)
+        for window in raster.iterateBlocks(inRaster, blockRows, blockColumns, bandIndex=bandIndex):
+            valueHistogram.addBlock(window.array)
+
+        values, counts = valueHistogram.getValuesAndCounts()
+        return ValueCache(fingerprint, values, counts, valueHistogram.nodataCount)
+
+    tileValues = []
+    tileValueCounts = []
+    nodataCount = 0
+    for window in raster.iterateBlocks(inRaster, blockRows, blockColumns, bandIndex=bandIndex):
+        tileHistogram = histogram.ValueHistogram(nodata)
+        tileHistogram.addBlock(window.array)
+        values, counts = tileHistogram.getValuesAndCounts()
+        tileValues.append(values)
+        tileValueCounts.append(counts)
+        nodataCount += tileHistogram.nodataCount
+
+    values = numpy.unique(numpy.concatenate(tileValues)) if tileValues else numpy.array([])
+    tileMatrix = numpy.zeros((len(tileValues), len(values)), dtype=numpy.int64)
+    for tileIndex, (tileValueIds, counts) in enumerate(zip(tileValues, tileValueCounts)):
+        tileMatrix[tileIndex, numpy.searchsorted(values, tileValueIds)] = counts
+
+    return ValueCache(fingerprint, values, tileMatrix.sum(axis=0), nodataCount, blockRows, blockColumns, tileMatrix)
+
+
+def getValueCache(inRaster, blockRows=raster.DEFAULT_BLOCK_SIZE, blockColumns=raster.DEFAULT_BLOCK_SIZE,
+                  bandIndex=0, tileCounts=False):
+    """ Get the value counts of a raster from its cache file, building and saving the cache if it is out of date.
+
+    **Description:**
+
+        The cache is used if the fingerprint of the raster matches, and, when *tileCounts* is True, if it holds block
+        counts for the same block size.  Otherwise the raster is scanned with :py:func:`buildValueCache` and the cache
+        is saved next to the raster, see :py:func:`getCachePath`.  If the cache cannot be written, such as in a read
+        only folder, the counts are still returned.
+
+        NumPy arrays, and :py:class:`pylet.numpyutil.raster.RasterGrid` objects without a path, are always scanned.
+        A cache which cannot be read, such as a truncated file, is rebuilt.
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *blockRows*, *blockColumns* - size of the blocks read at once, and of the block counts
+        * *bandIndex* - zero based index of the band to count
+        * *tileCounts* - boolean to require the counts of each block
+
+    **Returns:**
+
+        * :py:class:`ValueCache`
+
+    """
+
+    rasterPath = getattr(inRaster, 'path', None)
+    if rasterPath is None:
+        return buildValueCache(inRaster, blockRows, blockColumns, bandIndex, tileCounts)
+
+    fingerprint = getFingerprint(rasterPath)
+    cachePath = getCachePath(rasterPath, bandIndex)
+
+    if os.path.exists(cachePath):
+        try:
+            valueCache = ValueCache.load(cachePath)
+        except (IOError, ValueError, KeyError, zipfile.BadZipfile):
+            valueCache = None
+
+        if valueCache is not None and valueCache.fingerprint == fingerprint:
+            if not tileCounts or (valueCache.blockRows, valueCache.blockColumns) == (blockRows, blockColumns):
+                return valueCache
+
+    valueCache = buildValueCache(inRaster, blockRows, blockColumns, bandIndex, tileCounts, fingerprint)
+
+    try:
+        valueCache.save(cachePath)
+    except (IOError, OSError):
+        pass
+
+    return valueCache
+
+
+def getCachedValueHistogram(inRaster, lccObj=None, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                            blockColumns=raster.DEFAULT_BLOCK_SIZE, bandIndex=0):
+    """ Count the cells of each value in a raster, using its cache file if the raster has not changed.
+
+    **Description:**
+
+        This returns the same as :py:func:`pylet.numpyutil.histogram.getValueHistogram`, but unchanged raster files
+        are answered from the cache without reading their pixel data, see :py:func:`getValueCache`.
+
+    **Arguments:**
+
+        * *inRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array
+        * *lccObj* - optional :py:class:`pylet.lcc.LandCoverClassification` object
+        * *blockRows*, *blockColumns* - size of the blocks read at once
+        * *bandIndex* - zero based index of the band to count
+
+    **Returns:**
+
+        * NumPy array - unique values in ascending order
+        * NumPy array - int64 cell counts for each value
+        * `frozenset`_ - values not defined in lccObj, empty if lccObj is None
+
+    .. _frozenset: http://docs.python.org/library/stdtypes.html#frozenset
+
+    """
+
+    valueCache = getValueCache(inRaster, blockRows, blockColumns, bandIndex)
+
+    return valueCache.values, valueCache.counts, histogram.getUndefinedValueIds(valueCache.values, lccObj)
@@ -0,0 +1,337 @@
+""" This module contains engines for tabulating land cover within zones, such as reporting units.
+
+    The zone raster and the land cover raster must be on the same grid, ie. the same extent, cell size and shape.
+    Cells are counted block by block, so rasters larger than memory can be tabulated.
+
+"""
+
+import numpy
+import raster
+import histogram
+
+
+class ZonalCounts(object):
+    """ This class holds the number of cells of each value within each zone.
+
+    **Description:**
+
+        The *counts* matrix has one row per zone and one column per value, both in ascending order.  Multiply the
+        counts by the area of a cell to get the areas reported by the ArcGIS TabulateArea tool.
+
+    **Arguments:**
+
+        * *zoneIds* - 1-D NumPy array of zone ids
+        * *valueIds* - 1-D NumPy array of land cover values
+        * *counts* - 2-D NumPy int64 array of cell counts, zones by values
+
+    """
+
+    def __init__(self, zoneIds, valueIds, counts):
+
+        self.zoneIds = zoneIds
+        self.valueIds = valueIds
+        self.counts = counts
+
+    def getAreas(self, cellArea):
+        """ Get the zones by values matrix of areas, for the given area of a single cell """
+        return self.counts * float(cellArea)
+
+    def getValueIdColumns(self, columnCount=None):
+        """ Get the counts with one column for each value id, from 0 up to the largest value id.
+
+        **Description:**
+
+            This is the layout expected by :py:meth:`pylet.lcc.LandCoverClasses.getClassCounts`.  Negative value ids and
+            value ids not less than *columnCount* are dropped.
+
+        **Arguments:**
+
+            * *columnCount* - number of columns, by default one more than the largest value id
+
+        **Returns:**
+
+            * 2-D NumPy int64 array, zones by value ids
+
+        """
+
+        valueIds = numpy.asarray(self.valueIds).astype(numpy.int64)
+
+        if columnCount is None:
+            columnCount = int(valueIds.max()) + 1 if valueIds.size else 0
+
+        inRange = (valueIds >= 0) & (valueIds < columnCount)
+        valueIdColumns = numpy.zeros((len(self.zoneIds), columnCount), dtype=numpy.int64)
+        valueIdColumns[:, valueIds[inRange]] = self.counts[:, inRange]
+
+        return valueIdColumns
+
+
+class ZonalTabulator(object):
+    """ This class accumulates the number of cells of each value within each zone over any number of blocks.
+
+    **Description:**
+
+        Zone ids and values are dictionary encoded in each block, into consecutive indexes, and the cells are counted
+        for every zone and value at once with `numpy.bincount`_ on a combined zone and value key.  Block counts are
+        added to a matrix which grows as new zones and values are found.
+
+        Cells equal to *zoneNodata* are ignored, and cells equal to *valueNodata* are not counted, but their zone is
+        still reported.
+
+        .. _numpy.bincount: http://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+
+    **Arguments:**
+
+        * *zoneNodata* - the value representing NoData in the zone raster, or None
+        * *valueNodata* - the value representing NoData in the land cover raster, or None
+
+    """
+
+    def __init__(self, zoneNodata=None, valueNodata=None):
+
+        self.zoneNodata = zoneNodata
+        self.valueNodata = valueNodata
+        self._zoneRows = {}
+        self._valueColumns = {}
+        self._counts = numpy.zeros((0, 0), dtype=numpy.int64)
+
+    def addBlock(self, zones, values, weights=None, mask=None):
+        """ Count the cells of each value within each zone for a pair of blocks of the same shape.
+
+        **Description:**
+
+            If *weights* is provided, each cell adds its weight instead of one, for example the fraction of a cell.
+            Cells set in *mask* are not counted, as for NoData values.
+
+        **Arguments:**
+
+            * *zones* - 2-D NumPy array of zone ids
+            * *values* - 2-D NumPy array of land cover values
+            * *weights* - optional 2-D NumPy array of cell weights
+            * *mask* - optional 2-D NumPy boolean array of cells not to count, such as from
+              :py:meth:`pylet.numpyutil.masks.PackedMask.read`
+
+        **Returns:**
+
+            * None
+
+        """
+
+        zones = numpy.asarray(zones).ravel()
+        values = numpy.asarray(values).ravel()
+        if weights is not None:
+            weights = numpy.asarray(weights).ravel()
+
+        validZones = getValidMask(zones, self.zoneNodata)
+        if validZones is not None:
+            zones = zones[validZones]
+            values = values[validZones]
+            if weights is not None:
+                weights = weights[validZones]
+
+        if not zones.size:
+            return
+
+        zoneIds, zoneIndexes = encodeValues(zones)
+        zoneRows = self._getIndexes(self._zoneRows, zoneIds)
+
+        validValues = getValidMask(values, self.valueNodata)
+        if mask is not None:
+            unmasked = ~numpy.asarray(mask).ravel()
+            if validZones is not None:
+                unmasked = unmasked[validZones]
+            validValues = unmasked if validValues is None else validValues & unmasked
+        if validValues is not None:
+            zoneIndexes = zoneIndexes[validValues]
+            values = values[validValues]
+            if weights is not None:
+                weights = weights[validValues]
+
+        if not values.size:
+            self._grow()
+            return
+
+        valueIds, valueIndexes = encodeValues(values)
+        valueColumns = self._getIndexes(self._valueColumns, valueIds)
+
+        keys = zoneIndexes.astype(numpy.int64) * len(valueIds) + valueIndexes
+        blockCounts = numpy.bincount(keys, weights=weights, minlength=len(zoneIds) * len(valueIds))
+        blockCounts = blockCounts.reshape(len(zoneIds), len(valueIds))
+
+        self._grow()
+        if weights is None:
+            self._counts[numpy.ix_(zoneRows, valueColumns)] += blockCounts.astype(numpy.int64)
+        else:
+            if self._counts.dtype.kind != 'f':
+                self._counts = self._counts.astype(numpy.float64)
+            self._counts[numpy.ix_(zoneRows, valueColumns)] += blockCounts
+
+    def addCounts(self, zonalCounts):
+        """ Add the counts from a :py:class:`ZonalCounts` object, such as the result for another part of a raster """
+
+        zoneRows = self._getIndexes(self._zoneRows, zonalCounts.zoneIds)
+        valueColumns = self._getIndexes(self._valueColumns, zonalCounts.valueIds)
+        self._grow()
+
+        if zonalCounts.counts.dtype.kind == 'f' and self._counts.dtype.kind != 'f':
+            self._counts = self._counts.astype(numpy.float64)
+        self._counts[numpy.ix_(zoneRows, valueColumns)] += zonalCounts.counts
+
+    def _getIndexes(self, indexes, ids):
+        """ Returns the global row or column for each id, assigning new ones as needed """
+
+        idList = ids.tolist()
+        for idValue in idList:
+            if idValue not in indexes:
+                indexes[idValue] = len(indexes)
+
+        return numpy.array([indexes[idValue] for idValue in idList], dtype=numpy.intp)
+
+    def _grow(self):
+        """ Extends the counts matrix to cover all zones and values seen so far """
+
+        rowCount, columnCount = self._counts.shape
+
+        if len(self._zoneRows) > rowCount or len(self._valueColumns) > columnCount:
+            # Grow by doubling so that adding many new zones stays linear
+            newShape = (max(len(self._zoneRows), 2 * rowCount), max(len(self._valueColumns), 2 * columnCount))
+            counts = numpy.zeros(newShape, dtype=self._counts.dtype)
+            counts[:rowCount, :columnCount] = self._counts
+            self._counts = counts
+
+    def getCounts(self):
+        """ Get the :py:class:`ZonalCounts` accumulated so far, with zones and values in ascending order """
+
+        zoneIds = sorted(self._zoneRows.keys())
+        valueIds = sorted(self._valueColumns.keys())
+
+        zoneRows = [self._zoneRows[zoneId] for zoneId in zoneIds]
+        valueColumns = [self._valueColumns[valueId] for valueId in valueIds]
+
+        counts = self._counts[numpy.ix_(zoneRows, valueColumns)]
+
+        return ZonalCounts(numpy.array(zoneIds), numpy.array(valueIds), counts)
+
+
+def encodeValues(values):
+    """ Dictionary encode a 1-D NumPy array into its unique values and an index into them for each element.
+
+    **Description:**
+
+        This gives the same result as `numpy.unique`_ with return_inverse, but integer values within a range of
+        :py:data:`pylet.numpyutil.histogram.MAX_DENSE_RANGE` are encoded in linear time with a lookup array instead of
+        sorting.
+
+        .. _numpy.unique: http://docs.scipy.org/doc/numpy/reference/generated/numpy.unique.html
+
+    **Arguments:**
+
+        * *values* - 1-D NumPy array
+
+    **Returns:**
+
+        * NumPy array - unique values in ascending order
+        * NumPy array - index into the unique values for each element
+
+    """
+
+    if values.dtype.kind in 'iub' and values.size:
+        minValue = int(values.min())
+        valueRange = int(values.max()) - minValue + 1
+
+        if valueRange <= histogram.MAX_DENSE_RANGE:
+            offsets = values.astype(numpy.intp) - minValue
+            present = numpy.bincount(offsets, minlength=valueRange) > 0
+            lookup = numpy.cumsum(present) - 1
+            uniqueValues = (numpy.flatnonzero(present) + minValue).astype(values.dtype)
+            return uniqueValues, lookup[offsets]
+
+    return numpy.unique(values, return_inverse=True)
+
+
+def tabulateArea(zoneRaster, landCoverRaster, blockRows=raster.DEFAULT_BLOCK_SIZE,
+                 blockColumns=raster.DEFAULT_BLOCK_SIZE, zoneNodata=None, valueNodata=None, mask=None):
+    """ Count the cells of each land cover value within each zone, one block at a time.
+
+    **Description:**
+
+        This is the arcpy-free equivalent of the ArcGIS TabulateArea tool for a zone raster, without an intermediate
+        workspace.  Both rasters must be on the same grid.  If the NoData values are not provided, the nodata of each
+        :py:class:`pylet.numpyutil.raster.RasterGrid` is used.  See :py:class:`ZonalTabulator` for details.
+
+        Cells set in *mask* are not counted, such as the excluded value mask from
+        :py:func:`pylet.numpyutil.masks.getLandCoverMasks`.
+
+    **Arguments:**
+
+        * *zoneRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of zone ids
+        * *landCoverRaster* - :py:class:`pylet.numpyutil.raster.RasterGrid` object or 2-D NumPy array of land cover
+        * *blockRows*, *blockColumns* - size of the blocks tabulated at once
+        * *zoneNodata* - the value representing NoData in the zone raster
+        * *valueNodata* - the value representing NoData in the land cover raster
+        * *mask* - optional :py:class:`pylet.numpyutil.masks.PackedMask` of cells not to count
+
+    **Returns:**
+
+        * :py:class:`ZonalCounts`
+
+    """
+
+    zoneArray, valueArray = getAlignedArrays(zoneRaster, landCoverRaster)
+
+    if zoneNodata is None:
+        zoneNodata = getattr(zoneRaster, 'nodata', None)
+    if valueNodata is None:
+        valueNodata = getattr(landCoverRaster, 'nodata', None)
+
+    tabulator = ZonalTabulator(zoneNodata, valueNodata)
+
+    for window in raster.getBlockWindows(zoneArray.shape[0], zoneArray.shape[1], blockRows, blockColumns):
+        blockMask = None if mask is None else mask.read(window)
+        tabulator.addBlock(window.read(zoneArray), window.read(valueArray), mask=blockMask)
+
+    return tabulator.getCounts()
+
+
+def getAlignedArrays(*rasters):
+    """ Get the 2-D NumPy arrays for rasters on the same grid, raising a ValueError if their shapes differ """
+
+    arrays = [raster.getRasterArray(inRaster) for inRaster in rasters]
+
+    for array in arrays[1:]:
+        if array.shape != arrays[0].shape:
+            raise ValueError("Rasters must be on the same grid, found shapes {0} and {1}".format(arrays[0].shape,
+                                                                                               array.shape))
+
+    return arrays
+
+
+def getValidMask(values, nodata):
+    """ Get a boolean mask of the elements of a NumPy array which are not NoData.
+
+    **Description:**
+
+        Elements equal to *nodata* are not valid, and for floating point arrays NaN elements are not valid either.
+        If every element is valid by type, ie. *nodata* is None and the array is not floating point, None is returned
+        instead of a mask, so callers can skip masking.
+
+    **Arguments:**
+
+        * *values* - NumPy array
+        * *nodata* - the value representing NoData, or None
+
+    **Returns:**
+
+        * NumPy boolean array of the shape of values, or None
+
+    """
+
+    validMask = None
+
+    if nodata is not None:
+        validMask = values != nodata
+    if values.dtype.kind == 'f':
+        notNan = ~numpy.isnan(values)
+        validMask = notNan if validMask is None else validMask & notNan
+
+    return validMask
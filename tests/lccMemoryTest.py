@@ -0,0 +1,81 @@
+''' Testing for pylet.lcc.memory
+
+    The classification is built from the small test classification of the numpyutil tests, so no external files are
+    needed.
+'''
+import sys
+import shutil
+import tempfile
+import pylet
+from numpyutilTest import getTestLcc
+
+
+def main():
+    """"""
+    workspace = tempfile.mkdtemp()
+    try:
+        lccObj = getTestLcc(workspace)
+        testDeepSize()
+        testMemoryReport(lccObj)
+        testClassSize(lccObj)
+    finally:
+        shutil.rmtree(workspace)
+
+    print "lcc memory tests passed"
+
+
+def testDeepSize():
+    """"""
+
+    print "DEEP SIZE"
+    item = [1.5, 'text']
+    itemSize = pylet.lcc.memory.getDeepSize(item)
+    assert itemSize == sys.getsizeof(item) + sys.getsizeof(1.5) + sys.getsizeof('text')
+
+    # Shared and excluded objects are only counted once
+    pair = [item, item]
+    assert pylet.lcc.memory.getDeepSize(pair) == sys.getsizeof(pair) + itemSize
+    assert pylet.lcc.memory.getDeepSize(pair, set([id(item)])) == sys.getsizeof(pair)
+    print "   Shared list counted once:", pylet.lcc.memory.getDeepSize(pair)
+    print
+
+
+def testMemoryReport(lccObj):
+    """"""
+
+    print "MEMORY REPORT"
+    report = lccObj.getMemoryReport()
+    for section in pylet.lcc.memory.REPORT_SECTIONS:
+        assert report[section] > 0, section
+        print "  ", section + ":", report[section]
+    assert report['total'] == sum([report[section] for section in pylet.lcc.memory.REPORT_SECTIONS])
+    assert report['total'] <= pylet.lcc.memory.getDeepSize(lccObj)
+
+    # A shared seen set only holds ids of objects reachable from the classification, so nothing is counted twice
+    seen = set()
+    assert pylet.lcc.memory.getMemoryReport(lccObj, seen) == report
+    reachable = set()
+    pylet.lcc.memory.getDeepSize(lccObj, reachable)
+    assert seen <= reachable
+    assert pylet.lcc.memory.getMemoryReport(lccObj, seen)['total'] == 0
+    print
+
+
+def testClassSize(lccObj):
+    """"""
+
+    print "CLASS SIZE"
+    parentClass = lccObj.classes['NI']
+    childClass = lccObj.classes['for']
+    assert childClass.parentClass is parentClass
+
+    childSize = childClass.getSize()
+    assert childSize == pylet.lcc.memory.getDeepSize(childClass, set([id(parentClass)]))
+    assert childSize < pylet.lcc.memory.getDeepSize(childClass)
+    assert parentClass.getSize() > childSize
+    print "   Forest without its parent:", childSize, "with:", pylet.lcc.memory.getDeepSize(childClass)
+    print
+
+
+if __name__ == "__main__":
+    main()
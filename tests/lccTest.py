@@ -105,6 +105,18 @@ def testLccFiles(filePaths):
         print indent, "Top level unique value IDs with excludes:", lccObj.getUniqueValueIdsWithExcludes()
         print
         
+        print "CLASS COUNTS - ONE CELL PER VALUE"
+        valueCounts = dict([(valueId, 1) for valueId in lccObj.getUniqueValueIdsWithExcludes()])
+        for classId, count in lccObj.classes.getClassCounts(valueCounts).items():
+            assert count == len(lccObj.classes[classId].uniqueValueIds)
+            print indent, classId + ":", count
+        print
+        
+        print "MEMORY"
+        for section, size in sorted(lccObj.getMemoryReport().items()):
+            print indent, section + ":", size
+        print
+        
         print "---------------------------------------------------------------------------------"
         print
         
@@ -0,0 +1,1147 @@
+''' Testing for pylet.numpyutil subpackage
+
+    Small rasters are written to a temporary directory and the results of the engines are compared with brute force
+    calculations in plain Python.
+'''
+import os
+import shutil
+import multiprocessing
+import tempfile
+import numpy
+import pylet
+
+# A small NLCD based classification, with a value shared by two classes under one parent
+TEST_LCC_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<lccSchema>
+  <metadata>
+    <name>NLCD test</name>
+    <description>Test classification</description>
+  </metadata>
+  <coefficients>
+    <coefficient Id="IMPERVIOUS" Name="Percent Impervious" fieldName="PCTIA" method="P"/>
+    <coefficient Id="NITROGEN" Name="Estimated Nitrogen Loading" fieldName="N_Load" method="A"/>
+  </coefficients>
+  <values>
+    <value Id="11" Name="Open Water" excluded="true"/>
+    <value Id="21" Name="Developed Open">
+      <coefficient Id="IMPERVIOUS" value="10"/><coefficient Id="NITROGEN" value="5.5"/>
+    </value>
+    <value Id="22" Name="Developed Low">
+      <coefficient Id="IMPERVIOUS" value="35"/><coefficient Id="NITROGEN" value="7"/>
+    </value>
+    <value Id="41" Name="Deciduous">
+      <coefficient Id="IMPERVIOUS" value="0"/><coefficient Id="NITROGEN" value="2"/>
+    </value>
+    <value Id="42" Name="Evergreen">
+      <coefficient Id="IMPERVIOUS" value="0"/><coefficient Id="NITROGEN" value="1.8"/>
+    </value>
+    <value Id="81" Name="Pasture">
+      <coefficient Id="IMPERVIOUS" value="0"/><coefficient Id="NITROGEN" value="9"/>
+    </value>
+    <value Id="82" Name="Crops"/>
+  </values>
+  <classes>
+    <class Id="NI" Name="All natural" lcpField="NINDP">
+      <class Id="for" Name="Forest" lcpField="PFOR">
+        <value Id="41"/><value Id="42"/>
+      </class>
+      <class Id="dec" Name="Deciduous only">
+        <value Id="41"/>
+      </class>
+    </class>
+    <class Id="UI" Name="Human">
+      <class Id="dev" Name="Developed">
+        <value Id="21"/><value Id="22"/>
+      </class>
+      <class Id="agt" Name="Agriculture">
+        <value Id="81"/><value Id="82"/>
+      </class>
+      <value Id="21"/>
+    </class>
+    <class Id="empty" Name="Empty"/>
+  </classes>
+</lccSchema>
+"""
+
+
+def main():
+    """"""
+    workspace = tempfile.mkdtemp()
+    try:
+        testReadRasters(workspace)
+        testBlockIterator()
+        testGeoTransform()
+        testHistogram()
+        testReclass(workspace)
+        testTabulateArea()
+        testTabulateAreaParallel(workspace)
+        testLandCoverProportions(workspace)
+        testCoefficients(workspace)
+        testCoreEdge(workspace)
+        testPatches(workspace)
+        testFocal(workspace)
+        testDistance(workspace)
+        testLandCoverOnSlopes(workspace)
+        testRiparian(workspace)
+        testPointBuffers(workspace)
+        testRasterizeZones(workspace)
+        testValueCache(workspace)
+        testMasks(workspace)
+        testTileCache(workspace)
+        testPyramid(workspace)
+        testResample()
+        testRasterWriter(workspace)
+    finally:
+        shutil.rmtree(workspace)
+
+    print "numpyutil tests passed"
+
+
+def getTestLcc(workspace):
+    """ Returns a LandCoverClassification object for TEST_LCC_XML """
+
+    lccPath = os.path.join(workspace, 'test.xml')
+    with open(lccPath, 'w') as lccFile:
+        lccFile.write(TEST_LCC_XML)
+
+    return pylet.lcc.LandCoverClassification(lccPath)
+
+
+def getTestLandCover(rowCount=37, columnCount=53, seed=0):
+    """ Returns a random land cover array with a few NLCD values and a nodata value of 255 """
+
+    randomState = numpy.random.RandomState(seed)
+    values = numpy.array([11, 21, 22, 41, 42, 81, 82, 255], dtype=numpy.uint8)
+    return values[randomState.randint(0, len(values), (rowCount, columnCount))]
+
+
+def testReadRasters(workspace):
+    """"""
+
+    landCover = getTestLandCover()
+    rowCount, columnCount = landCover.shape
+
+    print "ASCII GRID"
+    asciiPath = os.path.join(workspace, 'landcover.asc')
+    with open(asciiPath, 'w') as asciiFile:
+        asciiFile.write("ncols {0}\nnrows {1}\nxllcorner 1000\nyllcorner 2000\ncellsize 30\n"
+                        "NODATA_value 255\n".format(columnCount, rowCount))
+        for row in landCover:
+            asciiFile.write(" ".join([str(value) for value in row]) + "\n")
+
+    grid = pylet.numpyutil.raster.openRaster(asciiPath)
+    assert (grid.array == landCover).all()
+    assert grid.extent == (1000, 2000, 1000 + columnCount * 30, 2000 + rowCount * 30)
+    assert grid.cellWidth == grid.cellHeight == 30
+    assert grid.nodata == 255
+    print "  ", grid.extent, grid.dtype
+
+    print "BIL/BIP/BSQ GRIDS"
+    bands = numpy.array([landCover, landCover[::-1], landCover[:, ::-1]]).astype('>u2')
+    onDisk = {'BSQ': bands, 'BIL': bands.transpose(1, 0, 2), 'BIP': bands.transpose(1, 2, 0)}
+    for layout, array in onDisk.items():
+        basePath = os.path.join(workspace, 'landcover_' + layout)
+        array.tofile(basePath + '.' + layout.lower())
+        with open(basePath + '.hdr', 'w') as headerFile:
+            headerFile.write("BYTEORDER M\nLAYOUT {0}\nNROWS {1}\nNCOLS {2}\nNBANDS 3\nNBITS 16\nULXMAP 1015\n"
+                             "ULYMAP 3095\nXDIM 30\nYDIM 30\nNODATA 255\n".format(layout, rowCount, columnCount))
+
+        grid = pylet.numpyutil.raster.openRaster(basePath + '.' + layout.lower())
+        assert isinstance(grid.array.base, numpy.memmap) or isinstance(grid.array.base.base, numpy.memmap)
+        for bandIndex in range(3):
+            assert (grid.getBand(bandIndex) == bands[bandIndex]).all()
+        assert grid.extent == (1000, 3110 - rowCount * 30, 1000 + columnCount * 30, 3110)
+        print "  ", layout, grid.bandCount, grid.dtype
+        del grid
+
+    print "FLT GRID"
+    floatPath = os.path.join(workspace, 'slope.flt')
+    slope = numpy.linspace(0, 45, rowCount * columnCount).reshape(rowCount, columnCount).astype('<f4')
+    slope.tofile(floatPath)
+    with open(os.path.join(workspace, 'slope.hdr'), 'w') as headerFile:
+        headerFile.write("ncols {0}\nnrows {1}\nxllcorner 1000\nyllcorner 2000\ncellsize 30\nNODATA_value -9999\n"
+                         "byteorder LSBFIRST\n".format(columnCount, rowCount))
+    grid = pylet.numpyutil.raster.openRaster(floatPath)
+    assert (grid.array == slope).all()
+    assert grid.nodata == -9999
+    print "  ", grid.extent, grid.dtype
+    del grid
+    print
+
+
+def testBlockIterator():
+    """"""
+
+    print "BLOCK ITERATOR"
+    landCover = getTestLandCover()
+    grid = pylet.numpyutil.raster.RasterGrid([landCover], (1000, 2000, 1000 + 53 * 30, 2000 + 37 * 30))
+
+    covered = numpy.zeros(landCover.shape, dtype=int)
+    for window in pylet.numpyutil.raster.iterateBlocks(grid, 10, 16, halo=2):
+        assert numpy.may_share_memory(window.array, landCover)
+        assert (window.core == landCover[window.row:window.row + window.rowCount,
+                                         window.column:window.column + window.columnCount]).all()
+        assert window.array.shape == (window.rowCount + window.haloTop + window.haloBottom,
+                                      window.columnCount + window.haloLeft + window.haloRight)
+        assert window.transform.xMin == 1000 + (window.column - window.haloLeft) * 30
+        covered[window.row:window.row + window.rowCount, window.column:window.column + window.columnCount] += 1
+    assert (covered == 1).all()
+
+    columnOrder = [window.column for window in pylet.numpyutil.raster.iterateBlocks(numpy.asfortranarray(landCover),
+                                                                                      10, 16)]
+    assert columnOrder == sorted(columnOrder)
+    print "  ", "blocks cover raster once"
+    print
+
+
+def testGeoTransform():
+    """"""
+
+    print "GEOTRANSFORM"
+    geoTransform = pylet.numpyutil.geotransform.GeoTransform.fromExtent((1000, 2000, 1090, 2060), 30)
+    rows, columns = numpy.mgrid[0:2, 0:3]
+
+    x, y = geoTransform.toMap(rows, columns, cellCenter=False)
+    assert x[1, 2] == 1060 and y[1, 2] == 2030
+    assert (geoTransform.toRowColumn(x, y, cellCenter=False)[1] == columns).all()
+
+    x, y = geoTransform.toMap(rows, columns)
+    assert x[1, 2] == 1075 and y[1, 2] == 2015
+    for cellCenter in (None, True):
+        assert (geoTransform.toRowColumn(x, y, cellCenter)[0] == rows).all()
+    print "  ", geoTransform
+    print
+
+
+def testHistogram():
+    """"""
+
+    print "HISTOGRAM"
+    landCover = getTestLandCover().astype(numpy.int32)
+    landCover[0, :5] = 2**30
+    grid = pylet.numpyutil.raster.RasterGrid([landCover], (0, 0, 53, 37), nodata=255)
+
+    lccObj = pylet.lcc.LandCoverClassification()
+    lccObj.values[11] = pylet.lcc.LandCoverValue()
+    values, counts, undefinedValueIds = pylet.numpyutil.histogram.getValueHistogram(grid, lccObj, 8, 8)
+
+    expectedValues = sorted(set(landCover.ravel().tolist()) - set([255]))
+    assert values.tolist() == expectedValues
+    assert counts.tolist() == [int((landCover == value).sum()) for value in expectedValues]
+    assert undefinedValueIds == frozenset(expectedValues) - frozenset([11])
+    print "  ", zip(values.tolist(), counts.tolist())
+    print
+
+
+def testReclass(workspace):
+    """"""
+
+    print "RECLASS"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+
+    engine = pylet.numpyutil.reclass.ReclassEngine(lccObj, nodata=255)
+    engine.addClassIndexLayer(['for', 'dev', 'agt'])
+    engine.addClassLayer('UI')
+    engine.addExcludedLayer()
+    engine.addCoefficientLayer('NITROGEN')
+    classIndex, human, excluded, nitrogen = engine.reclassifyRaster(landCover, blockRows=10, blockColumns=10)
+
+    for value in numpy.unique(landCover).tolist():
+        cells = landCover == value
+        if value == 255:
+            assert (classIndex[cells] == 255).all() and numpy.isnan(nitrogen[cells]).all()
+            continue
+        expectedIndex = [index for index, classId in enumerate(['for', 'dev', 'agt'], 1)
+                         if value in lccObj.classes[classId].uniqueValueIds] or [0]
+        assert (classIndex[cells] == expectedIndex[0]).all()
+        assert (human[cells] == int(value in lccObj.classes['UI'].uniqueValueIds)).all()
+        assert (excluded[cells] == int(lccObj.values[value].excluded)).all()
+        coefficient = lccObj.values[value].getCoefficientValueById('NITROGEN')
+        assert numpy.allclose(nitrogen[cells], numpy.nan if coefficient is None else coefficient, equal_nan=True)
+
+    # The nodata of a raster only applies to the call it is passed to
+    gridEngine = pylet.numpyutil.reclass.ReclassEngine(lccObj)
+    gridEngine.addClassIndexLayer(['for', 'dev', 'agt'])
+    grid = pylet.numpyutil.raster.RasterGrid([landCover], (0, 0, 53, 37), nodata=41)
+    assert (gridEngine.reclassifyRaster(grid, blockRows=10, blockColumns=10)[0][landCover == 41] == 255).all()
+    assert gridEngine.nodata is None
+    assert (gridEngine.reclassifyBlock(landCover)[0] == classIndex).all()
+
+    # A class without value ids holds no cells
+    emptyLcc = getTestLcc(workspace)
+    emptyLcc.classes['empty'].uniqueValueIds = None
+    emptyEngine = pylet.numpyutil.reclass.ReclassEngine(emptyLcc, nodata=255)
+    emptyEngine.addClassIndexLayer(['empty'])
+    emptyEngine.addClassLayer('empty', 'emptyClass')
+    valid = landCover != 255
+    for layer in emptyEngine.reclassifyRaster(landCover):
+        assert (layer[valid] == pylet.numpyutil.reclass.NOT_IN_CLASS).all()
+
+    print "  ", engine.layerNames, [layer.dtype.name for layer in (classIndex, human, excluded, nitrogen)]
+    print
+
+
+def getTestZones(rowCount=37, columnCount=53):
+    """ Returns a zone array of vertical bands with ids 101 to 104 and a nodata value of -1 in the first column """
+
+    zones = numpy.repeat(numpy.arange(columnCount) * 4 // columnCount + 101, rowCount).reshape(columnCount, rowCount).T
+    zones[:, 0] = -1
+    return zones.astype(numpy.int32)
+
+
+def testTabulateArea():
+    """"""
+
+    print "TABULATE AREA"
+    landCover = getTestLandCover()
+    zones = getTestZones()
+
+    zonalCounts = pylet.numpyutil.zonal.tabulateArea(zones, landCover, 10, 7, zoneNodata=-1, valueNodata=255)
+
+    assert zonalCounts.zoneIds.tolist() == [101, 102, 103, 104]
+    assert zonalCounts.valueIds.tolist() == [11, 21, 22, 41, 42, 81, 82]
+    for zoneIndex, zoneId in enumerate(zonalCounts.zoneIds):
+        for valueIndex, valueId in enumerate(zonalCounts.valueIds):
+            expected = ((zones == zoneId) & (landCover == valueId)).sum()
+            assert zonalCounts.counts[zoneIndex, valueIndex] == expected
+    assert zonalCounts.getValueIdColumns()[:, 41].tolist() == zonalCounts.counts[:, 3].tolist()
+    print "  ", zonalCounts.counts.sum(axis=1)
+    print
+
+
+def testTabulateAreaParallel(workspace):
+    """"""
+
+    print "TABULATE AREA IN PARALLEL"
+    zones = getTestZones()
+    grid = pylet.numpyutil.raster.openRaster(os.path.join(workspace, 'landcover_BSQ.bsq'))
+
+    serialCounts = pylet.numpyutil.zonal.tabulateArea(zones, grid, zoneNodata=-1)
+    for processes in (1, 2, 3):
+        zonalCounts = pylet.numpyutil.parallel.tabulateAreaParallel(zones, grid, processes, blockRows=8,
+                                                                    blockColumns=16, zoneNodata=-1)
+        assert zonalCounts.zoneIds.tolist() == serialCounts.zoneIds.tolist()
+        assert zonalCounts.valueIds.tolist() == serialCounts.valueIds.tolist()
+        assert (zonalCounts.counts == serialCounts.counts).all()
+        print "  ", processes, zonalCounts.counts.sum()
+
+    # A zone raster of only NoData has no zones to count
+    for processes in (1, 2):
+        zonalCounts = pylet.numpyutil.parallel.tabulateAreaParallel(numpy.zeros_like(zones) - 1, grid, processes,
+                                                                    blockRows=8, blockColumns=16, zoneNodata=-1)
+        assert zonalCounts.zoneIds.size == 0 and zonalCounts.counts.shape == (0, len(zonalCounts.valueIds))
+    del grid
+    print
+
+
+def testLandCoverProportions(workspace):
+    """"""
+
+    print "LAND COVER PROPORTIONS"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+
+    zonalCounts = pylet.numpyutil.zonal.tabulateArea(zones, landCover, zoneNodata=-1, valueNodata=255)
+    columns = pylet.numpyutil.lcp.getLandCoverProportions(zonalCounts, lccObj, cellArea=900)
+
+    assert columns.keys() == ['NINDP', 'PFOR', 'pdec', 'pUI', 'pdev', 'pagt', 'EffectiveArea', 'ExcludedArea']
+    for zoneIndex, zoneId in enumerate(zonalCounts.zoneIds):
+        inZone = landCover[(zones == zoneId) & (landCover != 255)]
+        effective = (inZone != 11).sum()
+        assert columns['ExcludedArea'][zoneIndex] == (inZone == 11).sum() * 900
+        assert columns['EffectiveArea'][zoneIndex] == effective * 900
+        forest = numpy.in1d(inZone, [41, 42]).sum()
+        assert numpy.allclose(columns['PFOR'][zoneIndex], forest * 100.0 / effective)
+
+    # A class without value ids holds no values
+    lccObj.classes['empty'].uniqueValueIds = None
+    membership = pylet.numpyutil.lcp.getClassMembership(zonalCounts.valueIds, [lccObj.classes['empty']])
+    assert membership.shape == (len(zonalCounts.valueIds), 1) and not membership.any()
+    print "  ", ", ".join(["{0}={1:.1f}".format(field, column[0]) for field, column in columns.items()])
+    print
+
+
+def testCoefficients(workspace):
+    """"""
+
+    print "COEFFICIENTS"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+
+    zonalCounts = pylet.numpyutil.zonal.tabulateArea(zones, landCover, zoneNodata=-1, valueNodata=255)
+    columns = pylet.numpyutil.coefficients.getCoefficientResults(zonalCounts, lccObj, cellArea=900)
+
+    assert columns.keys() == ['PCTIA', 'N_Load']
+    impervious = {21: 10.0, 22: 35.0}
+    nitrogen = {21: 5.5, 22: 7.0, 41: 2.0, 42: 1.8, 81: 9.0}
+    for zoneIndex, zoneId in enumerate(zonalCounts.zoneIds):
+        inZone = landCover[(zones == zoneId) & (landCover != 255)].tolist()
+        effective = len([value for value in inZone if value != 11])
+        expected = sum([impervious.get(value, 0.0) for value in inZone]) / effective
+        assert numpy.allclose(columns['PCTIA'][zoneIndex], expected)
+        expected = sum([nitrogen.get(value, 0.0) * 0.09 for value in inZone])
+        assert numpy.allclose(columns['N_Load'][zoneIndex], expected)
+
+    # Map units in feet give a smaller area in hectares
+    feetColumns = pylet.numpyutil.coefficients.getCoefficientResults(zonalCounts, lccObj, cellArea=900,
+                                                                      linearUnits=0.3048)
+    assert numpy.allclose(feetColumns['N_Load'], columns['N_Load'] * 0.3048 ** 2)
+    assert numpy.allclose(feetColumns['PCTIA'], columns['PCTIA'])
+    unitColumns = pylet.numpyutil.coefficients.getCoefficientResults(zonalCounts, lccObj, cellArea=900,
+                                                                      linearUnits='Foot')
+    assert numpy.allclose(unitColumns['N_Load'], feetColumns['N_Load'])
+    assert pylet.numpyutil.units.getSquareMeterConversionFactor('Foot_US') == \
+        pylet.numpyutil.units.getMeterConversionFactor('Foot_US') ** 2
+    print "  ", ", ".join(["{0}={1:.2f}".format(field, column[0]) for field, column in columns.items()])
+    print
+
+
+def testCoreEdge(workspace):
+    """"""
+
+    print "CORE AND EDGE"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    landCover[5:20, 10:30] = 41
+    zones = getTestZones()
+    rowCount, columnCount = landCover.shape
+
+    zoneIds, columns = pylet.numpyutil.coreedge.tabulateCoreEdge(zones, landCover, lccObj, edgeWidth=2,
+                                                                 classIds=['for'], blockRows=8, blockColumns=16,
+                                                                 zoneNodata=-1, valueNodata=255)
+    assert columns.keys() == ['for_Other', 'for_Core', 'for_Edge']
+
+    # Brute force: a forest cell is core if no valid non-forest cell is within 2 cells
+    expected = dict([(zoneId, [0, 0, 0]) for zoneId in zoneIds.tolist()])
+    for row in range(rowCount):
+        for column in range(columnCount):
+            value = landCover[row, column]
+            if zones[row, column] == -1 or value in (11, 255):
+                continue
+            if value in (41, 42):
+                near = landCover[max(row - 2, 0):row + 3, max(column - 2, 0):column + 3]
+                category = 2 if numpy.in1d(near, [41, 42, 255], invert=True).any() else 1
+            else:
+                category = 0
+            expected[zones[row, column]][category] += 1
+    for zoneIndex, zoneId in enumerate(zoneIds.tolist()):
+        for category, suffix in enumerate(pylet.numpyutil.coreedge.CATEGORY_SUFFIXES):
+            assert columns['for' + suffix][zoneIndex] == expected[zoneId][category]
+
+    # A class without value ids has no core or edge cells
+    lccObj.classes['empty'].uniqueValueIds = None
+    emptyZoneIds, emptyColumns = pylet.numpyutil.coreedge.tabulateCoreEdge(zones, landCover, lccObj, edgeWidth=2,
+                                                                           classIds=['empty'], zoneNodata=-1,
+                                                                           valueNodata=255)
+    assert (emptyColumns['empty_Core'] == 0).all() and (emptyColumns['empty_Edge'] == 0).all()
+    assert (emptyColumns['empty_Other'] == sum([columns['for' + suffix] for suffix in
+                                                pylet.numpyutil.coreedge.CATEGORY_SUFFIXES])).all()
+    print "  ", ", ".join(["{0}={1:.0f}".format(field, column.sum()) for field, column in columns.items()])
+    print
+
+
+def getTestPatches(mask, zones, connectivity):
+    """ Returns a sorted list of (zone, size) for each patch, found by flood fill """
+
+    rowCount, columnCount = mask.shape
+    offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        offsets += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+    seen = numpy.zeros(mask.shape, dtype=bool)
+    patches = []
+    for row, column in zip(*numpy.nonzero(mask)):
+        if seen[row, column]:
+            continue
+        seen[row, column] = True
+        stack = [(row, column)]
+        size = 0
+        while stack:
+            cellRow, cellColumn = stack.pop()
+            size += 1
+            for rowOffset, columnOffset in offsets:
+                nextRow, nextColumn = cellRow + rowOffset, cellColumn + columnOffset
+                if (0 <= nextRow < rowCount and 0 <= nextColumn < columnCount and mask[nextRow, nextColumn] and
+                        not seen[nextRow, nextColumn] and zones[nextRow, nextColumn] == zones[row, column]):
+                    seen[nextRow, nextColumn] = True
+                    stack.append((nextRow, nextColumn))
+        patches.append((zones[row, column], size))
+
+    return sorted(patches)
+
+
+def testPatches(workspace):
+    """"""
+
+    print "PATCHES"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+    mask = numpy.in1d(landCover, [41, 42]).reshape(landCover.shape) & (zones != -1)
+
+    for connectivity in (4, 8):
+        expected = getTestPatches(mask, zones, connectivity)
+        for blockRows, blockColumns in ((None, None), (8, 16), (5, 3)):
+            labeler = pylet.numpyutil.patches.PatchLabeler(landCover.shape[1], connectivity)
+            for window in pylet.numpyutil.raster.getBlockWindows(landCover.shape[0], landCover.shape[1], blockRows,
+                                                                  blockColumns):
+                labeler.addBlock(window, window.read(mask), window.read(zones))
+            patchZones, patchSizes = labeler.getPatches()
+            assert sorted(zip(patchZones.tolist(), patchSizes.tolist())) == expected
+
+    zoneIds, columns = pylet.numpyutil.patches.getPatchMetrics(zones, landCover, lccObj, 8, ['for'], cellArea=900,
+                                                               blockRows=8, blockColumns=16, zoneNodata=-1,
+                                                               valueNodata=255)
+    assert columns.keys() == ['for_NP', 'for_MPS', 'for_MDPS', 'for_LPS', 'for_PD']
+    for zoneIndex, zoneId in enumerate(zoneIds.tolist()):
+        sizes = [size for patchZone, size in expected if patchZone == zoneId]
+        assert columns['for_NP'][zoneIndex] == len(sizes)
+        assert numpy.allclose(columns['for_MPS'][zoneIndex], numpy.mean(sizes) * 900)
+        assert numpy.allclose(columns['for_MDPS'][zoneIndex], numpy.median(sizes) * 900)
+        assert columns['for_LPS'][zoneIndex] == max(sizes) * 900
+        assert numpy.allclose(columns['for_PD'][zoneIndex], len(sizes) / ((zones == zoneId).sum() * 900.0))
+
+    # A class without value ids has no patches
+    lccObj.classes['empty'].uniqueValueIds = None
+    emptyZoneIds, emptyColumns = pylet.numpyutil.patches.getPatchMetrics(zones, landCover, lccObj, 8, ['empty'],
+                                                                         zoneNodata=-1, valueNodata=255)
+    assert emptyZoneIds.tolist() == zoneIds.tolist() and (emptyColumns['empty_NP'] == 0).all()
+    print "  ", ", ".join(["{0}={1:.4g}".format(field, column[0]) for field, column in columns.items()])
+    print
+
+
+def testFocal(workspace):
+    """"""
+
+    print "FOCAL STATISTICS"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    rowCount, columnCount = landCover.shape
+
+    outputs = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, ['for', 'dev'],
+                                                         ('SUM', 'PROPORTION', 'MAJORITY'), windowRows=5,
+                                                         windowColumns=3, blockRows=8, blockColumns=16, nodata=255)
+    assert outputs.keys() == ['for_SUM', 'for', 'dev_SUM', 'dev', 'MAJORITY']
+    for row in range(rowCount):
+        for column in range(columnCount):
+            window = landCover[max(row - 2, 0):row + 3, max(column - 1, 0):column + 2]
+            effective = ((window != 255) & (window != 11)).sum()
+            forest = numpy.in1d(window, [41, 42]).sum()
+            developed = numpy.in1d(window, [21, 22]).sum()
+            assert outputs['for_SUM'][row, column] == forest
+            assert numpy.allclose(outputs['dev'][row, column], developed * 100.0 / effective)
+            majority = 0 if not forest + developed else (1 if forest >= developed else 2)
+            assert outputs['MAJORITY'][row, column] == majority
+
+    slope = numpy.linspace(0, 45, rowCount * columnCount).reshape(rowCount, columnCount)
+    slope[3, 4] = -9999
+    means = pylet.numpyutil.focal.focalStatistics(slope, 'MEAN', 33, blockRows=8, blockColumns=16, nodata=-9999)
+    window = slope[:19, :21]
+    assert numpy.allclose(means[2, 4], window[window != -9999].mean())
+
+    # Outputs written into memory-mapped arrays
+    output = numpy.memmap(os.path.join(workspace, 'focal.dat'), numpy.float64, 'w+', shape=slope.shape)
+    assert pylet.numpyutil.focal.focalStatistics(slope, 'MEAN', 33, blockRows=8, blockColumns=16, nodata=-9999,
+                                                 output=output) is output
+    assert numpy.allclose(output, means, equal_nan=True)
+    developed = numpy.memmap(os.path.join(workspace, 'developed.dat'), numpy.float64, 'w+', shape=landCover.shape)
+    mappedOutputs = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, ['for', 'dev'], windowRows=5,
+                                                               windowColumns=3, blockRows=8, blockColumns=16,
+                                                               nodata=255, outputs={'dev': developed})
+    assert mappedOutputs['dev'] is developed and numpy.allclose(developed, outputs['dev'], equal_nan=True)
+    assert numpy.allclose(mappedOutputs['for'], outputs['for'], equal_nan=True)
+    del output, developed, mappedOutputs
+
+    # Classes without value ids, and no classes at all, have no majority
+    lccObj.classes['empty'].uniqueValueIds = None
+    emptyOutputs = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, ['empty'], ('SUM', 'MAJORITY'),
+                                                              nodata=255)
+    assert (emptyOutputs['empty_SUM'] == 0).all()
+    assert (emptyOutputs['MAJORITY'] == pylet.numpyutil.reclass.NOT_IN_CLASS).all()
+    emptyOutputs = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, [], ('MAJORITY',), nodata=255)
+    assert (emptyOutputs['MAJORITY'] == pylet.numpyutil.reclass.NOT_IN_CLASS).all()
+
+    print "  ", outputs['for'][0, :5], means[0, :3]
+    print
+
+
+def testDistance(workspace):
+    """"""
+
+    print "EUCLIDEAN DISTANCE"
+    randomState = numpy.random.RandomState(2)
+    streams = (randomState.rand(37, 53) < 0.01).astype(numpy.uint8)
+    streams[20, 5] = 255
+    featureRows, featureColumns = numpy.nonzero(streams == 1)
+    rows, columns = numpy.indices(streams.shape)
+
+    # Brute force distances between cell centers, with 30 x 20 map unit cells in feet
+    expected = numpy.empty(streams.shape)
+    for row, column in zip(rows.ravel(), columns.ravel()):
+        expected[row, column] = numpy.sqrt(((featureColumns - column) * 30.0) ** 2 +
+                                           ((featureRows - row) * 20.0) ** 2).min() * 0.3048
+
+    distances = pylet.numpyutil.distance.distanceToFeatures(streams, [1], linearUnits=0.3048, cellWidth=30,
+                                                            cellHeight=20, nodata=255)
+    assert numpy.allclose(distances, expected)
+
+    tiled = pylet.numpyutil.distance.distanceToFeatures(streams, maxDistance=60.0, linearUnits=0.3048, cellWidth=30,
+                                                        cellHeight=20, blockRows=8, blockColumns=16, nodata=255)
+    assert numpy.allclose(tiled[expected <= 60.0], expected[expected <= 60.0])
+    assert numpy.isinf(tiled[expected > 60.0]).all()
+    assert numpy.isinf(pylet.numpyutil.distance.euclideanDistance(numpy.zeros((3, 4), dtype=bool))).all()
+
+    # Distances streamed into a cached raster and a raster writer
+    tileCache = pylet.numpyutil.tilecache.TileCache()
+    cachedRaster = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'distance', 37, 53, numpy.float64, 8, 8)
+    writer = pylet.numpyutil.rasterwriter.createRaster(os.path.join(workspace, 'distance.tiles'), 37, 53,
+                                                       numpy.float64, (0, 0, 1590, 740), tileRows=16, tileColumns=16)
+    for output in (cachedRaster, writer):
+        assert pylet.numpyutil.distance.distanceToFeatures(streams, maxDistance=60.0, linearUnits=0.3048, cellWidth=30,
+                                                           cellHeight=20, blockRows=8, blockColumns=16, nodata=255,
+                                                           output=output) is output
+        assert numpy.array_equal(output[:, :], tiled)
+    pylet.numpyutil.distance.distanceToFeatures(streams, [1], linearUnits=0.3048, cellWidth=30, cellHeight=20,
+                                                nodata=255, output=cachedRaster)
+    assert numpy.array_equal(cachedRaster[:, :], distances)
+    tileCache.close()
+    print "  ", distances.max(), (tiled <= 60.0).sum()
+    print
+
+
+def testLandCoverOnSlopes(workspace):
+    """"""
+
+    print "LAND COVER ON SLOPES"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+    slope = numpy.random.RandomState(3).rand(*landCover.shape).astype(numpy.float32) * 20
+    slope[10, :] = -9999
+
+    zoneIds, columns = pylet.numpyutil.lcosp.getLandCoverOnSlopes(zones, landCover, slope, lccObj, 10.0, cellArea=900,
+                                                                  blockRows=8, blockColumns=16, zoneNodata=-1,
+                                                                  valueNodata=255, slopeNodata=-9999)
+    assert columns.keys()[:3] == ['sNI', 'sNI_OnSlope', 'sNI_OffSlope']
+    for zoneIndex, zoneId in enumerate(zoneIds.tolist()):
+        inZone = (zones == zoneId) & (landCover != 255) & (slope != -9999)
+        steep = inZone & (slope >= 10.0)
+        forest = numpy.in1d(landCover, [41, 42]).reshape(landCover.shape)
+        effective = (steep & (landCover != 11)).sum()
+        assert columns['sfor_OnSlope'][zoneIndex] == (steep & forest).sum() * 900
+        assert columns['sfor_OffSlope'][zoneIndex] == (inZone & ~steep & forest).sum() * 900
+        assert numpy.allclose(columns['sfor'][zoneIndex], (steep & forest).sum() * 100.0 / effective)
+    print "  ", ", ".join(["{0}={1:.1f}".format(field, column[0]) for field, column in columns.items()[:6]])
+    print
+
+
+def testRiparian(workspace):
+    """"""
+
+    print "RIPARIAN LAND COVER"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+    rowCount, columnCount = landCover.shape
+    geoTransform = pylet.numpyutil.geotransform.GeoTransform(1000, 3000, 30, 30)
+
+    # A stream along row 12 bending down to row 30, through cell centers
+    xs, ys = geoTransform.toMap(numpy.array([12, 12, 30]), numpy.array([0, 40, 40]))
+    streamLines = [zip(xs.tolist(), ys.tolist())]
+    streams = numpy.zeros(landCover.shape, dtype=numpy.uint8)
+    streams[12, :41] = 1
+    streams[12:31, 40] = 1
+
+    rows, columns = numpy.indices(landCover.shape)
+    streamRows, streamColumns = numpy.nonzero(streams)
+    nearest = numpy.array([numpy.hypot((streamRows - row) * 30.0, (streamColumns - column) * 30.0).min()
+                           for row, column in zip(rows.ravel(), columns.ravel())]).reshape(landCover.shape)
+    inBuffer = nearest <= 100.0
+
+    for streamInput in (streams, streamLines):
+        zonalCounts = pylet.numpyutil.riparian.tabulateRiparianArea(zones, landCover, streamInput, 100.0,
+                                                                    geoTransform, blockRows=8, blockColumns=16,
+                                                                    zoneNodata=-1, valueNodata=255)
+        for zoneIndex, zoneId in enumerate(zonalCounts.zoneIds.tolist()):
+            for valueIndex, valueId in enumerate(zonalCounts.valueIds.tolist()):
+                expected = (inBuffer & (zones == zoneId) & (landCover == valueId)).sum()
+                assert zonalCounts.counts[zoneIndex, valueIndex] == expected
+        assert zonalCounts.counts.sum() == (inBuffer & (zones != -1) & (landCover != 255)).sum()
+
+    zoneIds, columns = pylet.numpyutil.riparian.getRiparianLandCoverProportions(zones, landCover, streamLines, lccObj,
+                                                                                100.0, 900, geoTransform,
+                                                                                zoneNodata=-1, valueNodata=255)
+    assert columns.keys()[:2] == ['rNI', 'rfor']
+    print "  ", ", ".join(["{0}={1:.1f}".format(field, column[0]) for field, column in columns.items()])
+    print
+
+
+def testPointBuffers(workspace):
+    """"""
+
+    print "SAMPLE POINT LAND COVER"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    geoTransform = pylet.numpyutil.geotransform.GeoTransform(1000, 3000, 30, 30)
+
+    # Points anywhere in cells, near the edges, and one outside the raster
+    random = numpy.random.RandomState(7)
+    x = numpy.concatenate([random.uniform(1000, 1000 + 53 * 30, 40), [1005.0, 2580.0, 900.0]])
+    y = numpy.concatenate([random.uniform(3000 - 37 * 30, 3000, 40), [2995.0, 1900.0, 2500.0]])
+    radius = 100.0
+
+    centerX, centerY = geoTransform.toMap(*numpy.indices(landCover.shape))
+    bufferCounts = pylet.numpyutil.points.tabulatePointBuffers(landCover, x, y, radius, geoTransform, blockRows=8,
+                                                               blockColumns=16, valueNodata=255)
+    assert len(bufferCounts.zoneIds) == len(x)
+    for pointIndex in range(len(x)):
+        inBuffer = numpy.hypot(centerX - x[pointIndex], centerY - y[pointIndex]) <= radius
+        for valueIndex, valueId in enumerate(bufferCounts.valueIds.tolist()):
+            assert bufferCounts.counts[pointIndex, valueIndex] == (inBuffer & (landCover == valueId)).sum()
+    assert bufferCounts.counts[-1].sum() == 0
+
+    columns = pylet.numpyutil.points.getPointLandCoverProportions(landCover, x, y, radius, lccObj, 900, geoTransform,
+                                                                  valueNodata=255)
+    assert columns.keys()[:2] == ['spNI', 'spfor']
+    assert numpy.isnan(columns['spNI'][-1]) and not numpy.isnan(columns['spNI'][:-1]).any()
+    print "  ", ", ".join(["{0}={1:.1f}".format(field, column[0]) for field, column in columns.items()])
+    print
+
+
+def getTestInsidePolygon(rings, x, y):
+    """ Even-odd test of points against the rings of a polygon, one point at a time """
+
+    inside = numpy.zeros(x.shape, dtype=bool)
+    for ring in rings:
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+            crossed = (y0 <= y) != (y1 <= y)
+            crossingX = x0 + (y - y0) * (x1 - x0) / float(y1 - y0) if y0 != y1 else x
+            inside ^= crossed & (crossingX <= x)
+    return inside
+
+
+def testRasterizeZones(workspace):
+    """"""
+
+    print "RASTERIZE ZONES"
+    gridTransform = pylet.numpyutil.geotransform.GeoTransform(1000, 3000, 30, 30)
+
+    # A square with a hole, a two part polygon, and a polygon sharing the key of the square
+    polygons = [[[(1013, 2990), (1507, 2983), (1491, 2411), (1021, 2402)],
+                 [(1111, 2877), (1311, 2777), (1213, 2551)]],
+                [[(1550, 2980), (1900, 2950), (1700, 2700)], [(1600, 2600), (2011, 2640), (1810, 2205)]],
+                [[(2100, 2390), (2540, 2370), (2300, 2003)]]]
+    keys = ['NC01', 'AB07', 'NC01']
+
+    extent = pylet.numpyutil.geotransform.getAlignedExtent(gridTransform, [(1013, 2003, 2540, 2990),
+                                                                           (1000, 1890, 2590, 3000)])
+    assert extent == (1000, 1980, 2560, 3000)
+    geoTransform = pylet.numpyutil.geotransform.GeoTransform.fromExtent(extent, 30)
+    rowCount, columnCount = 34, 52
+
+    zones, zoneKeys = pylet.numpyutil.rasterize.rasterizeZones(polygons, keys, rowCount, columnCount, geoTransform,
+                                                               blockRows=8, blockColumns=16)
+    assert zoneKeys.tolist() == ['AB07', 'NC01']
+
+    centerX, centerY = geoTransform.toMap(*numpy.indices(zones.shape))
+    expected = numpy.empty(zones.shape, dtype=numpy.int32)
+    expected.fill(pylet.numpyutil.rasterize.ZONE_NODATA)
+    for rings, key in zip(polygons, keys):
+        expected[getTestInsidePolygon(rings, centerX, centerY)] = zoneKeys.tolist().index(key)
+
+    assert (zones == expected).all()
+
+    # Zones written into a cached raster and a raster writer, through blocks which do not match their tiles
+    tileCache = pylet.numpyutil.tilecache.TileCache()
+    cachedRaster = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'zones', rowCount, columnCount, numpy.int32, 5, 7)
+    writer = pylet.numpyutil.rasterwriter.createRaster(os.path.join(workspace, 'zones.tiles'), rowCount, columnCount,
+                                                       numpy.int32, extent, pylet.numpyutil.rasterize.ZONE_NODATA,
+                                                       tileRows=16, tileColumns=16, compress=True)
+    for output in (cachedRaster, writer):
+        outputZones, outputKeys = pylet.numpyutil.rasterize.rasterizeZones(polygons, keys, rowCount, columnCount,
+                                                                           geoTransform, blockRows=8, blockColumns=16,
+                                                                           output=output)
+        assert outputZones is output and outputKeys.tolist() == zoneKeys.tolist()
+        assert (output[:, :] == expected).all()
+    tileCache.close()
+    print "   Cells per zone:", numpy.bincount(zones[zones >= 0])
+    print
+
+
+def testValueCache(workspace):
+    """"""
+
+    print "VALUE CACHE"
+    rasterPath = os.path.join(workspace, 'landcover_BSQ.bsq')
+    grid = pylet.numpyutil.raster.openRaster(rasterPath)
+    values, counts, undefinedValueIds = pylet.numpyutil.histogram.getValueHistogram(grid)
+
+    cachePath = pylet.numpyutil.valuecache.getCachePath(rasterPath)
+    valueCache = pylet.numpyutil.valuecache.getValueCache(grid, blockRows=8, blockColumns=16, tileCounts=True)
+    assert os.path.exists(cachePath)
+    assert valueCache.values.tolist() == values.tolist() and valueCache.counts.tolist() == counts.tolist()
+    assert valueCache.nodataCount == (grid.array == grid.nodata).sum()
+    assert (valueCache.minValue, valueCache.maxValue) == (values[0], values[-1])
+
+    windows = list(pylet.numpyutil.raster.getBlockWindows(grid.rowCount, grid.columnCount, 8, 16))
+    tileValues, tileCounts = valueCache.getTileValuesAndCounts(5)
+    expectedValues, expectedCounts = pylet.numpyutil.histogram.getValueHistogram(windows[5].read(grid.array))[:2]
+    assert tileValues.tolist() == [value for value in expectedValues.tolist() if value != grid.nodata]
+    assert tileCounts.sum() == (windows[5].read(grid.array) != grid.nodata).sum()
+
+    # An unchanged raster is answered from the cache, so altered cached counts come back
+    valueCache.counts = valueCache.counts * 2
+    valueCache.save(cachePath)
+    cachedCounts = pylet.numpyutil.valuecache.getCachedValueHistogram(grid)[1]
+    assert cachedCounts.tolist() == (counts * 2).tolist()
+
+    # A changed raster is scanned again
+    os.utime(rasterPath, (0, 0))
+    cachedCounts = pylet.numpyutil.valuecache.getCachedValueHistogram(grid)[1]
+    assert cachedCounts.tolist() == counts.tolist()
+
+    # A truncated cache is rebuilt
+    with open(cachePath, 'rb') as cacheFile:
+        cacheBytes = cacheFile.read()
+    with open(cachePath, 'wb') as cacheFile:
+        cacheFile.write(cacheBytes[:len(cacheBytes) // 2])
+    cachedCounts = pylet.numpyutil.valuecache.getCachedValueHistogram(grid)[1]
+    assert cachedCounts.tolist() == counts.tolist()
+
+    # A tiled grid is cached too, and scanned again when a tile is rewritten
+    landCover = getTestLandCover()
+    rasterPath = os.path.join(workspace, 'cached.tiles')
+    pylet.numpyutil.rasterwriter.writeRaster(rasterPath, landCover, (0, 0, 53, 37), 255, 16, 16)
+    grid = pylet.numpyutil.raster.openRaster(rasterPath)
+    values, counts = pylet.numpyutil.histogram.getValueHistogram(grid)[:2]
+
+    valueCache = pylet.numpyutil.valuecache.getValueCache(grid)
+    assert os.path.exists(pylet.numpyutil.valuecache.getCachePath(rasterPath))
+    valueCache.counts = valueCache.counts * 2
+    valueCache.save(pylet.numpyutil.valuecache.getCachePath(rasterPath))
+    assert pylet.numpyutil.valuecache.getCachedValueHistogram(grid)[1].tolist() == (counts * 2).tolist()
+
+    writer = pylet.numpyutil.rasterwriter.RasterWriter(rasterPath)
+    writer.writeBlock(pylet.numpyutil.raster.RasterWindow(0, 0, 16, 16), landCover[:16, :16])
+    assert pylet.numpyutil.valuecache.getCachedValueHistogram(grid)[1].tolist() == counts.tolist()
+    print "   Cached values:", valueCache.values.tolist()
+    print
+
+
+def testMasks(workspace):
+    """"""
+
+    print "PACKED MASKS"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+
+    nodataMask, excludedMask = pylet.numpyutil.masks.getLandCoverMasks(landCover, lccObj, blockRows=8,
+                                                                       blockColumns=12, nodata=255)
+    assert (nodataMask.unpack() == (landCover == 255)).all()
+    assert (excludedMask.unpack() == (landCover == 11)).all()
+    assert nodataMask.nbytes == landCover.shape[0] * 7
+    assert (nodataMask | excludedMask).count() == ((landCover == 255) | (landCover == 11)).sum()
+    assert (~nodataMask).count() == (landCover != 255).sum()
+    assert (nodataMask & excludedMask).count() == 0
+
+    # Windows with halos that start and end inside a byte
+    window = pylet.numpyutil.raster.RasterWindow(9, 13, 10, 19, 2, 2, 3, 3)
+    assert (excludedMask.read(window) == (window.read(landCover) == 11)).all()
+
+    # Reading unpacks a copy, so changing it leaves the mask unchanged
+    excludedCount = excludedMask.count()
+    excludedMask.read(window)[:] = True
+    assert excludedMask.count() == excludedCount
+
+    # Tabulation and focal statistics with a mask match deriving the masks from the values
+    ineffective = nodataMask | excludedMask
+    expected = pylet.numpyutil.zonal.tabulateArea(zones, numpy.where(landCover == 11, 255, landCover), zoneNodata=-1,
+                                                  valueNodata=255)
+    zonalCounts = pylet.numpyutil.zonal.tabulateArea(zones, landCover, blockRows=8, blockColumns=12, zoneNodata=-1,
+                                                     mask=ineffective)
+    assert zonalCounts.zoneIds.tolist() == expected.zoneIds.tolist()
+    assert zonalCounts.valueIds.tolist() == expected.valueIds.tolist()
+    assert (zonalCounts.counts == expected.counts).all()
+
+    expected = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, ['for', 'dev'], windowRows=5,
+                                                          blockRows=8, blockColumns=12, nodata=255)
+    outputs = pylet.numpyutil.focal.focalClassStatistics(landCover, lccObj, ['for', 'dev'], windowRows=5,
+                                                         blockRows=8, blockColumns=12, mask=ineffective)
+    for key in expected:
+        assert numpy.allclose(outputs[key], expected[key], equal_nan=True)
+    print "   Packed bytes:", ineffective.nbytes, "of", landCover.size
+    print
+
+
+def testTileCache(workspace):
+    """"""
+
+    print "TILE CACHE"
+    landCover = getTestLandCover()
+
+    # The base tiled array stores no tiles, so it reads as its fill and cannot be written
+    tiledArray = pylet.numpyutil.raster.TiledArray(5, 7, numpy.int16, 2, 3, fill=-1)
+    assert (tiledArray[1:4, :] == -1).all() and tiledArray[1:4, :].shape == (3, 7)
+    try:
+        tiledArray[:, :] = 0
+        assert False, "TypeError expected"
+    except TypeError:
+        pass
+
+    spillDirectory = os.path.join(workspace, 'tiles')
+    os.mkdir(spillDirectory)
+
+    # A budget of a few compressed tiles, so most tiles are spilled
+    tileCache = pylet.numpyutil.tilecache.TileCache(memoryBudget=200, compressionLevel=6,
+                                                    spillDirectory=spillDirectory)
+    cachedRaster = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'landcover', landCover.shape[0],
+                                                          landCover.shape[1], landCover.dtype, tileRows=8,
+                                                          tileColumns=16, nodata=255)
+    for window in pylet.numpyutil.raster.getBlockWindows(landCover.shape[0], landCover.shape[1], 10, 7):
+        cachedRaster.write(window, window.read(landCover))
+
+    assert tileCache.memoryBytes <= 200 and tileCache.spilledCount > 0
+    assert len(os.listdir(spillDirectory)) == tileCache.spilledCount
+    assert (cachedRaster.toArray() == landCover).all()
+
+    for window in cachedRaster.iterateBlocks(blockRows=9, blockColumns=11, halo=2):
+        assert (window.array == window.read(landCover)).all()
+
+    # Cells never written read as NoData
+    partial = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'partial', 20, 20, numpy.uint8, 8, 8, nodata=255)
+    partial.write(pylet.numpyutil.raster.RasterWindow(3, 5, 4, 6), numpy.ones((4, 6), dtype=numpy.uint8))
+    assert partial.toArray().sum() == 24 + 255 * (400 - 24)
+
+    # Engines reading from and writing into cached rasters, without whole arrays between the steps
+    engine = pylet.numpyutil.reclass.ReclassEngine(getTestLcc(workspace), nodata=255)
+    engine.addClassIndexLayer(['for', 'dev', 'agt'])
+    classIndex = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'classIndex', landCover.shape[0],
+                                                        landCover.shape[1], numpy.uint8, 8, 16, nodata=255)
+    assert engine.reclassifyRaster(cachedRaster, [classIndex], blockRows=10, blockColumns=10)[0] is classIndex
+
+    zones = getTestZones()
+    expected = pylet.numpyutil.zonal.tabulateArea(zones, engine.reclassifyRaster(landCover)[0], zoneNodata=-1,
+                                                  valueNodata=255)
+    zonalCounts = pylet.numpyutil.zonal.tabulateArea(zones, classIndex, 10, 7, zoneNodata=-1)
+    assert zonalCounts.valueIds.tolist() == expected.valueIds.tolist()
+    assert (zonalCounts.counts == expected.counts).all()
+
+    means = pylet.numpyutil.tilecache.CachedRaster(tileCache, 'means', landCover.shape[0], landCover.shape[1],
+                                                   numpy.float64, 8, 16)
+    pylet.numpyutil.focal.focalStatistics(classIndex, windowRows=3, blockRows=8, blockColumns=16, output=means)
+    expectedMeans = pylet.numpyutil.focal.focalStatistics(classIndex.toArray(), nodata=255)
+    assert numpy.allclose(means.toArray(), expectedMeans, equal_nan=True)
+
+    for tiledRaster in (cachedRaster, partial, classIndex, means):
+        tiledRaster.remove()
+    assert len(tileCache) == 0 and not os.listdir(spillDirectory)
+    tileCache.close()
+    print "   Round trip through spilled tiles OK"
+    print
+
+
+def getBruteForceLevelCounts(landCover, valueIds, factor, nodata):
+    """ Returns the counts of each value in each coarse cell, counted one coarse cell at a time """
+
+    coarseRows = -(-landCover.shape[0] // factor)
+    coarseColumns = -(-landCover.shape[1] // factor)
+    counts = numpy.zeros((len(valueIds), coarseRows, coarseColumns), dtype=numpy.int64)
+    for row in range(coarseRows):
+        for column in range(coarseColumns):
+            cells = landCover[row * factor:(row + 1) * factor, column * factor:(column + 1) * factor]
+            for valueIndex, valueId in enumerate(valueIds):
+                counts[valueIndex, row, column] = (cells == valueId).sum()
+
+    assert counts.sum() == (landCover != nodata).sum()
+    return counts
+
+
+def testPyramid(workspace):
+    """"""
+
+    print "COUNT PYRAMID"
+    lccObj = getTestLcc(workspace)
+    landCover = getTestLandCover()
+    zones = getTestZones()
+
+    countPyramid = pylet.numpyutil.pyramid.buildCountPyramid(landCover, 3, blockRows=8, blockColumns=16, nodata=255)
+    for level in (1, 2, 3):
+        factor = countPyramid.getFactor(level)
+        counts = countPyramid.getCounts(level)
+        for valueIndex, valueId in enumerate(countPyramid.valueIds.tolist()):
+            expected = pylet.numpyutil.pyramid.aggregateCounts((landCover == valueId)[numpy.newaxis], factor)[0]
+            assert (counts[valueIndex] == expected).all()
+        assert (counts == getBruteForceLevelCounts(landCover, countPyramid.valueIds.tolist(), factor, 255)).all()
+
+    expectedCounts = pylet.numpyutil.zonal.tabulateArea(zones, landCover, zoneNodata=-1, valueNodata=255)
+    expected = pylet.numpyutil.lcp.getLandCoverProportions(expectedCounts, lccObj)
+
+    for level in (1, 2, 3):
+        zoneAggregation = pylet.numpyutil.pyramid.aggregateZones(zones, countPyramid.getFactor(level), blockRows=8,
+                                                                 blockColumns=16, zoneNodata=-1)
+        zoneIds, columns, errorBounds = pylet.numpyutil.pyramid.getPyramidLandCoverProportions(
+            countPyramid, level, zoneAggregation, lccObj)
+        assert zoneIds.tolist() == expectedCounts.zoneIds.tolist()
+        for field in ('NINDP', 'PFOR', 'pUI', 'pdev'):
+            assert (abs(columns[field] - expected[field]) <= errorBounds + 1e-9).all()
+        print "   Level {0}: error bounds".format(level), numpy.round(errorBounds, 1), "actual",
+        print numpy.round(abs(columns['PFOR'] - expected['PFOR']), 1)
+
+    # Zones aligned to coarse cells are exact
+    alignedZones = numpy.repeat(numpy.arange(10), 4)[:, numpy.newaxis].repeat(landCover.shape[1], axis=1)[:37]
+    zoneAggregation = pylet.numpyutil.pyramid.aggregateZones(alignedZones, 4)
+    errorBounds = pylet.numpyutil.pyramid.getPyramidLandCoverProportions(countPyramid, 2, zoneAggregation, lccObj)[2]
+    assert numpy.allclose(errorBounds, 0)
+
+    # Only the coarser levels, stored in memory-mapped files
+    pyramidDirectory = os.path.join(workspace, 'pyramid')
+    os.mkdir(pyramidDirectory)
+    mappedPyramid = pylet.numpyutil.pyramid.buildCountPyramid(landCover, 3, blockRows=8, blockColumns=16, nodata=255,
+                                                              firstLevel=2, directory=pyramidDirectory)
+    assert sorted(os.listdir(pyramidDirectory)) == ['level2.counts', 'level3.counts']
+    for level in (2, 3):
+        expected = getBruteForceLevelCounts(landCover, countPyramid.valueIds.tolist(), 2 ** level, 255)
+        assert isinstance(mappedPyramid.getCounts(level), numpy.memmap)
+        assert mappedPyramid.getCounts(level).dtype == numpy.uint8
+        assert (mappedPyramid.getCounts(level) == expected).all()
+
+    # Blocks counted a few values at a time, with blocks which do not fill the coarsest cells at the edges
+    countChunkSize = pylet.numpyutil.pyramid.COUNT_CHUNK_SIZE
+    pylet.numpyutil.pyramid.COUNT_CHUNK_SIZE = 100
+    try:
+        chunkedPyramid = pylet.numpyutil.pyramid.buildCountPyramid(landCover, 3, blockRows=16, blockColumns=24,
+                                                                   nodata=255, firstLevel=2)
+    finally:
+        pylet.numpyutil.pyramid.COUNT_CHUNK_SIZE = countChunkSize
+    for level in (2, 3):
+        expected = getBruteForceLevelCounts(landCover, chunkedPyramid.valueIds.tolist(), 2 ** level, 255)
+        assert (chunkedPyramid.getCounts(level) == expected).all()
+    try:
+        mappedPyramid.getCounts(1)
+        assert False
+    except ValueError:
+        pass
+    del mappedPyramid
+    print
+
+
+def testResample():
+    """"""
+
+    print "ALIGNED RESAMPLING"
+    landCover = getTestLandCover()
+    landCoverGrid = pylet.numpyutil.raster.RasterGrid([landCover], (1000, 1890, 2590, 3000), 255)
+
+    # Zones on 45 m cells with a shifted origin, covering part of the land cover
+    zones = numpy.arange(20 * 30, dtype=numpy.int32).reshape(20, 30)
+    zoneGrid = pylet.numpyutil.raster.RasterGrid([zones], (1020, 2140, 2370, 3040), -1)
+
+    geoTransform, shape = pylet.numpyutil.resample.getAlignedGrid([landCoverGrid, zoneGrid])
+    assert (geoTransform.xMin, geoTransform.yMax, geoTransform.cellWidth) == (1000, 3000, 30)
+    assert shape == (29, 46)
+
+    rows, columns = numpy.indices(shape)
+    x, y = geoTransform.toMap(rows, columns)
+    expectedZones = zones[((3040 - y) // 45).astype(int), ((x - 1020) // 45).astype(int)]
+    expectedZones[(x < 1020) | (y > 3040)] = -1
+    expectedLandCover = landCover[:29, :46]
+
+    for window, (landCoverBlock, zoneBlock) in pylet.numpyutil.resample.iterateAlignedBlocks(
+            [landCoverGrid, zoneGrid], blockRows=8, blockColumns=16, halo=1):
+        assert (landCoverBlock == window.read(expectedLandCover)).all()
+        assert (zoneBlock == window.read(expectedZones)).all()
+
+    zoneCounts = numpy.bincount(expectedZones[expectedZones >= 0])
+    print "   Zone cells resampled:", zoneCounts.sum(), "from", len(numpy.flatnonzero(zoneCounts)), "zones"
+    print
+
+
+def writeTestTiles(arguments):
+    """ Writes every other tile of the test land cover from a worker process, compressed or not """
+
+    rasterPath, compress, offset = arguments
+    landCover = getTestLandCover()
+    writer = pylet.numpyutil.rasterwriter.RasterWriter(rasterPath, compress)
+    for tileIndex, window in enumerate(writer.getTileWindows()):
+        if tileIndex % 2 == offset:
+            writer.writeBlock(window, window.read(landCover))
+
+
+def testRasterWriter(workspace):
+    """"""
+
+    print "RASTER WRITER"
+    landCover = getTestLandCover()
+    extent = (1000, 1890, 2590, 3000)
+    rasterPath = os.path.join(workspace, 'written.tiles')
+
+    # Blocks of any size, in reverse order, with tiles never written reading as NoData
+    writer = pylet.numpyutil.rasterwriter.createRaster(rasterPath, 37, 53, landCover.dtype, extent, 255,
+                                                       tileRows=8, tileColumns=16)
+    for window in reversed(list(pylet.numpyutil.raster.getBlockWindows(30, 53, 5, 7))):
+        writer.writeBlock(window, window.read(landCover))
+
+    grid = pylet.numpyutil.raster.openRaster(rasterPath)
+    assert grid.layout == 'TILED' and grid.extent == extent and grid.nodata == 255
+    assert (numpy.asarray(grid.array)[:30] == landCover[:30]).all() and (grid.array[30:, :] == 255).all()
+
+    # Two worker processes writing disjoint tiles, one of them compressed, into a new raster
+    rasterPath = os.path.join(workspace, 'tiled.tiles')
+    pylet.numpyutil.rasterwriter.createRaster(rasterPath, 37, 53, numpy.int16, extent, -1, 8, 16)
+    pool = multiprocessing.Pool(2)
+    try:
+        pool.map(writeTestTiles, [(rasterPath, True, 0), (rasterPath, False, 1)])
+    finally:
+        pool.close()
+        pool.join()
+
+    tileNames = os.listdir(rasterPath)
+    compressedExtension = pylet.numpyutil.raster.COMPRESSED_TILE_EXTENSION
+    compressedCount = len([name for name in tileNames if name.endswith(compressedExtension)])
+    assert compressedCount == 10 and len(tileNames) == 20
+
+    grid = pylet.numpyutil.raster.openRaster(rasterPath)
+    assert grid.dtype == numpy.int16 and (numpy.asarray(grid.array) == landCover).all()
+
+    # A tile rewritten in the other form, or in the same form, leaves one file with the new cells
+    writer = pylet.numpyutil.rasterwriter.RasterWriter(rasterPath)
+    window = pylet.numpyutil.raster.RasterWindow(0, 0, 8, 16)
+    for compress, value in ((True, 1), (False, 2), (False, 3)):
+        writer.writeBlock(window, numpy.zeros((8, 16), dtype=numpy.int16) + value, compress=compress)
+        assert len(os.listdir(rasterPath)) == 20
+        assert (pylet.numpyutil.raster.openRaster(rasterPath).array[:8, :16] == value).all()
+
+    # Compressed tiles of a constant raster stay compressed on disk
+    rasterPath = os.path.join(workspace, 'constant.tiles')
+    pylet.numpyutil.rasterwriter.writeRaster(rasterPath, numpy.zeros((64, 64), dtype=numpy.float64), blockRows=32,
+                                             blockColumns=32, compress=True)
+    tileBytes = sum([os.path.getsize(os.path.join(rasterPath, name)) for name in os.listdir(rasterPath)])
+    assert tileBytes < 64 * 64 * 8 // 10
+    assert (pylet.numpyutil.raster.openRaster(rasterPath).array[:, :] == 0).all()
+
+    # 64 bit integers, such as from numpy.arange, are written as they are
+    rasterPath = os.path.join(workspace, 'arange.tiles')
+    pylet.numpyutil.rasterwriter.writeRaster(rasterPath, numpy.arange(100, dtype=numpy.int64).reshape(10, 10))
+    grid = pylet.numpyutil.raster.openRaster(rasterPath)
+    assert grid.dtype == numpy.int64 and (grid.array[:, :] == numpy.arange(100).reshape(10, 10)).all()
+
+    # An engine streaming its output through a writer, in blocks which do not match the tiles
+    rasterPath = os.path.join(workspace, 'focal.tiles')
+    writer = pylet.numpyutil.rasterwriter.createRaster(rasterPath, 37, 53, numpy.float64, extent, tileRows=16,
+                                                       tileColumns=16, compress=True)
+    output = pylet.numpyutil.focal.focalStatistics(landCover, 'SUM', 3, blockRows=10, blockColumns=12, output=writer)
+    expected = pylet.numpyutil.focal.focalStatistics(landCover, 'SUM', 3)
+    assert output is writer
+    assert (pylet.numpyutil.raster.openRaster(rasterPath).array[:, :] == expected).all()
+
+    print "   Tiles written by two processes:", len(tileNames), "with", compressedCount, "compressed"
+    print "   Bytes of compressed tiles for a constant raster:", tileBytes, "of", 64 * 64 * 8
+    print
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+''' Benchmark for pylet.numpyutil.parallel
+
+    Writes a land cover grid and a zone grid to a temporary directory as memory-mapped BSQ grids, then times
+    tabulateAreaParallel from one process up to the number of CPUs.  The counts are checked to be identical for every
+    number of processes.
+
+    Usage: python parallelBenchmark.py [size in cells, default 4000] [maximum processes, default all CPUs]
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+import numpy
+import pylet
+
+
+def main():
+    """"""
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    maxProcesses = int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count()
+
+    workspace = tempfile.mkdtemp()
+    try:
+        randomState = numpy.random.RandomState(0)
+        values = numpy.array([11, 21, 22, 23, 24, 31, 41, 42, 43, 52, 71, 81, 82, 90, 95], dtype=numpy.uint8)
+        landCover = values[randomState.randint(0, len(values), (size, size))]
+        zones = (numpy.arange(size * size, dtype=numpy.int32).reshape(size, size) // 997) % 5000
+
+        landCoverGrid = writeGrid(workspace, 'landcover', landCover, 'UNSIGNEDINT', 255)
+        zoneGrid = writeGrid(workspace, 'zones', zones, 'SIGNEDINT', -1)
+
+        print "{0} x {1} cells, {2} zones".format(size, size, len(numpy.unique(zones)))
+        expected = None
+        for processes in range(1, maxProcesses + 1):
+            start = time.time()
+            zonalCounts = pylet.numpyutil.parallel.tabulateAreaParallel(zoneGrid, landCoverGrid, processes)
+            seconds = time.time() - start
+
+            if expected is None:
+                expected = zonalCounts
+                serialSeconds = seconds
+            assert (zonalCounts.counts == expected.counts).all()
+            print "  {0:2d} processes: {1:7.2f} s, speedup {2:.2f}".format(processes, seconds, serialSeconds / seconds)
+
+        del landCoverGrid, zoneGrid
+    finally:
+        shutil.rmtree(workspace)
+
+
+def writeGrid(workspace, name, array, pixelType, nodata):
+    """ Writes a single band BSQ grid and opens it as a memory-mapped RasterGrid """
+
+    basePath = os.path.join(workspace, name)
+    array.tofile(basePath + '.bsq')
+    with open(basePath + '.hdr', 'w') as headerFile:
+        headerFile.write("BYTEORDER I\nLAYOUT BSQ\nNROWS {0}\nNCOLS {1}\nNBANDS 1\nNBITS {2}\nPIXELTYPE {3}\n"
+                         "ULXMAP 15\nULYMAP 15\nXDIM 30\nYDIM 30\nNODATA {4}\n".format(array.shape[0], array.shape[1],
+                                                                                     array.dtype.itemsize * 8,
+                                                                                     pixelType, nodata))
+
+    return pylet.numpyutil.raster.openRaster(basePath + '.bsq')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 '''
 
 import lccTest
+import lccMemoryTest
+import numpyutilTest
 
 lccTest.main()
-
+lccMemoryTest.main()
+numpyutilTest.main()